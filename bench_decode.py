@@ -0,0 +1,113 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_decode.py
+@Desc    :   作品列表响应解析的基准测试：比较原来的 response.text + response.json() 与 lib/fastjson 投影解析的耗时和内存
+             使用仓库中保存的接口响应（get_post.json / paid_mix.json / paid_video.json），完全离线运行，结果以JSON输出
+
+用法:
+    python bench_decode.py                               # 全部样本和解析方式，每种重复50次
+    python bench_decode.py -n 200 -f get_post.json -o decode.json
+'''
+import argparse
+import gc
+import json as std_json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import ujson as json
+
+from lib import fastjson
+
+FIXTURES = ['get_post.json', 'paid_mix.json', 'paid_video.json']
+
+
+def decode_requests(raw: bytes):
+    """原来的getJSON: 判断response.text是否为空（生成一份str），再由response.json()用标准库解码"""
+    text = raw.decode('utf-8')
+    if not text:
+        return None
+    return std_json.loads(raw.decode('utf-8'))
+
+
+def decode_ujson(raw: bytes):
+    return json.loads(raw)
+
+
+def decode_fast(raw: bytes):
+    """完整解析原始字节（有orjson时使用orjson）"""
+    return fastjson.decode(raw)
+
+
+def decode_projected(raw: bytes):
+    """完整解析后只保留__append_awemes用到的字段"""
+    return fastjson.decode(raw, fastjson.AWEME_PAGE)
+
+
+MODES = {
+    'requests': decode_requests,
+    'ujson': decode_ujson,
+    'fastjson': decode_fast,
+    'projection': decode_projected,
+}
+
+
+def measure(decoder, raw: bytes, calls: int) -> dict:
+    # 耗时: 不开tracemalloc，避免分配跟踪的开销影响结果
+    decoder(raw)
+    times = []
+    for _ in range(calls):
+        gc.collect()
+        started = time.perf_counter()
+        decoder(raw)
+        times.append((time.perf_counter() - started) * 1000)
+    # 内存: 解析过程中的峰值，和解析完成后结果仍占用的内存
+    gc.collect()
+    tracemalloc.start()
+    result = decoder(raw)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        'p50_ms': round(statistics.median(times), 3),
+        'min_ms': round(min(times), 3),
+        'peak_kb': round(peak / 1024, 1),
+        'retained_kb': round(retained / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='作品列表响应解析对比测试')
+    parser.add_argument('-n', '--calls', type=int, default=50, help='每种解析方式的重复次数')
+    parser.add_argument('-f', '--fixtures', nargs='+', default=FIXTURES, help='响应样本文件')
+    parser.add_argument('-m', '--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('-o', '--output', default='', help='结果JSON文件，默认输出到标准输出')
+    args = parser.parse_args()
+
+    results = []
+    for fixture in args.fixtures:
+        with open(fixture, 'rb') as f:
+            raw = f.read()
+        for mode in args.modes:
+            result = measure(MODES[mode], raw, args.calls)
+            result.update({'fixture': fixture, 'size_kb': round(len(raw) / 1024, 1), 'mode': mode})
+            print(f"{fixture:>16} {mode:>10}  p50 {result['p50_ms']:>8.2f}ms  峰值 {result['peak_kb']:>9.1f}KB  "
+                  f"保留 {result['retained_kb']:>9.1f}KB", file=sys.stderr)
+            results.append(result)
+
+    report = {
+        'orjson': fastjson.ORJSON_AVAILABLE,
+        'calls': args.calls,
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_http2.py
+@Desc    :   HTTP/1.1 与 HTTP/2 连接池对比测试
+             本地启动一个同时支持HTTP/1.1和HTTP/2（h2c）的模拟接口，多线程模拟并行检查主页，
+             统计延迟、总耗时和服务端连接数，结果以JSON输出
+
+用法:
+    python bench_http2.py                          # 32线程，每个模式960个请求，服务端延迟50ms
+    python bench_http2.py -t 64 -n 2000 --latency 100 --jitter 200 -o http2.json
+'''
+import argparse
+import asyncio
+import multiprocessing
+import random
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import ujson as json
+from loguru import logger
+
+from lib.cookies import cookies_str_to_dict
+from lib.fingerprint import FingerprintStore
+from lib.ratelimit import configure_rate_limiter
+from lib.request import Request
+from lib.session import H2_AVAILABLE, HTTPX_AVAILABLE, Http2Session, HttpSession
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+except ImportError:
+    pass
+
+PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+# 测试用的指纹保存在临时文件中，不写入config/fingerprint.json
+FINGERPRINTS = FingerprintStore(os.path.join(tempfile.mkdtemp(prefix='bench_http2_'), 'fingerprint.json'))
+
+
+class StandInServer(object):
+    """
+    模拟 www.douyin.com 接口的本地服务，每个请求延迟latency毫秒（加上0~jitter毫秒的随机波动）后返回固定的作品列表
+    服务运行在单独的进程中，协议处理的开销不计入客户端
+    """
+
+    def __init__(self, latency: float = 50, jitter: float = 0, body_size: int = 20000):
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        aweme = {'aweme_id': '7530495662610238766', 'desc': '测试' * 20, 'create_time': 1769651900}
+        awemes = [aweme] * max(1, body_size // len(json.dumps(aweme, ensure_ascii=False).encode()))
+        self.body = json.dumps({'status_code': 0, 'has_more': 1, 'max_cursor': 1, 'aweme_list': awemes},
+                               ensure_ascii=False).encode()
+        # 与测试进程共享的统计
+        self.connections = multiprocessing.Value('i', 0)
+        self.max_streams = multiprocessing.Value('i', 0)
+        self.streams = 0
+        self.port = 0
+        self.process = None
+
+    def reset(self):
+        self.connections.value = 0
+        self.max_streams.value = 0
+
+    def start(self):
+        ports = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=self.run, args=(ports,), daemon=True)
+        self.process.start()
+        self.port = ports.get(timeout=30)
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(5)
+
+    def run(self, ports):
+        loop = asyncio.new_event_loop()
+        server = loop.run_until_complete(asyncio.start_server(self.handle, '127.0.0.1', 0))
+        ports.put(server.sockets[0].getsockname()[1])
+        loop.run_forever()
+
+    async def delay(self):
+        await asyncio.sleep(self.latency + random.random() * self.jitter)
+
+    def stream_started(self):
+        self.streams += 1
+        if self.streams > self.max_streams.value:
+            self.max_streams.value = self.streams
+
+    async def handle(self, reader, writer):
+        self.connections.value += 1
+        try:
+            head = await reader.readexactly(len(PREFACE))
+            if head == PREFACE:
+                await self.handle_h2(head, reader, writer)
+            else:
+                await self.handle_http1(head, reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_http1(self, head, reader, writer):
+        # 同一连接上的请求只能依次处理
+        data = head
+        while True:
+            data += await reader.readuntil(b'\r\n\r\n')
+            self.stream_started()
+            await self.delay()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nConnection: keep-alive\r\n'
+                         + f'Content-Length: {len(self.body)}\r\n\r\n'.encode() + self.body)
+            await writer.drain()
+            self.streams -= 1
+            data = b''
+
+    async def handle_h2(self, head, reader, writer):
+        conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        pending = {}  # 受流量控制限制尚未发完的响应
+
+        def flush():
+            for stream_id in list(pending):
+                data = pending[stream_id]
+                window = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                while data and window > 0:
+                    conn.send_data(stream_id, data[:window])
+                    data = data[window:]
+                    window = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size)
+                if data:
+                    pending[stream_id] = data
+                else:
+                    conn.end_stream(stream_id)
+                    del pending[stream_id]
+                    self.streams -= 1
+            writer.write(conn.data_to_send())
+
+        async def respond(stream_id):
+            await self.delay()
+            conn.send_headers(stream_id, [(':status', '200'), ('content-type', 'application/json'),
+                                          ('content-length', str(len(self.body)))])
+            pending[stream_id] = self.body
+            flush()
+
+        data = head
+        while True:
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    self.stream_started()
+                    asyncio.ensure_future(respond(event.stream_id))
+                elif isinstance(event, h2.events.WindowUpdated):
+                    flush()
+                elif isinstance(event, h2.events.StreamReset) and pending.pop(event.stream_id, None) is not None:
+                    self.streams -= 1
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+            writer.write(conn.data_to_send())
+            data = await reader.read(65535)
+            if not data:
+                return
+
+
+def percentile(values: list, p: float) -> float:
+    """最近秩法百分位，values需已排序"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def run_mode(mode: str, server: StandInServer, threads: int, calls: int, pool_size: int) -> dict:
+    if mode == 'http2':
+        # 本地服务没有TLS，直接使用HTTP/2（h2c）
+        session = Http2Session(pool_size, retries=0, http1=False)
+    else:
+        session = HttpSession(pool_size, retries=0)
+    # 每个线程一个Request实例，与监控中每个主页一个Douyin实例相同，共用同一个连接池
+    # 测试cookie只解析不保存，不覆盖config/cookie.json
+    with mock.patch('lib.request.get_cookie_dict', cookies_str_to_dict):
+        requests = [Request('a=1', signer='native', session=session, fingerprints=FINGERPRINTS) for _ in range(threads)]
+    server.reset()
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def work(index: int):
+        request = requests[index % threads]
+        start = time.perf_counter()
+        result = request.getJSON('/aweme/v1/web/aweme/post/', {'sec_user_id': f'user{index}', 'max_cursor': 0,
+                                                              'count': 18}, max_retries=1)
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not result.get('aweme_list'):
+                failures.append(index)
+
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, range(calls)))
+    total = time.perf_counter() - begin
+    session.close()
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'threads': threads,
+        'calls': calls,
+        'errors': len(failures),
+        'connections': server.connections.value,
+        'max_concurrent_streams': server.max_streams.value,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'total_s': round(total, 3),
+        'throughput_per_s': round(calls / total, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP/1.1与HTTP/2连接池对比测试')
+    parser.add_argument('-t', '--threads', type=int, default=32, help='并发线程数（同时检查的主页数）')
+    parser.add_argument('-n', '--calls', type=int, default=960, help='每个模式的请求总数')
+    parser.add_argument('--pool-size', type=int, default=0, help='每个域名的最大连接数，默认等于线程数')
+    parser.add_argument('--latency', type=float, default=50, help='服务端处理延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='服务端延迟的随机波动（毫秒）')
+    parser.add_argument('--body-size', type=int, default=20000, help='响应大小（字节）')
+    parser.add_argument('-m', '--modes', nargs='+', choices=['http1.1', 'http2'], default=['http1.1', 'http2'])
+    parser.add_argument('-o', '--output', default='', help='结果JSON文件，默认输出到标准输出')
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='ERROR')
+
+    if 'http2' in args.modes and not (HTTPX_AVAILABLE and H2_AVAILABLE):
+        logger.error('未安装httpx[http2]，跳过HTTP/2测试: pip install httpx[http2]')
+        args.modes.remove('http2')
+
+    server = StandInServer(args.latency, args.jitter, args.body_size)
+    server.start()
+    # 接口地址指向本地模拟服务，签名使用纯Python实现，不依赖网络和node
+    Request.HOST = f'http://127.0.0.1:{server.port}'
+    Request.WEBID = '7513859400529511946'
+    # 本地服务不限流，放开接口限速以测出传输层的吞吐
+    configure_rate_limiter(rate=1e6, burst=1e6, max_rate=1e6)
+
+    results = []
+    for mode in args.modes:
+        result = run_mode(mode, server, args.threads, args.calls, args.pool_size or args.threads)
+        print(f"{mode:>8} {args.threads}线程  连接数 {result['connections']:>4}  p50 {result['p50_ms']:>8.2f}ms  "
+              f"p95 {result['p95_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms  {result['throughput_per_s']:>8.2f}次/秒  "
+              f"失败 {result['errors']}", file=sys.stderr)
+        results.append(result)
+    server.stop()
+
+    report = {
+        'latency_ms': args.latency,
+        'jitter_ms': args.jitter,
+        'body_size': len(server.body),
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
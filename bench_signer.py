@@ -0,0 +1,352 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   bench_signer.py
+@Desc    :   签名后端基准测试：比较 execjs / pool / native 三种后端的 get_sign 与主页 get_a_bogus 的延迟和吞吐
+             完全离线运行，结果以JSON输出，更新 lib/js 下的脚本后可与旧结果对比发现性能回退
+
+用法:
+    python bench_signer.py                                   # 全部后端，1/8/32线程
+    python bench_signer.py -b native pool -t 1 8 -n 200 -o bench.json
+    python bench_signer.py --baseline bench.json             # 与上次结果对比，p95变慢超过容差时返回1
+'''
+import argparse
+import hashlib
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from unittest import mock
+
+import ujson as json
+from loguru import logger
+
+from lib.cookies import cookies_str_to_dict
+from lib.fingerprint import FingerprintStore
+from lib.request import Request
+from lib.sign_pool import get_sign_pool
+
+
+# 固定参数取自 get_post.py / paid_mix.py / get_profile.py（去掉a_bogus），保证结果可复现
+POST_PARAMS = {
+    'device_platform': 'webapp',
+    'aid': '6383',
+    'channel': 'channel_pc_web',
+    'sec_user_id': 'MS4wLjABAAAA8Ag2TMrWvfZWpLywypFRGhoL2_A8FdXawWfuh29bJWCJ_BCr23KY0S9O76eC4_oC',
+    'max_cursor': '0',
+    'locate_query': 'false',
+    'show_live_replay_strategy': '1',
+    'need_time_list': '1',
+    'time_list_query': '0',
+    'whale_cut_token': '',
+    'cut_version': '1',
+    'count': '18',
+    'publish_video_strategy_type': '2',
+    'from_user_page': '1',
+    'update_version_code': '170400',
+    'pc_client_type': '1',
+    'pc_libra_divert': 'Windows',
+    'support_h265': '1',
+    'support_dash': '1',
+    'cpu_core_num': '8',
+    'version_code': '290100',
+    'version_name': '29.1.0',
+    'cookie_enabled': 'true',
+    'screen_width': '1920',
+    'screen_height': '1080',
+    'browser_language': 'zh-CN',
+    'browser_platform': 'Win32',
+    'browser_name': 'Chrome',
+    'browser_version': '132.0.0.0',
+    'browser_online': 'true',
+    'engine_name': 'Blink',
+    'engine_version': '132.0.0.0',
+    'os_name': 'Windows',
+    'os_version': '10',
+    'device_memory': '8',
+    'platform': 'PC',
+    'downlink': '10',
+    'effective_type': '4g',
+    'round_trip_time': '50',
+    'webid': '7513859400529511946',
+    'uifid': 'e438e504399eecf9c2f65594851517a53fcd0a47c3feace6f386418d12bbc04df48e44884eb112db37fe72d5435d21b6da0e51b513a8cb2b57492a0995d24d772f6cfd3d1776b840aac469c3bdd9274a5f67289cc8fdef6814c7e117c0a032504fc0fd31a61a75788f2ca404226b0db6e3746e19a5c1bb329337a3502e5540f971d0f0c745c7015ee45edb56770785034669036d8896c8bfef34dfdc03af6852',
+    'msToken': 'uGIyd_KgUAGjbJBiyk13cuMwGiS2smpcgDsocx3tgX6l4rNtiz7m2vkb877pQtHTDGgHVm--9n8eQt7kkEXK4_OhnD0rc8cRtnUKf2_rdui4rVWLta_OlKBunOA8FCle52dGsBL-ZgZDP2XXOVjnFNgeCqIMNuPYMqk_55dlUhBT',
+    'verifyFp': 'verify_mirgbi90_b61T1WIC_kWGd_4IvP_BHWD_FQeiTEuA8hhI',
+    'fp': 'verify_mirgbi90_b61T1WIC_kWGd_4IvP_BHWD_FQeiTEuA8hhI',
+    'timestamp': '1769651900',
+    'x-secsdk-web-signature': 'e5f75303225e5293a852dc966ac38508',
+}
+
+MIX_PARAMS = {
+    'device_platform': 'webapp',
+    'aid': '6383',
+    'channel': 'channel_pc_web',
+    'mix_id': '7593696868874323987',
+    'cursor': '2',
+    'count': '20',
+    'pc_client_type': '1',
+    'pc_libra_divert': 'Windows',
+    'support_h265': '1',
+    'support_dash': '0',
+    'webcast_sdk_version': '170400',
+    'webcast_version_code': '170400',
+    'version_code': '170400',
+    'version_name': '17.4.0',
+    'cookie_enabled': 'true',
+    'screen_width': '1920',
+    'screen_height': '1080',
+    'browser_language': 'zh-CN',
+    'browser_platform': 'Win32',
+    'browser_name': 'Chrome',
+    'browser_version': '143.0.0.0',
+    'browser_online': 'true',
+    'engine_name': 'Blink',
+    'engine_version': '143.0.0.0',
+    'os_name': 'Windows',
+    'os_version': '10',
+    'cpu_core_num': '8',
+    'device_memory': '8',
+    'platform': 'PC',
+    'downlink': '10',
+    'effective_type': '4g',
+    'round_trip_time': '0',
+    'webid': '7595211478572303878',
+    'verifyFp': 'verify_mke2i3x5_kSE8FFzZ_uz0y_4v1h_9pxF_iE7uF8JpX8zg',
+    'fp': 'verify_mke2i3x5_kSE8FFzZ_uz0y_4v1h_9pxF_iE7uF8JpX8zg',
+    'msToken': 'fkHG3nYUqmNWq-u7sKviGJg7TiY-YRIgHEu5BTVOBwlcp5zOTuoQJU6aOTKXBnIaY-w3GCblFh2CXOjYZk_2agxZ738wYPG5-4lfIBkCqZ5okVoEj6bVoC1x2xYACp6Nb1FL2ISTSeQ3s-0-5nXIME97q5OlS5WyMwubewV1bs_pSLe-e_MpcQ==',
+}
+
+# 主页接口参数在 get_post.py 的基础上补充 get_profile.py 中的字段
+PROFILE_PARAMS = dict(POST_PARAMS, **{
+    'source': 'channel_pc_web',
+    'personal_center_strategy': '1',
+    'profile_other_record_enable': '1',
+    'land_to': '1',
+    'version_code': '170400',
+    'version_name': '17.4.0',
+    'x-secsdk-web-signature': 'c8e0fe804acde75c18f4e1d30e314799',
+})
+PROFILE_URL = f'{Request.HOST}/aweme/v1/web/user/profile/other/?{urllib.parse.urlencode(PROFILE_PARAMS)}'
+
+# 不同接口的签名调用，每次调用传入参数的副本
+OPERATIONS = {
+    'get_sign': [
+        ('/aweme/v1/web/aweme/post/', POST_PARAMS),
+        ('/aweme/v1/web/mix/aweme/', MIX_PARAMS),
+        ('/aweme/v1/web/comment/list/reply/', {'item_id': '7530495662610238766', 'comment_id': '7530500000000000000',
+                                                'cursor': '0', 'count': '20'}),
+    ],
+    'get_a_bogus': [PROFILE_URL],
+}
+
+BACKENDS = ['execjs', 'pool', 'native']
+JS_FILES = ['douyin_minimal.js', '8.动态url测试.js', 'sign_worker.js', 'douyin.js']
+COOKIE = 's_v_web_id=verify_mirgbi90_b61T1WIC_kWGd_4IvP_BHWD_FQeiTEuA8hhI; dy_swidth=1920; dy_sheight=1080'
+# 测试用的指纹保存在临时文件中，不写入config/fingerprint.json
+FINGERPRINTS = FingerprintStore(os.path.join(tempfile.mkdtemp(prefix='bench_signer_'), 'fingerprint.json'))
+
+
+def percentile(values: list, p: float) -> float:
+    """最近秩法百分位，values需已排序"""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def make_request(backend: str) -> Request:
+    """
+    创建测试用的Request: 测试cookie只解析不保存，不覆盖config/cookie.json
+    """
+    with mock.patch('lib.request.get_cookie_dict', cookies_str_to_dict):
+        return Request(COOKIE, signer=backend, fingerprints=FINGERPRINTS)
+
+
+def make_call(request: Request, op: str, index: int):
+    """返回一次签名调用，结果为空时视为失败"""
+    if op == 'get_sign':
+        uri, params = OPERATIONS[op][index % len(OPERATIONS[op])]
+        return request.get_sign(uri, params.copy())
+    return request.get_a_bogus(OPERATIONS[op][index % len(OPERATIONS[op])])
+
+
+def run_case(backend: str, op: str, threads: int, calls: int) -> dict:
+    """
+    threads个线程共执行calls次调用，统计每次调用的延迟和总吞吐
+    """
+    request = make_request(backend)
+    calls = max(calls, threads)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(calls))
+    start_barrier = threading.Barrier(threads)
+
+    def worker():
+        local_latencies, local_errors = [], []
+        start_barrier.wait()
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            start = time.perf_counter()
+            try:
+                result = make_call(request, op, index)
+                if not result:
+                    local_errors.append('empty result')
+            except Exception as e:
+                local_errors.append(str(e).splitlines()[0] if str(e) else type(e).__name__)
+            local_latencies.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local_latencies)
+            errors.extend(local_errors)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    begin = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+
+    latencies.sort()
+    return {
+        'backend': backend,
+        'op': op,
+        'threads': threads,
+        'calls': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+        'throughput_per_s': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def warm_up(backend: str, op: str) -> str:
+    """
+    预热后端（启动进程池的全部进程、编译上下文），返回不可用的原因，可用时返回空字符串
+    """
+    request = make_request(backend)
+    # 进程池的每个进程同时各执行一次，避免后启动的进程的启动时间计入测试结果
+    count = get_sign_pool().size if backend == 'pool' else 1
+    reasons = [''] * count
+
+    def call(index: int):
+        try:
+            if not make_call(request, op, index):
+                reasons[index] = 'empty result'
+        except Exception as e:
+            reasons[index] = str(e).splitlines()[0] if str(e) else type(e).__name__
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return next((reason for reason in reasons if reason), '')
+
+
+def environment() -> dict:
+    try:
+        node = subprocess.run(['node', '--version'], capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        node = None
+    js_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib', 'js')
+    js_hashes = {}
+    for name in JS_FILES:
+        path = os.path.join(js_dir, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                js_hashes[name] = hashlib.sha1(f.read()).hexdigest()[:12]
+    return {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'node': node,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'js_sha1': js_hashes,
+    }
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """
+    与基线结果对比，返回p95变慢超过容差的条目
+    """
+    old = {(r['backend'], r['op'], r['threads']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = old.get((result['backend'], result['op'], result['threads']))
+        if not before or not before.get('p95_ms') or 'skipped' in before or 'skipped' in result:
+            continue
+        ratio = result['p95_ms'] / before['p95_ms']
+        if ratio > 1 + tolerance:
+            regressions.append({
+                'backend': result['backend'], 'op': result['op'], 'threads': result['threads'],
+                'p95_ms_before': before['p95_ms'], 'p95_ms_after': result['p95_ms'], 'ratio': round(ratio, 2),
+            })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='签名后端基准测试')
+    parser.add_argument('-b', '--backends', nargs='+', choices=BACKENDS, default=BACKENDS, help='要测试的签名后端')
+    parser.add_argument('-p', '--ops', nargs='+', choices=list(OPERATIONS), default=list(OPERATIONS), help='要测试的签名调用')
+    parser.add_argument('-t', '--threads', nargs='+', type=int, default=[1, 8, 32], help='并发线程数')
+    parser.add_argument('-n', '--calls', type=int, default=64, help='每组测试的总调用次数')
+    parser.add_argument('-o', '--output', default='', help='结果JSON文件，默认输出到标准输出')
+    parser.add_argument('--baseline', default='', help='用于对比的历史结果JSON')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='p95允许变慢的比例')
+    args = parser.parse_args()
+
+    # 签名过程中的日志会干扰计时，只保留警告以上
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    results = []
+    for backend in args.backends:
+        for op in args.ops:
+            reason = warm_up(backend, op)
+            if reason:
+                logger.warning(f'跳过 {backend}/{op}: {reason}')
+                results.append({'backend': backend, 'op': op, 'skipped': reason})
+                continue
+            for threads in args.threads:
+                result = run_case(backend, op, threads, args.calls)
+                print(f"{backend:>7} {op:<12} {threads:>3}线程  p50 {result['p50_ms']:>9.2f}ms  "
+                      f"p95 {result['p95_ms']:>9.2f}ms  p99 {result['p99_ms']:>9.2f}ms  "
+                      f"{result['throughput_per_s']:>9.2f}次/秒  失败 {result['errors']}", file=sys.stderr)
+                results.append(result)
+
+    report = {'environment': environment(), 'calls': args.calls, 'results': results}
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            report['regressions'] = compare(results, json.load(f), args.tolerance)
+        for item in report['regressions']:
+            logger.warning(f"性能回退 {item['backend']}/{item['op']} {item['threads']}线程: "
+                           f"p95 {item['p95_ms_before']}ms -> {item['p95_ms_after']}ms")
+        exit_code = 1 if report['regressions'] else 0
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    # 关闭常驻签名进程
+    if 'pool' in args.backends:
+        get_sign_pool().close()
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
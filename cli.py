@@ -41,11 +41,13 @@ print(banner)
               help='选填。采集类型，默认采集post作品，支持[主页作品/喜欢/音乐/话题/搜索（用户/视频/直播）/关注/粉丝/合集/收藏/视频/图文]，输入URL链接时能够自动识别部分类型。')
 @click.option('-p', '--path', type=click.STRING, default='下载', help='选填。下载文件夹，默认为[下载]')
 @click.option('-c', '--cookie', type=click.STRING, help='选填。已登录账号的cookie，可以直接填在config/cookie.txt文件中，也可在运行时手动输入，也可输入[edge/chrome]将会自动从本地浏览器读取cookie')
-def main(urls, limit, download, type, path, cookie):
+@click.option('--since', type=click.STRING, help='选填。只采集此时间之后发布的作品，格式为2024-01-01、2024-01-01 12:00或时间戳，主页作品遇到更早的作品即停止翻页')
+@click.option('--until', type=click.STRING, help='选填。只采集此时间之前发布的作品，格式同--since，只有日期时包含当天，主页作品直接从此时间开始翻页')
+def main(urls, limit, download, type, path, cookie, since, until):
     if not urls:  # 未输入目标
         if type in ['like', 'favorite', 'follow', 'fans']:
             # 直接采集本账号
-            start(urls, limit, download, type, path, cookie)
+            start(urls, limit, download, type, path, cookie, since, until)
             return
         else:
             # 提示输入目标关键词/URL链接/ID或文件路径
@@ -56,22 +58,23 @@ def main(urls, limit, download, type, path, cookie):
             with open(url, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
             if lines:
+                # 文件中多个作品链接/ID的详情请求一次批量签名
+                Douyin.presign_details(lines, type, cookie)
                 for line in lines:
-                    start(line, limit, download, type, path, cookie)
+                    start(line, limit, download, type, path, cookie, since, until)
             else:
                 logger.error(f'[{url}]中没有发现目标URL')
         else:
-            start(url, limit, download, type, path, cookie)
+            start(url, limit, download, type, path, cookie, since, until)
 
 
-def start(url, limit, download, type, path, cookie):
-    a = Douyin(url, limit, type, path, cookie)
-    a.run()
+def start(url, limit, download, type, path, cookie, since=None, until=None):
+    a = Douyin(url, limit, type, path, cookie, since=since, until=until)
+    # 需要下载时边采集边下载，第一页采集完成后就开始下载
+    a.run(download=not download)
 
     if download or a.type in ['user', 'follow', 'fans', 'live']:
         logger.info('不需要下载')
-        return
-    a.download_all()
 
 
 if __name__ == "__main__":
@@ -14,7 +14,12 @@ import os
 import sys
 import random
 from datetime import datetime, timedelta
+from lib.breaker import CircuitOpenError
+from lib.cancel import CancelToken
+from lib.cookie_pool import check_cookie, configure_cookie_pool
+from lib.proxy_pool import resolve_proxy_url
 from lib.douyin import Douyin
+from lib.retry import RetryBudget
 from lib.util import save_json
 from database import DouyinDatabase
 from auth_client import AuthClient
@@ -91,6 +96,8 @@ class DouyinMonitor:
         # 监控状态
         self.is_monitoring = False
         self.monitor_thread = None
+        # 停止监控时取消正在进行的主页检查，每次开始监控时重新创建
+        self.cancel_token = CancelToken()
 
         # 认证状态跟踪
         self.last_auth_check = None
@@ -763,7 +770,9 @@ class DouyinMonitor:
             "time_filter_type": "all",  # 时间过滤类型: hour/day/month/all
             "time_filter_value": 1,  # 时间过滤数值
             "use_proxy": False,
-            "proxy_url": ""
+            "proxy_url": "",
+            "cookie_pool": [],  # 界面中Cookie以外的其他账号Cookie，监控和下载分散到所有账号
+            "cookie_check_interval": 1800  # 多账号时每个账号的验证间隔（秒），验证失败的账号移出轮换
         }
         
         if os.path.exists(self.config_file):
@@ -814,6 +823,7 @@ class DouyinMonitor:
         # Cookie设置
         ttk.Label(self.config_frame, text="Cookie:").grid(row=0, column=0, sticky=tk.W, padx=(0, 5))
         self.cookie_var = tk.StringVar(value=self.config.get("cookie", ""))
+        self.update_cookie_pool()
         cookie_entry = ttk.Entry(self.config_frame, textvariable=self.cookie_var, width=50)
         cookie_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 5))
         help_btn = ttk.Button(self.config_frame, text="如何提取", command=self.show_cookie_guide)
@@ -905,7 +915,7 @@ class DouyinMonitor:
         self.proxy_var = tk.StringVar(value=self.config.get("proxy_url", ""))
         self.proxy_entry = ttk.Entry(proxy_frame, textvariable=self.proxy_var, width=30, state='disabled' if not self.use_proxy_var.get() else 'normal')
         self.proxy_entry.grid(row=0, column=1)
-        ttk.Label(proxy_frame, text="(格式: ip:port 或 http://ip:port 或 socks5://ip:port)").grid(row=0, column=2, padx=(10, 0))
+        ttk.Label(proxy_frame, text="(格式: ip:port 或 http://ip:port 或 socks5://ip:port，多个代理用逗号分隔或填写代理文件路径)").grid(row=0, column=2, padx=(10, 0))
 
         # 个人主页管理区域
         homepage_frame = ttk.LabelFrame(main_frame, text="个人主页管理", padding="5")
@@ -1086,6 +1096,19 @@ class DouyinMonitor:
         state = 'normal' if self.use_proxy_var.get() else 'disabled'
         self.proxy_entry.config(state=state)
 
+    def update_cookie_pool(self):
+        """
+        界面中的Cookie和配置中cookie_pool的账号组成cookie池；只在界面线程中调用（Tk变量不是线程安全的），
+        在创建界面、保存配置和开始监控时更新，监控线程只使用self.cookie_pool
+        """
+        self.cookie_pool = configure_cookie_pool([self.cookie_var.get()] + list(self.config.get('cookie_pool') or []))
+
+    def get_proxy_url(self):
+        """勾选使用代理时返回填写的代理，填写了多个代理（逗号分隔）或代理文件时使用代理池"""
+        if not self.use_proxy_var.get():
+            return ''
+        return resolve_proxy_url(self.proxy_var.get())
+
     def browse_download_path(self):
         """浏览并选择下载路径"""
         # 获取当前路径
@@ -1263,6 +1286,7 @@ class DouyinMonitor:
             self.config['proxy_url'] = self.proxy_var.get()
             self.update_homepage_config()
             self.save_config()
+            self.update_cookie_pool()
 
             if show_message:
                 messagebox.showinfo("成功", "配置已保存")
@@ -1303,6 +1327,9 @@ class DouyinMonitor:
             # 不阻止监控启动，只是记录错误
 
         self.is_monitoring = True
+        self.cancel_token = CancelToken()
+        # 监控线程使用此时的cookie池，不再读取界面中的Cookie
+        self.update_cookie_pool()
         self.start_btn.config(state=tk.DISABLED)
         self.stop_btn.config(state=tk.NORMAL)
 
@@ -1462,20 +1489,25 @@ class DouyinMonitor:
                     self.log_message(f"未设置时间过滤，初始下载获取最近{limit}个视频")
 
                 # 获取视频
-                proxy_url = self.proxy_var.get() if self.use_proxy_var.get() else ''
-                douyin = Douyin(
-                    target=homepage_url,
-                    limit=limit,  # 根据时间过滤动态设置
-                    type='post',
-                    down_path=self.path_var.get(),
-                    cookie=self.cookie_var.get(),
-                    proxy_url=proxy_url
-                )
-                # 设置标记以确保json_save_path被正确设置
-                douyin._skip_user_folder = True
-                # 手动初始化json_save_path
-                douyin.json_save_path = douyin.down_path
-                videos = douyin.get_awemes()
+                proxy_url = self.get_proxy_url()
+                account = self.cookie_pool.acquire()
+                try:
+                    douyin = Douyin(
+                        target=homepage_url,
+                        limit=limit,  # 根据时间过滤动态设置
+                        type='post',
+                        down_path=self.path_var.get(),
+                        cookie=account.cookie,
+                        proxy_url=proxy_url
+                    )
+                    # 设置标记以确保json_save_path被正确设置
+                    douyin._skip_user_folder = True
+                    # 手动初始化json_save_path
+                    douyin.json_save_path = douyin.down_path
+                    videos = douyin.get_awemes()
+                finally:
+                    # 获取完作品列表后归还账号
+                    self.cookie_pool.release(account)
 
                 if videos:
                     # 根据监控分钟设置决定下载策略（从配置中获取，确保一致性）
@@ -1528,32 +1560,37 @@ class DouyinMonitor:
                             self.log_message(f"下载视频 {i+1}/{len(videos_to_download)}: {video_title}")
 
                             # 创建单个视频下载实例
-                            single_douyin = Douyin(
-                                target=homepage_url,
-                                limit=1,
-                                type='post',
-                                down_path=self.path_var.get(),
-                                cookie=self.cookie_var.get(),
-                                proxy_url=proxy_url
-                            )
-                            # 设置标记以确保json_save_path被正确设置
-                            single_douyin._skip_user_folder = True
-                            # 手动初始化json_save_path
-                            single_douyin.json_save_path = single_douyin.down_path
-                            single_douyin.results = [video]
-                            # 将aria2配置文件放在系统临时目录，避免在下载目录中生成temp文件
-                            import tempfile
-                            temp_dir = tempfile.gettempdir()
-                            single_douyin.aria2_conf = os.path.join(temp_dir, f'douyin_temp_{video["id"]}.txt')
-                            single_douyin.save()
-
-                            # 执行下载并捕获异常
+                            account = self.cookie_pool.acquire()
                             try:
-                                single_douyin.download_all()
-                            except Exception as download_error:
-                                self.log_message(f"下载出错: {video_title} - {download_error}")
-                                # 继续下一个视频，不记录到数据库
-                                continue
+                                single_douyin = Douyin(
+                                    target=homepage_url,
+                                    limit=1,
+                                    type='post',
+                                    down_path=self.path_var.get(),
+                                    cookie=account.cookie,
+                                    proxy_url=proxy_url
+                                )
+                                # 设置标记以确保json_save_path被正确设置
+                                single_douyin._skip_user_folder = True
+                                # 手动初始化json_save_path
+                                single_douyin.json_save_path = single_douyin.down_path
+                                single_douyin.results = [video]
+                                # 将aria2配置文件放在系统临时目录，避免在下载目录中生成temp文件
+                                import tempfile
+                                temp_dir = tempfile.gettempdir()
+                                single_douyin.aria2_conf = os.path.join(temp_dir, f'douyin_temp_{video["id"]}.txt')
+                                single_douyin.save()
+
+                                # 执行下载并捕获异常
+                                try:
+                                    single_douyin.download_all()
+                                except Exception as download_error:
+                                    self.log_message(f"下载出错: {video_title} - {download_error}")
+                                    # 继续下一个视频，不记录到数据库
+                                    continue
+                            finally:
+                                # 下载完成后归还账号，下载请求同样带着这个账号的Cookie
+                                self.cookie_pool.release(account)
 
                             # 记录到数据库
                             video_full_title = f"{video['desc']}_{video['time']}"
@@ -1630,7 +1667,18 @@ class DouyinMonitor:
         """异步检查所有主页（在后台线程中执行）"""
         total_new_videos = 0
 
-        for item in self.homepage_tree.get_children():
+        proxy_url = self.get_proxy_url()
+        cookie_pool = self.cookie_pool
+
+        # 多账号时按间隔验证每个账号，验证失败的账号移出轮换
+        if len(cookie_pool) > 1:
+            available = cookie_pool.validate(lambda cookie: check_cookie(cookie, proxy_url),
+                                             self.config.get('cookie_check_interval', 1800))
+            self.log_message(f"可用账号: {available}/{len(cookie_pool)}")
+
+        items = self.homepage_tree.get_children()
+        homepage_urls = [str(self.homepage_tree.item(item)['values'][0]) for item in items]
+        for index, item in enumerate(items):
             if not self.is_monitoring:
                 break
 
@@ -1641,6 +1689,14 @@ class DouyinMonitor:
             values = list(self.homepage_tree.item(item)['values'])
             homepage_url = str(values[0])
 
+            # 主页第一页作品的请求参数分批批量签名，每批在检查到第一个主页时签名，主页较多时后面的签名不会过期；
+            # 签名和Cookie绑定，多账号时检查时才分配账号，由各次检查单独签名
+            if len(cookie_pool) <= 1:
+                try:
+                    Douyin.presign_homepages(homepage_urls, (cookie_pool.cookies() or [''])[0], proxy_url, index)
+                except Exception as e:
+                    self.log_message(f"批量签名失败，检查时单独签名: {e}")
+
             try:
                 # 更新状态为检查中
                 values[1] = '检查中'
@@ -1688,6 +1744,8 @@ class DouyinMonitor:
     def stop_monitoring(self):
         """停止监控"""
         self.is_monitoring = False
+        # 正在进行的检查在下一次请求或等待时中断
+        self.cancel_token.cancel()
         self.start_btn.config(state=tk.NORMAL)
         self.stop_btn.config(state=tk.DISABLED)
 
@@ -1716,23 +1774,34 @@ class DouyinMonitor:
                 except ValueError:
                     pass  # 使用默认值
 
-            # 创建Douyin实例
-            proxy_url = self.proxy_var.get() if self.use_proxy_var.get() else ''
-            douyin = Douyin(
-                target=homepage_url,
-                limit=limit,
-                type='post',
-                down_path=self.path_var.get(),
-                cookie=self.cookie_var.get(),
-                proxy_url=proxy_url
-            )
-            # 设置标记以确保json_save_path被正确设置
-            douyin._skip_user_folder = True
-            # 手动初始化json_save_path
-            douyin.json_save_path = douyin.down_path
+            # 创建Douyin实例，多账号时轮流使用各账号
+            proxy_url = self.get_proxy_url()
+            account = self.cookie_pool.acquire()
+            try:
+                douyin = Douyin(
+                    target=homepage_url,
+                    limit=limit,
+                    type='post',
+                    down_path=self.path_var.get(),
+                    cookie=account.cookie,
+                    proxy_url=proxy_url
+                )
+                # 设置标记以确保json_save_path被正确设置
+                douyin._skip_user_folder = True
+                # 手动初始化json_save_path
+                douyin.json_save_path = douyin.down_path
             
-            # 获取视频列表
-            videos = douyin.get_awemes()
+                # 获取视频列表，所有重试共用一个预算，超时后抛出RetryBudgetExceeded，停止监控时抛出OperationCancelled，由调用方记为检查失败
+                with self.cancel_token.scope(), RetryBudget():
+                    try:
+                        videos = douyin.get_awemes()
+                    except CircuitOpenError as e:
+                        # 账号熔断中，暂停分配此账号，其他账号继续检查
+                        self.cookie_pool.pause(account.cookie, e.retry_after, str(e))
+                        raise
+            finally:
+                # 获取完作品列表后归还账号
+                self.cookie_pool.release(account)
             
             if not videos:
                 return []
@@ -1842,44 +1911,49 @@ class DouyinMonitor:
                 self.log_message(f"下载视频 {i+1}/{len(videos_to_download)}: {video_title}")
 
                 # 创建单个视频的Douyin实例
-                proxy_url = self.proxy_var.get() if self.use_proxy_var.get() else ''
-                single_douyin = Douyin(
-                    target=homepage_url,
-                    limit=1,
-                    type='post',
-                    down_path=self.path_var.get(),
-                    cookie=self.cookie_var.get(),
-                    proxy_url=proxy_url
-                )
-                # 设置标记以确保json_save_path被正确设置
-                single_douyin._skip_user_folder = True
-                # 手动初始化json_save_path
-                single_douyin.json_save_path = single_douyin.down_path
-
-                # 设置单个视频结果
-                single_douyin.results = [video]
-
-                # 将aria2配置文件放在系统临时目录，避免在下载目录中生成temp文件
-                import tempfile
-                temp_dir = tempfile.gettempdir()
-                single_douyin.aria2_conf = os.path.join(temp_dir, f'douyin_temp_{video["id"]}.txt')
-
-                # 保存和下载
-                single_douyin.save()
-
-                # 执行下载并捕获异常
+                proxy_url = self.get_proxy_url()
+                account = self.cookie_pool.acquire()
                 try:
-                    single_douyin.download_all()
-                except Exception as download_error:
-                    self.log_message(f"下载出错: {video_title} - {download_error}")
-                    # 清理临时aria2配置文件
+                    single_douyin = Douyin(
+                        target=homepage_url,
+                        limit=1,
+                        type='post',
+                        down_path=self.path_var.get(),
+                        cookie=account.cookie,
+                        proxy_url=proxy_url
+                    )
+                    # 设置标记以确保json_save_path被正确设置
+                    single_douyin._skip_user_folder = True
+                    # 手动初始化json_save_path
+                    single_douyin.json_save_path = single_douyin.down_path
+
+                    # 设置单个视频结果
+                    single_douyin.results = [video]
+
+                    # 将aria2配置文件放在系统临时目录，避免在下载目录中生成temp文件
+                    import tempfile
+                    temp_dir = tempfile.gettempdir()
+                    single_douyin.aria2_conf = os.path.join(temp_dir, f'douyin_temp_{video["id"]}.txt')
+
+                    # 保存和下载
+                    single_douyin.save()
+
+                    # 执行下载并捕获异常
                     try:
-                        if os.path.exists(single_douyin.aria2_conf):
-                            os.remove(single_douyin.aria2_conf)
-                    except:
-                        pass
-                    # 继续下一个视频，不记录到数据库
-                    continue
+                        single_douyin.download_all()
+                    except Exception as download_error:
+                        self.log_message(f"下载出错: {video_title} - {download_error}")
+                        # 清理临时aria2配置文件
+                        try:
+                            if os.path.exists(single_douyin.aria2_conf):
+                                os.remove(single_douyin.aria2_conf)
+                        except:
+                            pass
+                        # 继续下一个视频，不记录到数据库
+                        continue
+                finally:
+                    # 下载完成后归还账号，下载请求同样带着这个账号的Cookie
+                    self.cookie_pool.release(account)
 
                 # 清理临时aria2配置文件
                 try:
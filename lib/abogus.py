@@ -0,0 +1,278 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   abogus.py
+@Desc    :   a_bogus签名的纯Python实现，与 lib/js/douyin.js 的 sign_datail/sign_reply 算法一致，无需node
+'''
+import hashlib
+import random
+import time
+
+# 与JS中 "1536|747|1536|834|0|30|0|0|1536|834|1536|864|1525|747|24|24|Win32" 相同的窗口环境
+WINDOW_ENV_STR = '1536|747|1536|834|0|30|0|0|1536|834|1536|864|1525|747|24|24|Win32'
+
+S_OBJ = {
+    's0': 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=',
+    's1': 'Dkdpgh4ZKsQB80/Mfvw36XI1R25+WUAlEi7NLboqYTOPuzmFjJnryx9HVGcaStCe=',
+    's2': 'Dkdpgh4ZKsQB80/Mfvw36XI1R25-WUAlEi7NLboqYTOPuzmFjJnryx9HVGcaStCe=',
+    's3': 'ckdp1h4ZKsUB80/Mfvw36XIgR25+WQAlEi7NLboqYTOPuzmFjJnryx9HVGDaStCe',
+    's4': 'Dkdpgh2ZmsQB80/MfvV36XI1R45-WUAlEixNLwoqYTOPuzKFjJnry79HbGcaStCe',
+}
+
+_SM3_IV = [1937774191, 1226093241, 388252375, 3666478592, 2842636476, 372324522, 3817729613, 2969243214]
+_MASK = 0xFFFFFFFF
+
+
+def _rotl(x: int, n: int) -> int:
+    n %= 32
+    return ((x << n) | (x >> (32 - n))) & _MASK
+
+
+# 压缩函数中每轮使用的常量 le(de(j), j)
+_SM3_T = [_rotl(2043430169 if j < 16 else 2055708042, j) for j in range(64)]
+
+
+def _sm3_compress(reg: list, block: bytes) -> list:
+    w = [int.from_bytes(block[i:i + 4], 'big') for i in range(0, 64, 4)]
+    for j in range(16, 68):
+        a = w[j - 16] ^ w[j - 9] ^ _rotl(w[j - 3], 15)
+        a = a ^ _rotl(a, 15) ^ _rotl(a, 23)
+        w.append(a ^ _rotl(w[j - 13], 7) ^ w[j - 6])
+    a, b, c, d, e, f, g, h = reg
+    for j in range(64):
+        a12 = _rotl(a, 12)
+        ss1 = _rotl((a12 + e + _SM3_T[j]) & _MASK, 7)
+        ss2 = ss1 ^ a12
+        if j < 16:
+            ff = a ^ b ^ c
+            gg = e ^ f ^ g
+        else:
+            ff = (a & b) | (a & c) | (b & c)
+            gg = (e & f) | (~e & g)
+        tt1 = (ff + d + ss2 + (w[j] ^ w[j + 4])) & _MASK
+        tt2 = (gg + h + ss1 + w[j]) & _MASK
+        a, b, c, d = tt1, a, _rotl(b, 9), c
+        e, f, g, h = tt2 ^ _rotl(tt2, 9) ^ _rotl(tt2, 17), e, _rotl(f, 19), g
+    return [x ^ y for x, y in zip(reg, [a, b, c, d, e, f, g, h])]
+
+
+def _sm3_python(data: bytes) -> bytes:
+    length = len(data) * 8
+    data = data + b'\x80' + b'\x00' * ((55 - len(data)) % 64) + length.to_bytes(8, 'big')
+    reg = list(_SM3_IV)
+    for i in range(0, len(data), 64):
+        reg = _sm3_compress(reg, data[i:i + 64])
+    return b''.join(x.to_bytes(4, 'big') for x in reg)
+
+
+def _sm3_hashlib(data: bytes) -> bytes:
+    return hashlib.new('sm3', data).digest()
+
+
+# OpenSSL提供sm3时直接使用，否则使用纯Python实现，两者结果一致
+try:
+    hashlib.new('sm3')
+    sm3_digest = _sm3_hashlib
+except ValueError:
+    sm3_digest = _sm3_python
+
+
+def sm3_sum(data) -> list:
+    """
+    对应JS中的 new SM3().sum(data)，字符串按UTF-8编码，返回32个字节值的列表
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return list(sm3_digest(bytes(data)))
+
+
+def rc4_encrypt(plaintext: str, key: str) -> str:
+    s = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j + s[i] + ord(key[i % len(key)])) % 256
+        s[i], s[j] = s[j], s[i]
+    i = j = 0
+    cipher = []
+    for char in plaintext:
+        i = (i + 1) % 256
+        j = (j + s[i]) % 256
+        s[i], s[j] = s[j], s[i]
+        cipher.append(chr(s[(s[i] + s[j]) % 256] ^ ord(char)))
+    return ''.join(cipher)
+
+
+def result_encrypt(long_str: str, num: str = None) -> str:
+    table = S_OBJ[num]
+    # JS中越界的charCodeAt为NaN，参与位运算时按0处理
+    codes = [ord(char) for char in long_str] + [0, 0, 0]
+    result = []
+    # JS循环条件为 i < long_str.length / 3 * 4（浮点比较）
+    total = len(long_str) * 4
+    i = 0
+    while i * 3 < total:
+        if i % 4 == 0:
+            n = i // 4 * 3
+            long_int = (codes[n] << 16) | (codes[n + 1] << 8) | codes[n + 2]
+        result.append(table[(long_int >> (18 - 6 * (i % 4))) & 63])
+        i += 1
+    return ''.join(result)
+
+
+def gener_random(random_num: float, option: list) -> list:
+    random_num = int(random_num)
+    return [
+        (random_num & 255 & 170) | option[0] & 85,
+        (random_num & 255 & 85) | option[0] & 170,
+        (random_num >> 8 & 255 & 170) | option[1] & 85,
+        (random_num >> 8 & 255 & 85) | option[1] & 170,
+    ]
+
+
+def generate_random_str(random_values: list = None) -> str:
+    """
+    random_values为3个[0, 1)之间的随机数，不传时使用random.random()，传入固定值可得到确定的结果
+    """
+    if random_values is None:
+        random_values = [random.random() for _ in range(3)]
+    random_str_list = []
+    for value, option in zip(random_values, [[3, 45], [1, 0], [1, 5]]):
+        random_str_list.extend(gener_random(value * 10000, option))
+    return ''.join(map(chr, random_str_list))
+
+
+def _bytes4(num: int) -> list:
+    """按JS的 (num >> 24) & 255 ... num & 255 取低32位的4个字节"""
+    num &= _MASK
+    return [(num >> 24) & 255, (num >> 16) & 255, (num >> 8) & 255, num & 255]
+
+
+def generate_rc4_bb_str(url_search_params: str, user_agent: str, window_env_str: str, suffix: str = 'cus',
+                        args: list = None, start_time: int = None, end_time: int = None) -> str:
+    if args is None:
+        args = [0, 1, 14]
+    if start_time is None:
+        start_time = int(time.time() * 1000)
+    # url_search_params两次sm3之的结果
+    url_search_params_list = sm3_sum(sm3_sum(url_search_params + suffix))
+    # 对后缀两次sm3之的结果
+    cus = sm3_sum(sm3_sum(suffix))
+    # 对ua处理之后的结果
+    ua = sm3_sum(result_encrypt(rc4_encrypt(user_agent, ''.join(map(chr, [0, 1, args[2]]))), 's3'))
+    if end_time is None:
+        end_time = int(time.time() * 1000)
+
+    page_id = 6241
+    aid = 6383
+    b = {18: 44, 48: 3}
+    # 3次加密开始时间
+    b[20], b[21], b[22], b[23] = _bytes4(start_time)
+    b[24] = int(start_time / 4294967296)
+    b[25] = int(start_time / 1099511627776)
+    # 参数args [0, 1, 14]
+    b[26], b[27], b[28], b[29] = _bytes4(args[0])
+    b[30] = int(args[1] / 256) & 255
+    b[31] = (args[1] % 256) & 255
+    b[32] = (args[1] >> 24) & 255
+    b[33] = (args[1] >> 16) & 255
+    b[34], b[35], b[36], b[37] = _bytes4(args[2])
+    b[38], b[39] = url_search_params_list[21], url_search_params_list[22]
+    b[40], b[41] = cus[21], cus[22]
+    b[42], b[43] = ua[23], ua[24]
+    # 3次加密结束时间
+    b[44], b[45], b[46], b[47] = _bytes4(end_time)
+    b[49] = int(end_time / 4294967296)
+    b[50] = int(end_time / 1099511627776)
+    # object配置项
+    b[52], b[53], b[54], b[55] = _bytes4(page_id)
+    b[57] = aid & 255
+    b[58] = (aid >> 8) & 255
+    b[59] = (aid >> 16) & 255
+    b[60] = (aid >> 24) & 255
+
+    window_env_list = [ord(char) for char in window_env_str]
+    b[65] = len(window_env_list) & 255
+    b[66] = (len(window_env_list) >> 8) & 255
+    b[70] = 0
+    b[71] = 0
+
+    b[72] = 0
+    for index in [18, 20, 26, 30, 38, 40, 42, 21, 27, 31, 35, 39, 41, 43, 22, 28, 32, 36, 23, 29, 33, 37, 44, 45,
+                  46, 47, 48, 49, 50, 24, 25, 52, 53, 54, 55, 57, 58, 59, 60, 65, 66, 70, 71]:
+        b[72] ^= b[index]
+    bb = [b[index] for index in [
+        18, 20, 52, 26, 30, 34, 58, 38, 40, 53, 42, 21, 27, 54, 55, 31, 35, 57, 39, 41, 43, 22, 28, 32, 60, 36,
+        23, 29, 33, 37, 44, 45, 59, 46, 47, 48, 49, 50, 24, 25, 65, 66, 70, 71]]
+    bb = bb + window_env_list + [b[72]]
+    return rc4_encrypt(''.join(map(chr, bb)), chr(121))
+
+
+def sign(url_search_params: str, user_agent: str, args: list, random_values: list = None,
+         start_time: int = None, end_time: int = None) -> str:
+    result_str = generate_random_str(random_values) + generate_rc4_bb_str(
+        url_search_params, user_agent, WINDOW_ENV_STR, 'cus', args, start_time, end_time)
+    return result_encrypt(result_str, 's4') + '='
+
+
+def sign_datail(params: str, user_agent: str, **kwargs) -> str:
+    return sign(params, user_agent, [0, 1, 14], **kwargs)
+
+
+def sign_reply(params: str, user_agent: str, **kwargs) -> str:
+    return sign(params, user_agent, [0, 1, 8], **kwargs)
+
+
+# 固定随机数和时间下由 lib/js/douyin.js 生成的结果，用于校验与JS实现一致
+_UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36'
+GOLDEN_VECTORS = [
+    {
+        'fn': 'sign_datail',
+        'params': 'device_platform=webapp&aid=6383&channel=channel_pc_web&sec_user_id=MS4wLjABAAAA8Ag2TMrWvfZWpLywypFRGhoL2_A8FdXawWfuh29bJWCJ_BCr23KY0S9O76eC4_oC&max_cursor=0&count=18',
+        'ua': _UA, 'random_values': [0.1, 0.2, 0.3], 'start_time': 1769651900000, 'end_time': 1769651900003,
+        'expected': 'O6mZQRhfDEITgDSk5R/LfY3q6V33YgEQ0trEMD2foVV-Cg39HMTE9exoLdsv8/DjEs/8IeYjy4hbT3ohrQ2y8qwf9W0L/25gsDSkKl12so0j53inCLf/E0iE5hsAtFH8svr4iKi8owICSYyhldAJ5kIlO62-zo0/9fR=',
+    },
+    {
+        'fn': 'sign_reply',
+        'params': 'aweme_id=7530495662610238766&cursor=0&count=20',
+        'ua': _UA, 'random_values': [0.999, 0.5, 0.0001], 'start_time': 1700000000000, 'end_time': 1700000000011,
+        'expected': 'DjRqBRLDDigkDf6D56KLfY3q6AF3YmxI0trEMD2fzxf9qL39HMYD9exEIBGvXYEjwG/-IeYjy4hbT3ohrQ2y8qwf9W0L/25gsDSkKl12so0j53inCLf/E0iE5hsAtFH8svr4iKi8owICSYyhldAJ5kIlO62-zo0/9R6=',
+    },
+    {
+        'fn': 'sign_datail',
+        'params': '',
+        'ua': 'UA', 'random_values': [0, 0, 0], 'start_time': 0, 'end_time': 0,
+        'expected': 'DfmhQDgDDDDkDD6D5RVLfY3q6fe3Ysir0trEMD2fvxfJtL39HMYD9exow7zvMY8jZsmfIFYjy4hbT3ohrQ2y8qwf9W0L/25gsDSkKl12so0j53inCLf/E0iE5hsAtFH8svr4iKi8owICSYyhldAJ5kIlO62-zo0/9Ru=',
+    },
+    {
+        'fn': 'sign_datail',
+        'params': 'keyword=%E6%B5%8B%E8%AF%95&offset=18&中文=值',
+        'ua': _UA, 'random_values': [0.123456, 0.654321, 0.5], 'start_time': 1769651900123, 'end_time': 1769651900456,
+        'expected': 'E7mhBmuhdk2sDDWv5R/LfY3q6fH3YgEQ0trEMD2fXnV-Cg39HMP-9exoLdsvBOujEs/8IeYjy4hbT3ohrQ2y8qwf9W0L/25gsDSkKl12so0j53inCLf/E0iE5hsAtFH8svr4iKi8owICSYyhldAJ5kIlO62-zo0/9fS=',
+    },
+]
+
+
+def verify() -> bool:
+    """
+    用固定向量校验纯Python实现（包括sm3的两种实现）与JS结果一致
+    """
+    global sm3_digest
+    default = sm3_digest
+    implementations = [_sm3_python] + ([_sm3_hashlib] if default is _sm3_hashlib else [])
+    ok = True
+    try:
+        for sm3_digest in implementations:
+            for vector in GOLDEN_VECTORS:
+                result = globals()[vector['fn']](
+                    vector['params'], vector['ua'], random_values=vector['random_values'],
+                    start_time=vector['start_time'], end_time=vector['end_time'])
+                if result != vector['expected']:
+                    ok = False
+                    print(f"不一致[{sm3_digest.__name__}] {vector['fn']}({vector['params'][:40]}): {result}")
+    finally:
+        sm3_digest = default
+    return ok
+
+
+if __name__ == "__main__":
+    print('校验通过' if verify() else '校验失败')
+    print(sign_datail('device_platform=webapp&aid=6383', _UA))
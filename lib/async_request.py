@@ -0,0 +1,242 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   async_request.py
+@Desc    :   基于asyncio的请求引擎，参数补全和签名流程与Request一致，一个事件循环即可同时处理大量请求
+'''
+import asyncio
+import os
+import time
+import urllib.parse
+
+import ujson as json
+from loguru import logger
+
+try:
+    from . import cancel
+    from .request import Request
+    from . import fastjson
+    from .metrics import get_api_stats
+    from .retry import current_budget
+    from .session import HttpSession
+except ImportError:
+    # 当作为独立模块运行时使用绝对导入
+    import cancel
+    from request import Request
+    import fastjson
+    from metrics import get_api_stats
+    from retry import current_budget
+    from session import HttpSession
+
+# aiohttp为可选依赖，未安装时只能使用同步的Request
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# socks代理需要aiohttp_socks
+try:
+    from aiohttp_socks import ProxyConnector
+    AIOHTTP_SOCKS_AVAILABLE = True
+except ImportError:
+    AIOHTTP_SOCKS_AVAILABLE = False
+
+
+class AsyncRequest(Request):
+    """
+    Request的异步版本
+
+    get_params/get_fingerprint和签名后端与Request共用，签名等阻塞操作放到线程中执行；
+    连接由aiohttp连接池复用，limit为总连接数，limit_per_host为单个域名的并发连接数，超出的请求在连接池中排队；
+    取消协程即可取消对应的请求。同一个实例只能在创建它的事件循环中使用
+    """
+
+    LIMIT = 1000
+    LIMIT_PER_HOST = 64
+    TIMEOUT = 30
+
+    def __init__(self, cookie='', UA='', proxy_url='', signer='', limit: int = 0, limit_per_host: int = 0,
+                 timeout: float = 0, limiter=None, breaker=None):
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError('AsyncRequest需要aiohttp: pip install aiohttp')
+        super().__init__(cookie, UA, proxy_url, signer, limiter=limiter, breaker=breaker)
+        if self.proxy_pool is not None:
+            # socks代理需要为每个代理单独建立连接器，异步请求只支持单个代理
+            raise ValueError('异步请求不支持代理池，请使用单个代理')
+        self.limit = limit or self.LIMIT
+        self.limit_per_host = limit_per_host or self.LIMIT_PER_HOST
+        self.timeout = timeout or self.TIMEOUT
+        self.client = None
+        self.proxy = None
+        if self.proxies:
+            proxy = self.proxies.get('http')
+            if proxy.startswith('socks') and not AIOHTTP_SOCKS_AVAILABLE:
+                raise ImportError('异步请求使用socks代理需要aiohttp_socks: pip install aiohttp_socks')
+            self.proxy = proxy
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def _client(self) -> 'aiohttp.ClientSession':
+        if self.client is None or self.client.closed:
+            if self.proxy and self.proxy.startswith('socks'):
+                connector = ProxyConnector.from_url(self.proxy, limit=self.limit, limit_per_host=self.limit_per_host)
+            else:
+                connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                                 ttl_dns_cache=300)
+            # 与同步连接池一致，不保存响应中的cookie
+            self.client = aiohttp.ClientSession(
+                connector=connector, cookie_jar=aiohttp.DummyCookieJar(),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=HttpSession.CONNECT_TIMEOUT,
+                                              sock_read=HttpSession.READ_TIMEOUT),
+                json_serialize=json.dumps)
+        return self.client
+
+    def _headers(self, headers: dict) -> dict:
+        # cookie值中常有 = / 等字符，直接拼接请求头，避免被aiohttp加引号
+        headers = dict(headers)
+        headers['cookie'] = '; '.join([f'{k}={v}' for k, v in self.COOKIES.items()])
+        return headers
+
+    @staticmethod
+    def _query(params: dict) -> dict:
+        # 与requests一致，跳过值为None的参数，其余转为字符串
+        return {k: str(v) for k, v in params.items() if v is not None}
+
+    def _proxy(self):
+        return None if self.proxy is None or self.proxy.startswith('socks') else self.proxy
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def get_html(self, url: str) -> str:
+        # 与getHTML相同的熔断、限速和超时，结果计入熔断和限速
+        cancel.check_cancelled()
+        breaker_key = self.breaker_key()
+        self.breaker.before_request(breaker_key)
+        headers = self.HEADERS.copy()
+        headers['sec-fetch-dest'] = 'document'
+        budget = current_budget()
+        timeout = aiohttp.ClientTimeout(total=budget.timeout(self.timeout) if budget else self.timeout,
+                                        sock_connect=HttpSession.CONNECT_TIMEOUT, sock_read=HttpSession.READ_TIMEOUT)
+        key = self.rate_key(urllib.parse.urlsplit(url).path)
+        wait = self.limiter.reserve(key)
+        await cancel.async_sleep(budget.wait(wait) if budget else wait)
+        try:
+            async with self._client().get(url, headers=self._headers(headers), proxy=self._proxy(),
+                                          timeout=timeout) as response:
+                text = await response.text()
+        except Exception:
+            # 请求没有结果时也要记为失败，否则熔断中的探测请求一直不结束
+            self.breaker.failure(breaker_key)
+            raise
+        ok = response.status == 200 and text != ''
+        self.breaker.record(breaker_key, ok)
+        if not ok:
+            self.limiter.throttle(key, self.response_error(response.status, text, {}))
+            logger.error(f'HTML请求失败, url: {url}, header: {headers}')
+            return ''
+        self.limiter.success(key)
+        return text
+
+    async def head(self, url: str, allow_redirects: bool = False):
+        """
+        返回的响应已释放连接，只能读取状态码和响应头
+        """
+        async with self._client().head(url, headers=self._headers(self.HEADERS), proxy=self._proxy(),
+                                       allow_redirects=allow_redirects) as response:
+            return response
+
+    async def url_redirect(self, url: str) -> str:
+        response = await self.head(url)
+        return response.headers.get('Location', url)
+
+    async def get_json(self, uri: str, params: dict, data: dict = None, max_retries: int = 3,
+                       projection: dict = None) -> dict:
+        # get_webid可能请求首页，签名需要与node进程通信，都在线程中执行，不阻塞事件循环
+        url, params, headers = await asyncio.to_thread(self.prepare_json, uri, params)
+        headers = self._headers(headers)
+        stats = get_api_stats()
+        started = time.perf_counter()
+        method = 'POST' if data else 'GET'
+
+        # 与getJSON相同的熔断、限速、重试和状态判断
+        key = self.rate_key(uri)
+        breaker_key = self.breaker_key()
+        budget = current_budget()
+        rejected = False  # 是否有请求得到了服务器的失败响应
+        for attempt in range(max_retries):
+            cancel.check_cancelled()
+            self.breaker.before_request(breaker_key)
+            # 每次调用都传入完整的超时，timeout=None会关闭会话的全部超时
+            timeout = aiohttp.ClientTimeout(total=budget.timeout(self.timeout) if budget else self.timeout,
+                                            sock_connect=HttpSession.CONNECT_TIMEOUT, sock_read=HttpSession.READ_TIMEOUT)
+            try:
+                wait = self.limiter.reserve(key)
+                await cancel.async_sleep(budget.wait(wait) if budget else wait)
+                async with self._client().request(method, url, params=self._query(params), data=data,
+                                                  headers=headers, proxy=self._proxy(), timeout=timeout) as response:
+                    status = response.status
+                    content = await response.read()
+                json_data = None
+                if status == 200 and content:
+                    try:
+                        json_data = fastjson.decode(content, projection)
+                    except ValueError:
+                        logger.error(f'响应不是有效的JSON格式: {content[:200].decode("utf-8", "replace")}')
+                ok = self.rate_feedback(key, status, content, json_data)
+                self.breaker.record(breaker_key, ok)
+                if ok:
+                    stats.record(uri, True, attempt + 1, len(content), time.perf_counter() - started)
+                    if stats.sample(uri):
+                        self.log_call('DEBUG', method, uri, url, headers, params, self.response_summary(json_data))
+                    return json_data
+                rejected = True
+                if json_data is not None:
+                    logger.warning(f'API返回错误状态码: {json_data.get("status_code")}, 消息: {json_data.get("status_msg", "未知错误")}')
+                if attempt == max_retries - 1:
+                    logger.error(f'JSON请求失败：url: {url}, code: {status}, body: {content[:500].decode("utf-8", "replace")}')
+                    self.log_call('DEBUG', method, uri, url, headers, params, self.response_error(status, content, json_data))
+                else:
+                    logger.warning(f'请求失败，第{attempt + 1}次重试中...')
+                    if budget:
+                        budget.retry(f'{uri} {self.response_error(status, content, json_data)}')
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.breaker.failure(breaker_key)
+                if attempt == max_retries - 1:
+                    logger.error(f'网络请求异常: {e}, url: {url}')
+                else:
+                    logger.warning(f'网络请求异常，第{attempt + 1}次重试: {e}')
+                    if budget:
+                        budget.retry(f'{uri} 网络异常: {e}')
+                    await cancel.async_sleep(budget.wait(2 ** attempt) if budget else 2 ** attempt)
+
+        stats.record(uri, False, max_retries, 0, time.perf_counter() - started)
+        if rejected:
+            # 服务器拒绝过请求（错误状态码、空响应或验证页）时，删除可能无效的cookie文件和指纹；
+            # 只是网络异常或超时（代理、DNS故障）时保留，恢复后继续使用同一个设备指纹
+            if os.path.exists('cookie.json'):
+                os.remove('cookie.json')
+            self.reset_fingerprint()
+        return {}
+
+    async def get_json_many(self, uri: str, params_list: list, data: dict = None, max_retries: int = 3,
+                            projection: dict = None) -> list:
+        """
+        并发请求同一接口的多组参数，签名一次批量完成，返回与params_list顺序一致的结果
+        """
+        await asyncio.to_thread(self.presign, uri, params_list)
+        return await asyncio.gather(*[self.get_json(uri, params, data, max_retries, projection) for params in params_list])
+
+
+if __name__ == "__main__":
+    async def main():
+        async with AsyncRequest() as request:
+            print(await request.get_json('/aweme/v1/web/aweme/detail/', {'aweme_id': '7530495662610238766'}))
+
+    asyncio.run(main())
@@ -0,0 +1,145 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   breaker.py
+@Desc    :   熔断器，同一cookie和代理连续失败后暂停所有请求，到期后只放行一个探测请求，成功后恢复
+'''
+import os
+import threading
+import time
+
+from loguru import logger
+
+CLOSED = 'closed'  # 正常
+OPEN = 'open'  # 熔断中，所有请求直接失败
+HALF_OPEN = 'half_open'  # 熔断到期，正在发送探测请求
+
+
+class CircuitOpenError(Exception):
+    """熔断中，请求未发送"""
+
+    def __init__(self, key: tuple, retry_after: float):
+        self.key = key
+        self.retry_after = retry_after
+        super().__init__(f'cookie或代理连续请求失败，已暂停请求，{retry_after:.0f}秒后重试')
+
+
+class Circuit(object):
+    """
+    单个(cookie身份, 代理)的熔断状态
+    """
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0  # 连续失败次数
+        self.opens = 0  # 连续熔断次数，探测失败时熔断时间翻倍
+        self.open_until = 0.0
+        self.probe_started = 0.0
+
+
+class CircuitBreaker(object):
+    """
+    线程安全的熔断器，所有Request实例共用
+
+    连续failures次请求失败（错误状态码、空响应、网络异常）后熔断open_seconds秒，期间所有请求抛出CircuitOpenError；
+    到期后第一个请求作为探测请求发送，其余请求继续失败，探测成功则恢复，失败则熔断时间翻倍，最长max_open_seconds秒
+    """
+
+    FAILURES = int(os.environ.get('DOUYIN_BREAKER_FAILURES', 5))
+    OPEN_SECONDS = float(os.environ.get('DOUYIN_BREAKER_OPEN_SECONDS', 30))
+    MAX_OPEN_SECONDS = float(os.environ.get('DOUYIN_BREAKER_MAX_OPEN_SECONDS', 600))
+    PROBE_TIMEOUT = 60  # 探测请求超过此时间仍未返回结果时，允许发送新的探测请求
+
+    def __init__(self, failures: int = None, open_seconds: float = None, max_open_seconds: float = None):
+        self.failures = max(1, int(failures or self.FAILURES))
+        self.open_seconds = open_seconds or self.OPEN_SECONDS
+        self.max_open_seconds = max(self.open_seconds, max_open_seconds or self.MAX_OPEN_SECONDS)
+        self.circuits = {}
+        self.lock = threading.Lock()
+
+    def _circuit(self, key: tuple) -> Circuit:
+        circuit = self.circuits.get(key)
+        if circuit is None:
+            circuit = self.circuits[key] = Circuit()
+        return circuit
+
+    def before_request(self, key: tuple):
+        """
+        发送请求前调用，熔断中抛出CircuitOpenError
+        """
+        with self.lock:
+            circuit = self._circuit(key)
+            if circuit.state == CLOSED:
+                return
+            now = time.monotonic()
+            if circuit.state == OPEN and now >= circuit.open_until:
+                # 熔断到期，当前请求作为探测请求
+                circuit.state = HALF_OPEN
+                circuit.probe_started = now
+                logger.info(f'熔断到期，发送探测请求: {key}')
+                return
+            if circuit.state == HALF_OPEN and now - circuit.probe_started > self.PROBE_TIMEOUT:
+                circuit.probe_started = now
+                return
+            retry_after = max(0.0, circuit.open_until - now)
+        raise CircuitOpenError(key, retry_after)
+
+    def success(self, key: tuple):
+        with self.lock:
+            circuit = self._circuit(key)
+            if circuit.state != CLOSED:
+                logger.success(f'探测请求成功，恢复请求: {key}')
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.opens = 0
+
+    def failure(self, key: tuple):
+        with self.lock:
+            circuit = self._circuit(key)
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN or (circuit.state == CLOSED and circuit.failures >= self.failures):
+                seconds = min(self.max_open_seconds, self.open_seconds * 2 ** circuit.opens)
+                circuit.opens += 1
+                circuit.state = OPEN
+                circuit.open_until = time.monotonic() + seconds
+                logger.error(f'连续{circuit.failures}次请求失败，暂停请求{seconds:.0f}秒: {key}')
+
+    def record(self, key: tuple, ok: bool):
+        if ok:
+            self.success(key)
+        else:
+            self.failure(key)
+
+    def state(self, key: tuple) -> str:
+        with self.lock:
+            circuit = self.circuits.get(key)
+            return circuit.state if circuit else CLOSED
+
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    获取全局共享的熔断器，首次调用时创建
+    """
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker()
+        return _breaker
+
+
+def configure_circuit_breaker(failures: int = None, open_seconds: float = None,
+                              max_open_seconds: float = None) -> CircuitBreaker:
+    """
+    按新配置重建全局熔断器，配置未变化时直接返回现有熔断器
+    """
+    global _breaker
+    breaker = CircuitBreaker(failures, open_seconds, max_open_seconds)
+    with _breaker_lock:
+        if _breaker is not None and ((_breaker.failures, _breaker.open_seconds, _breaker.max_open_seconds)
+                                     == (breaker.failures, breaker.open_seconds, breaker.max_open_seconds)):
+            return _breaker
+        _breaker = breaker
+        return _breaker
@@ -0,0 +1,115 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   cancel.py
+@Desc    :   取消令牌，停止监控时中断正在进行的检查，重试和限速等待可以立即结束
+'''
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# 当前线程（或协程）所属操作的取消令牌，getJSON和get_awemes_list等各层都从这里读取
+_current = contextvars.ContextVar('cancel_token', default=None)
+
+
+class OperationCancelled(Exception):
+    """操作已取消"""
+
+
+class CancelToken(object):
+    """
+    可以跨线程取消的令牌
+
+    一个令牌可以同时在多个线程中使用，cancel后所有使用它的线程在下一次检查或等待时抛出OperationCancelled；
+    正在进行的网络请求不会被打断，最长在读取超时后结束
+
+        token = CancelToken()
+        with token.scope():
+            douyin.get_awemes()
+        # 其他线程中
+        token.cancel()
+    """
+
+    CHECK_INTERVAL = 0.2  # 协程等待时检查取消状态的间隔（秒）
+
+    def __init__(self):
+        self.event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def cancel(self):
+        self.event.set()
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise OperationCancelled('操作已取消')
+
+    def sleep(self, seconds: float):
+        """
+        等待seconds秒，期间被取消时立即抛出OperationCancelled
+        """
+        if self.event.wait(max(0.0, seconds)):
+            raise OperationCancelled('操作已取消')
+
+    async def async_sleep(self, seconds: float):
+        deadline = time.monotonic() + max(0.0, seconds)
+        while True:
+            self.raise_if_cancelled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, self.CHECK_INTERVAL))
+
+    @contextmanager
+    def scope(self):
+        """
+        在with块中把此令牌设为当前令牌
+        """
+        reset = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(reset)
+
+
+def current_token() -> CancelToken:
+    """
+    返回当前线程正在使用的取消令牌，没有时返回None
+    """
+    return _current.get()
+
+
+def check_cancelled():
+    """
+    当前操作已取消时抛出OperationCancelled
+    """
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def sleep(seconds: float):
+    """
+    可取消的time.sleep，没有当前令牌时与time.sleep相同
+    """
+    if seconds <= 0:
+        return
+    token = _current.get()
+    if token is None:
+        time.sleep(seconds)
+    else:
+        token.sleep(seconds)
+
+
+async def async_sleep(seconds: float):
+    """
+    可取消的asyncio.sleep，没有当前令牌时与asyncio.sleep相同
+    """
+    token = _current.get()
+    if token is None:
+        await asyncio.sleep(max(0.0, seconds))
+    else:
+        await token.async_sleep(seconds)
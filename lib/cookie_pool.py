@@ -0,0 +1,278 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   cookie_pool.py
+@Desc    :   多账号cookie池，主页检查和下载分散到多个账号，验证失败或被熔断的账号移出轮换
+             每个账号的设备指纹、限速和熔断状态都按cookie身份区分，由Request自动隔离
+'''
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from loguru import logger
+
+try:
+    from . import cancel
+    from .cookies import cookie_identity, cookies_str_to_dict
+except ImportError:
+    # 当作为独立模块运行时使用绝对导入
+    import cancel
+    from cookies import cookie_identity, cookies_str_to_dict
+
+# 已登录cookie必须包含的字段
+REQUIRED_FIELDS = ['sessionid', 'sid_guard', 'uid_tt']
+
+
+class NoCookieAvailable(Exception):
+    """cookie池中没有可用的账号"""
+
+
+def check_cookie(cookie: str, proxy_url: str = '') -> tuple:
+    """
+    验证cookie是否存在、包含登录字段并且可以正常请求接口，返回(是否有效, 说明)
+    """
+    try:
+        from .request import get_request
+    except ImportError:
+        from request import get_request
+
+    cookie = (cookie or '').strip()
+    if not cookie:
+        return False, 'Cookie不存在，需要获取新Cookie'
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in cookie]
+    if missing_fields:
+        return False, f"Cookie缺少关键字段: {', '.join(missing_fields)}，需要更新Cookie"
+    # 使用与主页检查相同的共享Request，用户信息接口相对简单且稳定
+    response = get_request(cookie, proxy_url).getJSON('/aweme/v1/web/im/user/info/', {
+        'device_platform': 'webapp',
+        'aid': '6383',
+        'channel': 'channel_pc_web'
+    })
+    if not response or not isinstance(response, dict):
+        return False, 'Cookie存在但已失效'
+    # 没有status_code字段但有响应内容时也认为有效
+    status_code = response.get('status_code')
+    if status_code not in (None, 0):
+        return False, f'Cookie存在但已失效 (状态码: {status_code})'
+    return True, 'Cookie存在且有效'
+
+
+class Account(object):
+    """
+    cookie池中的一个账号及其状态
+    """
+
+    def __init__(self, cookie: str):
+        self.cookie = cookie
+        # 只解析cookie字符串，不读取浏览器cookie，也不写入config/cookie.json
+        try:
+            cookies = cookies_str_to_dict(cookie)
+        except ValueError:
+            cookies = {'cookie': cookie}
+        self.identity = cookie_identity(cookies)
+        self.valid = True  # 未验证前先参与轮换
+        self.reason = ''  # 移出轮换的原因
+        self.checked = None  # 上次验证的时间（time.monotonic）
+        self.checking = False
+        self.until = 0.0  # 暂停到的时间，熔断时设置
+        self.inflight = 0
+        self.used = 0.0  # 上次分配的时间，空闲程度相同时优先使用最久未用的账号
+        self.leases = 0
+
+
+class CookiePool(object):
+    """
+    线程安全的cookie池
+
+    acquire按正在使用的数量和最近使用时间选择有效账号，同一账号同时最多分配给max_inflight个任务，都已满时等待其他任务归还；
+    validate按间隔重新验证账号，验证失败的移出轮换，验证通过后恢复；pause在账号被熔断时暂停分配
+
+        with pool.lease() as cookie:
+            Douyin(target=url, cookie=cookie).get_awemes()
+    """
+
+    MAX_INFLIGHT = int(os.environ.get('DOUYIN_COOKIE_MAX_INFLIGHT', 4))
+    WAIT_INTERVAL = 0.2  # 等待账号归还时检查取消和账号状态的间隔（秒）
+
+    def __init__(self, cookies: list = None, max_inflight: int = None):
+        self.max_inflight = max_inflight or self.MAX_INFLIGHT
+        self.accounts = []
+        self.lock = threading.Lock()
+        # 账号被归还或配置变化时唤醒等待中的acquire
+        self.released = threading.Condition(self.lock)
+        self.update(cookies)
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def update(self, cookies: list):
+        """
+        替换账号列表，仍在列表中的账号保留状态；空cookie和重复账号被忽略
+        """
+        with self.lock:
+            existing = {account.cookie: account for account in self.accounts}
+            accounts, identities = [], set()
+            for cookie in cookies or []:
+                cookie = (cookie or '').strip()
+                if not cookie:
+                    continue
+                account = existing.get(cookie) or Account(cookie)
+                if account.identity in identities:
+                    continue
+                identities.add(account.identity)
+                accounts.append(account)
+            self.accounts = accounts
+            self.released.notify_all()
+        if len(accounts) > 1:
+            logger.info(f'cookie池已加载 {len(accounts)} 个账号')
+
+    def cookies(self) -> list:
+        with self.lock:
+            return [account.cookie for account in self.accounts]
+
+    def available(self) -> int:
+        """
+        当前可以分配的账号数
+        """
+        now = time.monotonic()
+        with self.lock:
+            return sum(1 for account in self.accounts if account.valid and account.until <= now)
+
+    def acquire(self) -> Account:
+        """
+        分配一个账号，没有可用账号时抛出NoCookieAvailable；可用账号都已满max_inflight时等待其他任务归还，
+        等待期间被取消时抛出OperationCancelled；使用完后必须调用release
+        """
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                accounts = [account for account in self.accounts if account.valid and account.until <= now]
+                if not accounts:
+                    raise NoCookieAvailable('没有可用的Cookie，所有账号都已失效或暂停请求')
+                free = [account for account in accounts if account.inflight < self.max_inflight]
+                if free:
+                    break
+                cancel.check_cancelled()
+                self.released.wait(self.WAIT_INTERVAL)
+            account = min(free, key=lambda account: (account.inflight, account.used))
+            account.inflight += 1
+            account.used = now
+            account.leases += 1
+            return account
+
+    def release(self, account: Account):
+        with self.lock:
+            account.inflight = max(0, account.inflight - 1)
+            self.released.notify()
+
+    @contextmanager
+    def lease(self):
+        """
+        在with块中使用一个账号的cookie
+        """
+        account = self.acquire()
+        try:
+            yield account.cookie
+        finally:
+            self.release(account)
+
+    def _find(self, cookie: str) -> Account:
+        cookie = (cookie or '').strip()
+        for account in self.accounts:
+            if account.cookie == cookie:
+                return account
+        return None
+
+    def pause(self, cookie: str, seconds: float, reason: str = ''):
+        """
+        暂停分配此账号seconds秒，例如账号被熔断时
+        """
+        with self.lock:
+            account = self._find(cookie)
+            if account is None:
+                return
+            account.until = max(account.until, time.monotonic() + seconds)
+            account.reason = reason
+        logger.warning(f'账号 {account.identity} 暂停使用{seconds:.0f}秒: {reason}')
+
+    def mark(self, cookie: str, valid: bool, reason: str = ''):
+        """
+        记录账号的验证结果，无效的账号移出轮换，直到再次验证通过
+        """
+        with self.lock:
+            account = self._find(cookie)
+            if account is None:
+                return
+            changed = account.valid != valid
+            account.valid = valid
+            account.reason = '' if valid else reason
+            account.checked = time.monotonic()
+        if changed:
+            if valid:
+                logger.info(f'账号 {account.identity} 验证通过，恢复轮换')
+            else:
+                logger.warning(f'账号 {account.identity} 验证失败，移出轮换: {reason}')
+
+    def validate(self, check, interval: float) -> int:
+        """
+        对超过interval秒未验证的账号调用check(cookie)验证，返回可用账号数
+
+        check返回是否有效，或(是否有效, 说明)；抛出异常视为无效；同一账号不会被多个线程同时验证
+        """
+        now = time.monotonic()
+        with self.lock:
+            due = [account for account in self.accounts
+                   if not account.checking and (account.checked is None or now - account.checked >= interval)]
+            for account in due:
+                account.checking = True
+        for account in due:
+            try:
+                result = check(account.cookie)
+                valid, reason = result if isinstance(result, tuple) else (bool(result), '')
+            except Exception as e:
+                valid, reason = False, f'验证出错: {e}'
+            finally:
+                with self.lock:
+                    account.checking = False
+            self.mark(account.cookie, valid, reason)
+        return self.available()
+
+    def snapshot(self) -> list:
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                'identity': account.identity,
+                'valid': account.valid,
+                'reason': account.reason,
+                'inflight': account.inflight,
+                'leases': account.leases,
+                'paused_seconds': round(max(0.0, account.until - now), 1),
+            } for account in self.accounts]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_cookie_pool() -> CookiePool:
+    """
+    获取全局共享的cookie池，首次调用时创建（为空）
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CookiePool()
+        return _pool
+
+
+def configure_cookie_pool(cookies: list = None, max_inflight: int = None) -> CookiePool:
+    """
+    配置全局cookie池；已创建时原地更新，保留仍在列表中的账号的状态
+    """
+    pool = get_cookie_pool()
+    with pool.lock:
+        pool.max_inflight = max_inflight or pool.max_inflight
+        pool.released.notify_all()
+    if cookies is not None and [cookie.strip() for cookie in cookies if cookie and cookie.strip()] != pool.cookies():
+        pool.update(cookies)
+    return pool
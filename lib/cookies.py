@@ -1,13 +1,15 @@
+import hashlib
 import os
 
-import requests
 import ujson as json
 from loguru import logger
 
 try:
+    from .session import get_session
     from .util import save_json
 except ImportError:
     # 当作为独立模块运行时使用绝对导入
+    from session import get_session
     from util import save_json
 
 # Try to import rookiepy, but make it optional
@@ -152,7 +154,7 @@ def test_cookie(cookie):
     elif type(cookie) is str:
         cookie_dict = cookies_str_to_dict(cookie)
 
-    res = requests.get(url, cookies=cookie_dict).json()
+    res = get_session().get(url, cookies=cookie_dict).json()
     if res['has_login'] is True:
         logger.success('cookie已登录')
         return True
@@ -174,3 +176,22 @@ def cookies_str_to_dict(cookie_string: str) -> dict:
 
 def cookies_dict_to_str(cookie_string: dict) -> str:
     return '; '.join([f'{key}={value}' for key, value in cookie_string.items()])
+
+
+# 登录cookie中标识账号的字段，按顺序取第一个存在的
+IDENTITY_KEYS = ['sessionid_ss', 'sessionid', 'uid_tt', 'sid_tt', 's_v_web_id', 'ttwid']
+
+
+def cookie_identity(cookie: dict) -> str:
+    """
+    返回cookie对应账号（未登录时为设备）的短标识，用于按账号区分限速等状态；cookie为空时返回空字符串
+    """
+    if not cookie:
+        return ''
+    for key in IDENTITY_KEYS:
+        if cookie.get(key):
+            value = f'{key}={cookie[key]}'
+            break
+    else:
+        value = cookies_dict_to_str(dict(sorted(cookie.items())))
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()[:12]
@@ -8,10 +8,13 @@
 @Desc    :   抖音爬虫
 '''
 
+import contextvars
 import os
 import re
 import time
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from threading import Lock, Thread
 from typing import List
 from urllib.parse import parse_qs, quote, unquote, urlparse
 
@@ -19,39 +22,89 @@ import ujson as json
 from loguru import logger
 
 try:
-    from .download import download
-    from .request import Request
-    from .util import quit, save_json, str_to_path, url_redirect
+    from .breaker import CircuitOpenError
+    from .cancel import OperationCancelled, check_cancelled
+    from .download import download, find_aria2c
+    from .fastjson import AWEME_PAGE
+    from .prefetch import Prefetcher
+    from .request import Request, get_request
+    from .retry import RetryBudgetExceeded, current_budget
+    from .util import quit, save_json, str_to_path, to_timestamp, url_redirect
 except ImportError:
     # 当作为独立模块运行时使用绝对导入
-    from download import download
-    from request import Request
-    from util import quit, save_json, str_to_path, url_redirect
+    from breaker import CircuitOpenError
+    from cancel import OperationCancelled, check_cancelled
+    from download import download, find_aria2c
+    from fastjson import AWEME_PAGE
+    from prefetch import Prefetcher
+    from request import Request, get_request
+    from retry import RetryBudgetExceeded, current_budget
+    from util import quit, save_json, str_to_path, to_timestamp, url_redirect
+
+# 需要立即结束采集的异常，各层的重试和异常处理都不能吞掉
+ABORT_ERRORS = (CircuitOpenError, RetryBudgetExceeded, OperationCancelled)
+# 返回作品列表的采集类型
+AWEME_TYPES = ['post', 'like', 'favorite', 'search', 'music', 'hashtag', 'collection']
 
 
 class Douyin(object):
 
-    def __init__(self, target: str = '', limit: int = 0, type: str = 'post', down_path: str = '下载', cookie: str = '', proxy_url: str = ''):
+    # 按offset翻页、可以提前批量签名的采集类型，以及每次预签名的页数
+    PRESIGN_TYPES = ['search', 'user', 'hashtag', 'collection']
+    PRESIGN_PAGES = 5
+    # 监控多个主页时每批预签名的主页数，每批在开始检查时才签名，避免主页较多时后面的签名在检查到之前过期
+    PRESIGN_HOMEPAGES = int(os.environ.get('DOUYIN_PRESIGN_HOMEPAGES', 20))
+    # 边采集边下载时每批交给aria2c的作品数（一页），以及等待下载的批数上限
+    DOWNLOAD_BATCH = 18
+    DOWNLOAD_QUEUE = 2
+    # 主页作品按发布时间分段并发采集的段数，1为逐页顺序采集
+    SHARDS = int(os.environ.get('DOUYIN_POST_SHARDS', 1))
+    # 按offset翻页的采集类型同时请求的页数，1为逐页请求
+    PREFETCH_PAGES = int(os.environ.get('DOUYIN_PREFETCH_PAGES', 1))
+    # 已知总集数的合集同时请求的页数上限
+    COLLECTION_PAGES = int(os.environ.get('DOUYIN_COLLECTION_PAGES', 8))
+
+    def __init__(self, target: str = '', limit: int = 0, type: str = 'post', down_path: str = '下载', cookie: str = '',
+                 proxy_url: str = '', request: Request = None, since=None, until=None, shards: int = None,
+                 prefetch: int = None):
         """
-        初始化信息
+        初始化信息，同一cookie和代理的实例共用一个Request，Douyin实例只保存单个目标的采集状态
+        since/until: 只采集这段时间内发布的作品（时间戳、datetime或'2024-01-01'格式，只有日期的until包含当天），
+        主页作品直接从until开始翻页，遇到早于since的作品即停止
+        shards: 不限数量的主页作品采集按发布时间分成几段并发采集，默认为SHARDS
+        prefetch: 搜索、用户搜索和话题按offset翻页时同时请求的页数，默认为PREFETCH_PAGES
         """
         self.target = target
         self.limit = limit
         self.type = type
+        self.since = to_timestamp(since)
+        self.until = to_timestamp(until, end_of_day=True)
+        if self.since and self.until and self.since > self.until:
+            raise ValueError(f'时间范围错误: since {since} 晚于 until {until}')
+        self.shards = shards or self.SHARDS
+        self.prefetch = prefetch or self.PREFETCH_PAGES
 
         self.down_path = os.path.join('.', down_path)
         if not os.path.exists(self.down_path):
             os.makedirs(self.down_path)
 
         self.has_more = True
+        # 采集进度: 下一页的游标、搜索id、这一页已返回的条目数、已采集总数，见state()
+        self.cursor = 0
+        self.logid = ''
+        self.offset = 0
+        self.count = 0
+        self.total = 0  # 已知的结果总数（合集的总集数），用于提前确定全部分页
         self.results_old = []
         self.results = []
         self.lock = Lock()
 
-        self.request = Request(cookie, proxy_url=proxy_url)
-
-    def run(self):
+        self.request = request or get_request(cookie, proxy_url)
 
+    def run(self, download: bool = False):
+        """
+        采集目标，download为True时下载作品（作品列表边采集边下载）
+        """
         self.__get_target_info()
 
         if self.type in ['user', 'follow', 'fans']:
@@ -59,10 +112,15 @@ class Douyin(object):
         # elif self.type in ['live']:
         #     pass
         elif self.type in ['post', 'like', 'favorite', 'search', 'music', 'hashtag', 'collection']:
-            self.get_awemes_list()
+            if download:
+                self.download_stream()
+            else:
+                self.get_awemes_list()
         elif self.type in ['video', 'note']:
             # self.get_aweme()
             self.get_aweme_detail()
+            if download:
+                self.download_all()
         else:  # 其他情况
             quit(f'获取目标类型错误, type: {self.type}')
 
@@ -139,6 +197,8 @@ class Douyin(object):
             try:
                 self.get_user()
                 self.title = self.info.get('nickname', self.id) if hasattr(self, 'info') and self.info else self.id
+            except ABORT_ERRORS:
+                raise
             except Exception as e:
                 logger.warning(f"通过API获取用户信息失败，尝试页面解析: {e}")
                 # 如果API失败，再尝试页面解析
@@ -173,6 +233,8 @@ class Douyin(object):
                 if self.type == 'collection':
                     self.info = self.render_data['aweme']['detail']['mixInfo']
                     self.title = self.info['mixName']
+                    statis = self.info.get('statis') or {}
+                    self.total = int(statis.get('updatedToEpisode') or statis.get('updated_to_episode') or 0)
                 elif self.type == 'music':
                     self.info = self.render_data['musicDetail']
                     self.title = self.info['title']
@@ -283,7 +345,7 @@ class Douyin(object):
 
         # 首先尝试主要API
         resp = self.request.getJSON('/aweme/v1/web/user/profile/other/', params)
-        logger.info(f"主要API响应: {resp}")
+        logger.opt(lazy=True).debug("主要API响应: {}", lambda: resp)
 
         # 检查主要API是否返回有效数据（包括空响应或响应为{}的情况）
         if resp and resp.get('user'):
@@ -303,6 +365,8 @@ class Douyin(object):
                     logger.success(f"备用方法成功获取用户信息: {self.info.get('nickname', '未知用户')}")
                 else:
                     raise Exception("备用方法也无法获取用户信息")
+            except ABORT_ERRORS:
+                raise
             except Exception as e:
                 logger.error(f"所有获取用户信息的方法都失败: {e}")
                 # 不再直接退出程序，而是抛出异常让上层处理
@@ -358,328 +422,608 @@ class Douyin(object):
                     logger.info(f"第三种方法成功获取用户信息: {self.info.get('nickname', '未知用户')}")
                 else:
                     raise Exception("所有备用方法都失败")
+        except ABORT_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"get_user_v2失败: {e}")
             raise Exception(f'备用方法获取用户信息失败: {e}')
 
-    def get_awemes_list(self):
-        max_cursor = 0
-        logid = ''
+    @staticmethod
+    def get_page_params(type: str, id: str, max_cursor=0, logid: str = '') -> tuple[str, dict, dict]:
+        """
+        返回采集某一页时请求的uri、参数和POST数据
+        """
+        # ['post', 'like', 'favorite', 'search', 'music','hashtag', 'collection']
+        data = {}
+        if type == 'post':
+            uri = '/aweme/v1/web/aweme/post/'
+            # 根据最新抓包更新参数
+            params = {
+                'device_platform': 'webapp',
+                'aid': '6383',
+                'channel': 'channel_pc_web',
+                'sec_user_id': id,
+                'max_cursor': max_cursor,
+                'locate_query': 'false',
+                'show_live_replay_strategy': '1',
+                'need_time_list': '1',
+                'time_list_query': '0',
+                'whale_cut_token': '',
+                'cut_version': '1',
+                'count': '18',
+                'publish_video_strategy_type': '2',
+                'from_user_page': '1',
+                'update_version_code': '170400',
+                'pc_client_type': '1',
+                'pc_libra_divert': 'Windows',
+                'support_h265': '1',
+                'support_dash': '1',
+                'cpu_core_num': '8',
+                'version_code': '290100',
+                'version_name': '29.1.0',
+                'cookie_enabled': 'true',
+                'screen_width': '1920',
+                'screen_height': '1080',
+                'browser_language': 'zh-CN',
+                'browser_platform': 'Win32',
+                'browser_name': 'Chrome',
+                'browser_version': '132.0.0.0',
+                'browser_online': 'true',
+                'engine_name': 'Blink',
+                'engine_version': '132.0.0.0',
+                'os_name': 'Windows',
+                'os_version': '10',
+                'device_memory': '8',
+                'platform': 'PC',
+                'downlink': '10',
+                'effective_type': '4g',
+                'round_trip_time': '50',
+            }
+        elif type == 'like':
+            uri = '/aweme/v1/web/aweme/favorite/'
+            params = {"publish_video_strategy_type": 2, "max_cursor": max_cursor,
+                      'cut_version': 1, 'count': 18, "sec_user_id": id}
+        elif type == 'favorite':
+            uri = '/aweme/v1/web/aweme/listcollection/'
+            params = {"publish_video_strategy_type": 2}
+            data = {"cursor": max_cursor, 'count': 18}
+        elif type == 'music':
+            uri = '/aweme/v1/web/music/aweme/'
+            params = {"cursor": max_cursor,
+                      'count': 18, "music_id": id}
+        elif type == 'hashtag':
+            uri = '/aweme/v1/web/challenge/aweme/'
+            params = {"cursor": max_cursor, "sort_type": 1,  # 0综合 1最热 2最新
+                      'count': 18, "ch_id": id}
+        elif type == 'collection':
+            uri = '/aweme/v1/web/mix/aweme/'
+            params = {"cursor": max_cursor,
+                      'count': 18, "mix_id": id}
+        elif type == 'search':
+            uri = '/aweme/v1/web/search/item/'  # 视频
+            params = {
+                "search_id": logid,
+                "search_channel": "aweme_video_web",
+                "search_source": "tab_search",
+                "query_correct_type": 1,
+                "from_group_id": "",
+                "is_filter_search": 1,
+                "list_type": "single",
+                "need_filter_settings": 1,
+                "offset": max_cursor,
+                "sort_type": 1,  # 排序 综合 1最多点赞 2最新
+                "enable_history": 1,
+                "search_range": 0,  # 搜索范围  不限
+                "publish_time": 0,  # 发布时间  不限
+                "filter_duration": '',  # 时长 不限 0-1  1-5  5-10000
+                'count': 18,
+                "keyword": unquote(id)
+            }
+        elif type == 'user':
+            uri = '/aweme/v1/web/discover/search/'  # 用户
+            params = {
+                'count': 10,
+                "from_group_id": "",
+                "is_filter_search": 0,
+                "keyword": quote(id),
+                "list_type": "single",
+                "need_filter_settings": 0,
+                "offset": max_cursor,
+                "search_id": logid,
+                "query_correct_type": 1,
+                "search_channel": "aweme_user_web",
+                "search_source": "tab_search"
+            }
+        elif type == 'live':
+            uri = '/aweme/v1/web/discover/search/'
+            params = {}
+        elif type == 'follow':
+            uri = '/aweme/v1/web/user/following/list/'
+            params = {
+                "address_book_access": 0,
+                "count": 20,
+                "gps_access": 0,
+                "is_top": 1,
+                "max_time": max_cursor,
+                "min_time": 0,
+                "offset": 0,
+                'source_type': 1,
+                "sec_user_id": id
+            }
+        elif type == 'fans':
+            uri = '/aweme/v1/web/user/follower/list/'
+            params = {
+                "address_book_access": 0,
+                "count": 20,
+                "gps_access": 0,
+                "is_top": 1,
+                "max_time": max_cursor,
+                "min_time": 0,
+                "offset": 0,
+                'source_type': 3,
+                "sec_user_id": id
+            }
+
+        return uri, params, data
+
+    def __presign_pages(self, uri: str, params: dict, max_cursor, logid: str):
+        """
+        offset翻页的接口可以提前确定后续几页的参数，一次批量签名，减少每页单独签名的开销
+        """
+        if self.type not in self.PRESIGN_TYPES or self.request.has_presigned(uri, params):
+            return
+        # 搜索接口从第二页开始需要第一页返回的search_id，此时后续页的参数还无法确定
+        if self.type in ['search', 'user'] and not logid:
+            return
+        count = int(params.get('count', 18))
+        left = self.__pages_left(count, max_cursor)
+        # 已知总数时（合集）一次签名全部剩余页
+        pages = left if self.total else min(self.PRESIGN_PAGES, left or self.PRESIGN_PAGES)
+        if pages <= 1:
+            return
+        self.request.presign(uri, [self.get_page_params(self.type, self.id, int(max_cursor) + i * count, logid)[1]
+                                   for i in range(pages)])
+
+    def __pages_left(self, count: int, cursor) -> int:
+        """
+        按limit和已知的总数计算从cursor开始还需要的页数，都未知时返回0
+        """
+        left = []
+        if self.limit:
+            left.append(-(-(self.limit - self.count) // count))
+        if self.total:
+            left.append(-(-(self.total - int(cursor)) // count))
+        return max(1, min(left)) if left else 0
+
+    @staticmethod
+    def presign_homepages(homepage_urls: List[str], cookie: str = '', proxy_url: str = '', start: int = 0,
+                          chunk: int = 0) -> int:
+        """
+        监控多个主页时批量签名主页第一页作品的请求参数；按检查顺序每chunk个（默认PRESIGN_HOMEPAGES）主页一批，
+        检查到第start个主页时调用，start是一批的开头时签名这一批，否则不做任何事
+        """
+        chunk = chunk or Douyin.PRESIGN_HOMEPAGES
+        if start % chunk:
+            return 0
+        params_list = []
+        for url in homepage_urls[start:start + chunk]:
+            match = re.search(r'/user/(MS4wLjABAAAA[\w-]+)', str(url))
+            if match:
+                params_list.append(Douyin.get_page_params('post', match.group(1))[1])
+        if len(params_list) < 2:
+            return 0
+        return get_request(cookie, proxy_url).presign('/aweme/v1/web/aweme/post/', params_list)
+
+    @staticmethod
+    def presign_details(targets: List[str], type: str = 'video', cookie: str = '', proxy_url: str = '') -> int:
+        """
+        批量采集多个作品前，一次批量签名所有能直接解析出作品id的详情请求，短链接等仍在采集时单独签名
+        """
+        params_list = []
+        for target in targets:
+            target = target.strip()
+            match = re.search(r'douyin\.com/(?:video|note)/(\d+)', target)
+            if match:
+                params_list.append({"aweme_id": match.group(1)})
+            elif type in ['video', 'note'] and target.isdigit():
+                params_list.append({"aweme_id": target})
+        if len(params_list) < 2:
+            return 0
+        return get_request(cookie, proxy_url).presign('/aweme/v1/web/aweme/detail/', params_list)
+
+    def __spend_retry(self, reason: str):
+        """
+        翻页重试计入调用方设置的重试预算，预算用完时抛出RetryBudgetExceeded，由调用方保存已采集的结果
+        """
+        budget = current_budget()
+        if budget is None:
+            return
+        try:
+            budget.retry(reason)
+        except RetryBudgetExceeded:
+            self.has_more = False
+            raise
+
+    def state(self) -> dict:
+        """
+        当前的采集进度，可以保存下来，之后对同一目标调用resume从中断处继续采集
+        """
+        return {
+            'cursor': self.cursor,
+            'logid': self.logid,
+            'offset': self.offset,
+            'count': self.count,
+            'has_more': self.has_more,
+        }
+
+    def resume(self, state: dict):
+        """
+        恢复state()保存的采集进度，未取完的一页会重新请求，并跳过已返回的条目
+        """
+        self.cursor = state.get('cursor', 0)
+        self.logid = state.get('logid', '')
+        self.offset = state.get('offset', 0)
+        self.count = state.get('count', 0)
+        self.has_more = state.get('has_more', True)
+
+    def iter_awemes(self, keep: bool = True, pages: int = 0):
+        """
+        逐条返回采集结果（作品或用户，格式与results相同），需要先获取目标信息（run或get_awemes中完成）
+
+        每页的结果全部取完后才请求下一页，调用方处理得慢时采集也随之放慢；中途停止迭代后可以通过state()保存进度；
+        keep为False时不保存到results，长时间采集时内存不随结果数量增长；pages大于0时最多采集这么多页，之后可以再次调用继续
+
+            for aweme in douyin.iter_awemes(keep=False):
+                ...
+        """
+        if self.type in AWEME_TYPES:
+            normalize = self.__normalize_aweme
+        elif self.type in ['user', 'live', 'follow', 'fans']:
+            normalize = self.__normalize_user
+        else:
+            quit(f'类型错误，type：{self.type}')
         retry = 0
         max_retry = 10
-        data = {}
-        while self.has_more:
-            try:
-                # ['post', 'like', 'favorite', 'search', 'music','hashtag', 'collection']
-                if self.type == 'post':
-                    uri = '/aweme/v1/web/aweme/post/'
-                    # 根据最新抓包更新参数
-                    params = {
-                        'device_platform': 'webapp',
-                        'aid': '6383',
-                        'channel': 'channel_pc_web',
-                        'sec_user_id': self.id,
-                        'max_cursor': max_cursor,
-                        'locate_query': 'false',
-                        'show_live_replay_strategy': '1',
-                        'need_time_list': '1',
-                        'time_list_query': '0',
-                        'whale_cut_token': '',
-                        'cut_version': '1',
-                        'count': '18',
-                        'publish_video_strategy_type': '2',
-                        'from_user_page': '1',
-                        'update_version_code': '170400',
-                        'pc_client_type': '1',
-                        'pc_libra_divert': 'Windows',
-                        'support_h265': '1',
-                        'support_dash': '1',
-                        'cpu_core_num': '8',
-                        'version_code': '290100',
-                        'version_name': '29.1.0',
-                        'cookie_enabled': 'true',
-                        'screen_width': '1920',
-                        'screen_height': '1080',
-                        'browser_language': 'zh-CN',
-                        'browser_platform': 'Win32',
-                        'browser_name': 'Chrome',
-                        'browser_version': '132.0.0.0',
-                        'browser_online': 'true',
-                        'engine_name': 'Blink',
-                        'engine_version': '132.0.0.0',
-                        'os_name': 'Windows',
-                        'os_version': '10',
-                        'device_memory': '8',
-                        'platform': 'PC',
-                        'downlink': '10',
-                        'effective_type': '4g',
-                        'round_trip_time': '50',
-                    }
-                elif self.type == 'like':
-                    uri = '/aweme/v1/web/aweme/favorite/'
-                    params = {"publish_video_strategy_type": 2, "max_cursor": max_cursor,
-                              'cut_version': 1, 'count': 18, "sec_user_id": self.id}
-                elif self.type == 'favorite':
-                    uri = '/aweme/v1/web/aweme/listcollection/'
-                    params = {"publish_video_strategy_type": 2}
-                    data = {"cursor": max_cursor, 'count': 18}
-                elif self.type == 'music':
-                    uri = '/aweme/v1/web/music/aweme/'
-                    params = {"cursor": max_cursor,
-                              'count': 18, "music_id": self.id}
-                elif self.type == 'hashtag':
-                    uri = '/aweme/v1/web/challenge/aweme/'
-                    params = {"cursor": max_cursor, "sort_type": 1,  # 0综合 1最热 2最新
-                              'count': 18, "ch_id": self.id}
-                elif self.type == 'collection':
-                    uri = '/aweme/v1/web/mix/aweme/'
-                    params = {"cursor": max_cursor,
-                              'count': 18, "mix_id": self.id}
-                elif self.type == 'search':
-                    uri = '/aweme/v1/web/search/item/'  # 视频
-                    params = {
-                        "search_id": logid,
-                        "search_channel": "aweme_video_web",
-                        "search_source": "tab_search",
-                        "query_correct_type": 1,
-                        "from_group_id": "",
-                        "is_filter_search": 1,
-                        "list_type": "single",
-                        "need_filter_settings": 1,
-                        "offset": max_cursor,
-                        "sort_type": 1,  # 排序 综合 1最多点赞 2最新
-                        "enable_history": 1,
-                        "search_range": 0,  # 搜索范围  不限
-                        "publish_time": 0,  # 发布时间  不限
-                        "filter_duration": '',  # 时长 不限 0-1  1-5  5-10000
-                        'count': 18,
-                        "keyword": unquote(self.id)
-                    }
-                elif self.type == 'user':
-                    uri = '/aweme/v1/web/discover/search/'  # 用户
-                    params = {
-                        'count': 10,
-                        "from_group_id": "",
-                        "is_filter_search": 0,
-                        "keyword": quote(self.id),
-                        "list_type": "single",
-                        "need_filter_settings": 0,
-                        "offset": max_cursor,
-                        "search_id": logid,
-                        "query_correct_type": 1,
-                        "search_channel": "aweme_user_web",
-                        "search_source": "tab_search"
-                    }
-                elif self.type == 'live':
-                    uri = '/aweme/v1/web/discover/search/'
-                    params = {}
-                elif self.type == 'follow':
-                    uri = '/aweme/v1/web/user/following/list/'
-                    params = {
-                        "address_book_access": 0,
-                        "count": 20,
-                        "gps_access": 0,
-                        "is_top": 1,
-                        "max_time": max_cursor,
-                        "min_time": 0,
-                        "offset": 0,
-                        'source_type': 1,
-                        "sec_user_id": self.id
-                    }
-                elif self.type == 'fans':
-                    uri = '/aweme/v1/web/user/follower/list/'
-                    params = {
-                        "address_book_access": 0,
-                        "count": 20,
-                        "gps_access": 0,
-                        "is_top": 1,
-                        "max_time": max_cursor,
-                        "min_time": 0,
-                        "offset": 0,
-                        'source_type': 3,
-                        "sec_user_id": self.id
-                    }
-
-                resp = self.request.getJSON(uri, params, data)
-                for name in ['max_cursor', 'cursor', 'min_time']:
-                    max_cursor = resp.get(name, 0)
-                    if max_cursor:
-                        break
-                if not logid:
-                    logid = resp['log_pb']['impr_id']
-                self.has_more = resp.get('has_more', 0)
-                for name in ['aweme_list', 'user_list', 'data', 'followings', 'followers']:
-                    items_list = resp.get(name, [])
-                    if items_list:
-                        break
-            except:
-                retry += 1
-                logger.error(f'采集请求出错... 进行第{retry}次重试')
-                continue
-            finally:
-                # 重试max_retry次
-                if retry >= max_retry:
+        # 作品列表只解析__normalize_aweme用到的字段
+        projection = AWEME_PAGE if self.type in AWEME_TYPES else None
+        if self.type == 'post' and self.until and not self.cursor:
+            # 主页作品的max_cursor是毫秒时间戳，只返回早于它发布的作品，直接跳到until而不是从最新的作品翻起
+            self.cursor = (self.until + 1) * 1000
+        window = self.prefetch
+        if self.type == 'collection' and self.total:
+            # 合集的游标就是集数偏移，已知总集数时全部分页一开始就并发请求
+            count = int(self.get_page_params(self.type, self.id, self.cursor)[1].get('count', 18))
+            window = max(window, min(self.COLLECTION_PAGES, self.__pages_left(count, self.cursor)))
+        prefetcher = None
+        if window > 1 and self.type in self.PRESIGN_TYPES:
+            prefetcher = Prefetcher(window)
+        try:
+            fetched = 0
+            while self.has_more:
+                if pages and fetched >= pages:
+                    break
+                if self.limit > 0 and self.count >= self.limit:
+                    self.has_more = False
+                    logger.info(f'已达到限制采集数量： {self.count}')
+                    break
+                try:
+                    check_cancelled()
+                    uri, params, data = self.get_page_params(self.type, self.id, self.cursor, self.logid)
+                    self.__presign_pages(uri, params, self.cursor, self.logid)
+                    if prefetcher is not None and (self.logid or self.type not in ['search', 'user']):
+                        # 搜索从第二页开始需要第一页返回的search_id，之后各页使用同一个search_id并发预取
+                        self.__prefetch(prefetcher, params, projection)
+                        try:
+                            found, resp = prefetcher.pop(int(self.cursor))
+                        except ABORT_ERRORS:
+                            raise
+                        except Exception as e:
+                            # 预取的这一页失败时当场重新请求一次，仍然失败再按采集出错重试
+                            logger.warning(f'预取的分页(cursor={self.cursor})请求失败，重新请求: {e!r}')
+                            found = False
+                        if not found:
+                            resp = self.request.getJSON(uri, params, data, projection=projection)
+                    else:
+                        resp = self.request.getJSON(uri, params, data, projection=projection)
+                    for name in ['max_cursor', 'cursor', 'min_time']:
+                        next_cursor = resp.get(name, 0)
+                        if next_cursor:
+                            break
+                    logid = self.logid or resp['log_pb']['impr_id']
+                    has_more = resp.get('has_more', 0)
+                    for name in ['aweme_list', 'user_list', 'data', 'followings', 'followers']:
+                        items_list = resp.get(name, [])
+                        if items_list:
+                            break
+                except ABORT_ERRORS:
+                    # 熔断中、重试预算用完或已取消时不再重试，交给调用方处理
                     self.has_more = False
+                    raise
+                except Exception as e:
+                    retry += 1
+                    logger.error(f'采集请求出错... 进行第{retry}次重试')
+                    # 重试max_retry次
+                    if retry >= max_retry:
+                        self.has_more = False
+                    self.__spend_retry(f'采集请求出错: {e!r}')
+                    continue
 
-            if items_list:
-                retry = 0
-                if self.type in ['post', 'like', 'favorite', 'search', 'music', 'hashtag', 'collection']:
-                    self.__append_awemes(items_list)
-                elif self.type in ['user', 'live', 'follow', 'fans']:
-                    self.__append_users(items_list)
-                else:
-                    quit(f'类型错误，type：{self.type}')
-            elif self.has_more:
-                retry += 1
-                logger.error(f'采集未完成，但请求结果为空... 进行第{retry}次重试')
-            else:
-                # logger.info('未采集到结果')
-                pass
-        self.save()
+                if not items_list:
+                    if has_more:
+                        retry += 1
+                        logger.error(f'采集未完成，但请求结果为空... 进行第{retry}次重试')
+                        if retry >= max_retry:
+                            self.has_more = False
+                        self.__spend_retry('采集未完成，但请求结果为空')
+                    else:
+                        self.has_more = False
+                    continue
 
-    def __append_awemes(self, awemes_list: List[dict]):
-        with self.lock:  # 加锁避免意外冲突
-            if self.limit == 0 or len(self.results) < self.limit:
-                for item in awemes_list:
+                retry = 0
+                fetched += 1
+                for index, item in enumerate(items_list):
+                    # 恢复进度时跳过这一页中已经返回过的条目
+                    if index < self.offset:
+                        continue
+                    if self.limit > 0 and self.count >= self.limit:
+                        self.has_more = False
+                        logger.info(f'已达到限制采集数量： {self.count}')
+                        break
                     # =====兼容搜索=====
                     if item.get('aweme_info'):
                         item = item['aweme_info']
-                    # =====限制数量=====
-                    if self.limit > 0 and len(self.results) >= self.limit:
-                        self.has_more = False
-                        logger.info(f'已达到限制采集数量： {len(self.results)}')
-                        return
+                    elif item.get('user_info'):
+                        item = item['user_info']
                     # =====增量采集=====
-                    _time = item.get('create_time', item.get('createTime'))
-                    if self.results_old:
+                    if self.results_old and self.type in AWEME_TYPES:
                         old = self.results_old[0]['time']
-                        if _time <= old:  # 如果当前作品时间早于上次采集的最新作品时间，直接退出
-                            _is_top = item.get(
-                                'is_top', item.get('tag', {}).get('isTop'))
-                            if _is_top:  # 置顶作品，不重复保存
+                        if item.get('create_time', item.get('createTime')) <= old:  # 早于上次采集的最新作品时间，直接退出
+                            if item.get('is_top', item.get('tag', {}).get('isTop')):  # 置顶作品，不重复保存
                                 continue
-                            if self.has_more:
-                                self.has_more = False
+                            self.has_more = False
                             logger.success(f'增量采集完成，上次运行结果：{old}')
-                            return
-                    # =====保存结果=====
-                    # _type = item.get('media_type', item.get('media_type'))  # 2 图集 4 视频
-                    _type = item.get('aweme_type', item.get('awemeType'))
-                    aweme: dict = item.get('statistics', item.get('stats', {}))
-                    for i in [
-                            'playCount', 'downloadCount', 'forwardCount', 'collectCount', "digest", "exposure_count",
-                            "live_watch_count", "play_count", "download_count", "forward_count", "lose_count",
-                            "lose_comment_count"
-                    ]:
-                        if not aweme.get(i):
-                            aweme.pop(i, '')
-                    if _type <= 66 or _type in [69, 107]:  # 视频 77西瓜视频
-                        play_addr = item['video'].get('play_addr')
-                        if play_addr:
-                            download_addr = play_addr['url_list'][-1]
-                        else:
-                            # download_addr = f"https:{item['video']['playApi']}"
-                            download_addr: str = item['download']['urlList'][-1]
-                            download_addr = download_addr.replace(
-                                'watermark=1', 'watermark=0')
-                        aweme['download_addr'] = download_addr
-                    elif _type == 68:  # 图文
-                        aweme['download_addr'] = [images.get('url_list', images.get(
-                            'urlList'))[-1] for images in item['images']]
-                    elif _type == 101:  # 直播
-                        continue
-                    else:  # 其他类型作品
-                        aweme['download_addr'] = '其他类型作品'
-                        logger.info('其他类型作品：type', _type)
-                        save_json(_type, item)  # 保存未区分的类型
+                            break
+                    # =====时间范围=====
+                    if (self.since or self.until) and self.type in AWEME_TYPES:
+                        _time = item.get('create_time', item.get('createTime')) or 0
+                        if self.until and _time > self.until:
+                            continue
+                        if self.since and _time < self.since:
+                            # 主页作品按发布时间倒序，早于since后不再有范围内的作品，置顶作品除外；其他类型只跳过
+                            if self.type != 'post' or item.get('is_top', item.get('tag', {}).get('isTop')):
+                                continue
+                            self.has_more = False
+                            logger.success(f"已采集到开始时间 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.since))} 之前，停止翻页")
+                            break
+                    self.offset = index + 1
+                    result = normalize(item)
+                    if result is None:
                         continue
-                    aweme.pop('aweme_id', '')
-                    aweme['id'] = item.get('aweme_id', item.get('awemeId'))
-                    aweme['time'] = _time
-                    aweme['type'] = _type
-                    desc = str_to_path(item.get('desc'))
-                    aweme['desc'] = desc
-                    aweme['duration'] = item.get(
-                        'duration', item['video'].get('duration'))
-                    music: dict = item.get('music')
-                    if music:
-                        aweme['music_title'] = str_to_path(music['title'])
-                        aweme['music_url'] = music.get(
-                            'play_url', music.get('playUrl'))['uri']
-                    cover = item['video'].get('cover')
-                    if type(cover) is dict:
-                        aweme['cover'] = cover['url_list'][-1]
-                    else:
-                        aweme['cover'] = f"https:{
-                            item['video']['dynamicCover']}"
-                    author = item.get('author', item.get('authorInfo'))
-                    if author:
-                        avatarThumb = author.get(
-                            'avatar_thumb', author.get('avatarThumb'))
-                        aweme['author_avatar'] = avatarThumb.get(
-                            'url_list', avatarThumb.get('urlList'))[-1]
-                        aweme['author_nickname'] = author.get('nickname')
-                        aweme['author_uid'] = author.get(
-                            'sec_uid', author.get('secUid'))
-                    text_extra = item.get('text_extra', item.get('textExtra'))
-                    if text_extra:
-                        aweme['text_extra'] = [{
-                            'tag_id': hashtag.get('hashtag_id', hashtag.get('hashtagId')),
-                            'tag_name': hashtag.get('hashtag_name', hashtag.get('hashtagName'))
-                        } for hashtag in text_extra]
-                    # video_tag = item.get('video_tag', item.get('videoTag'))
-                    # if video_tag:
-                    #     aweme['video_tag'] = video_tag
-
-                    if self.type == 'collection':
-                        aweme['no'] = item['mix_info']['statis']['current_episode']
-                    self.results.append(aweme)  # 用于保存信息
-
-                logger.info(f'采集中，已采集到 {len(self.results)} 条结果')
+                    self.count += 1
+                    if keep:
+                        with self.lock:  # 加锁避免意外冲突
+                            self.results.append(result)  # 用于保存信息
+                    yield result
+
+                logger.info(f'采集中，已采集到 {self.count} 条结果')
+                if prefetcher is not None and (not (self.has_more and has_more)
+                                               or int(next_cursor or 0) != int(self.cursor) + int(params.get('count', 18))):
+                    # 已经没有下一页，或接口返回的游标与预取时假设的不同，取消预取的页
+                    prefetcher.cancel()
+                if self.has_more:
+                    # 这一页已全部返回，进度移到下一页
+                    self.cursor, self.logid, self.offset = next_cursor, logid, 0
+                    self.has_more = has_more
+        finally:
+            if prefetcher is not None:
+                prefetcher.close()
+
+    def __prefetch(self, prefetcher: Prefetcher, params: dict, projection: dict):
+        """
+        提交当前页和后续各页的请求，保持prefetcher.window页同时进行，不超过limit或已知总数还需要的页数
+        """
+        count = int(params.get('count', 18))
+        pages = min(prefetcher.window, self.__pages_left(count, self.cursor) or prefetcher.window)
+        for i in range(pages):
+            cursor = int(self.cursor) + i * count
+            uri, params, data = self.get_page_params(self.type, self.id, cursor, self.logid)
+            prefetcher.submit(cursor, self.request.getJSON, uri, params, data, projection=projection)
+
+    def get_awemes_list(self):
+        """
+        采集全部结果到results并保存
+        """
+        try:
+            if self.type == 'post' and self.shards > 1 and not self.limit and not self.cursor:
+                self.__crawl_shards()
             else:
-                self.has_more = False
-                logger.info(f'已达到限制采集数量： {len(self.results)}')
+                for _ in self.iter_awemes():
+                    pass
+        except ABORT_ERRORS:
+            # 熔断中、重试预算用完或已取消时保存已采集的结果后交给调用方处理
+            self.save()
+            raise
+        self.save()
+
+    def __shard(self, since: int = None, until: int = None) -> 'Douyin':
+        """
+        采集同一主页一段发布时间的作品的实例，与当前实例共用Request（按账号的限速和熔断状态）
+        """
+        shard = Douyin(type='post', down_path=self.down_path, request=self.request, since=since, until=until, shards=1)
+        shard.id = self.id
+        return shard
+
+    def __crawl_shards(self):
+        """
+        主页作品的max_cursor是发布时间，先采集第一页，按发布频率和作品总数估算全部作品的时间跨度，
+        分成shards段并发采集，合并后按作品id去重、按发布时间倒序保存到results
 
-    def __append_users(self, user_list: List[dict]):
+        估算偏小时，最早的一段不设开始时间，一直采集到最后，结果仍然完整，只是这一段耗时更长
+        """
+        since = self.since
+        if self.results_old:
+            # 增量采集: 只采集上次最新作品之后发布的
+            since = max(since or 0, self.results_old[0]['time'] + 1)
+        probe = self.__shard(since, self.until)
+        awemes = list(probe.iter_awemes(keep=False, pages=1))
+        newest = max([aweme['time'] for aweme in awemes], default=0)
+        oldest = probe.cursor // 1000
+        total = (getattr(self, 'info', None) or {}).get('aweme_count') or 0
+        if since:
+            low = since
+        elif total > len(awemes) and newest > oldest > 0:
+            # 按第一页的发布频率估算剩余作品的时间跨度
+            low = int(oldest - (newest - oldest) / len(awemes) * (total - len(awemes)))
+        else:
+            low = 0
+        if not probe.has_more or low <= 0 or oldest - low < self.shards:
+            # 只有一页，或无法估算时间跨度时顺序采集
+            awemes.extend(probe.iter_awemes(keep=False))
+        else:
+            step = (oldest - low) / self.shards
+            edges = [int(oldest - step * i) for i in range(self.shards)] + [since]
+            # 第一段接着第一页继续翻页，其余各段从各自的结束时间开始
+            probe.since = edges[1]
+            shards = [probe] + [self.__shard(edges[i + 1], edges[i] - 1) for i in range(1, self.shards)]
+            logger.info(f'主页作品分成 {self.shards} 段并发采集，预计 {total} 个作品')
+            with ThreadPoolExecutor(max_workers=self.shards, thread_name_prefix='Shard') as executor:
+                # 各段在调用方的上下文中运行，使用同一个取消令牌和重试预算
+                futures = [executor.submit(contextvars.copy_context().run, list, shard.iter_awemes(keep=False))
+                           for shard in shards]
+                errors = []
+                for future in futures:
+                    try:
+                        awemes.extend(future.result())
+                    except Exception as e:
+                        errors.append(e)
+            if errors:
+                self.__merge(awemes)
+                raise errors[0]
+        self.__merge(awemes)
+
+    def __merge(self, awemes: List[dict]):
+        unique = {}
+        for aweme in awemes:
+            unique.setdefault(aweme['id'], aweme)
+        with self.lock:
+            self.results.extend(sorted(unique.values(), key=lambda aweme: (aweme['time'] or 0, aweme['id']), reverse=True))
+            self.count = len(self.results)
+            self.has_more = False
+        logger.info(f'采集中，已采集到 {self.count} 条结果')
+
+    def __append_awemes(self, awemes_list: List[dict]):
         with self.lock:  # 加锁避免意外冲突
-            if self.limit == 0 or len(self.results) < self.limit:
-                for item in user_list:
-                    # =====兼容搜索=====
-                    if item.get('user_info'):
-                        item = item['user_info']
-                    # =====限制数量=====
-                    if self.limit > 0 and len(self.results) >= self.limit:
-                        self.has_more = False
-                        logger.info(f'已达到限制采集数量： {len(self.results)}')
-                        return
-                    user_info = {}
-                    user_info['nickname'] = str_to_path(item['nickname'])
-                    user_info['signature'] = str_to_path(item['signature'])
-                    user_info['avatar'] = item['avatar_thumb']['url_list'][0]
-                    for i in [
-                            'sec_uid', 'uid', 'short_id', 'unique_id', 'unique_id_modify_time', 'aweme_count', 'favoriting_count',
-                            'follower_count', 'following_count', 'constellation', 'create_time', 'enterprise_verify_reason',
-                            'is_gov_media_vip', 'live_status', 'total_favorited', 'share_qrcode_uri'
-                    ]:
-                        if item.get(i):
-                            user_info[i] = item[i]
-                    room_id = item.get('room_id')
-                    if room_id:  # 直播间信息
-                        user_info['live_room_id'] = room_id
-                        user_info['live_room_url'] = [
-                            f'http://pull-flv-f26.douyincdn.com/media/stream-{
-                                room_id}.flv',
-                            f'http://pull-hls-f26.douyincdn.com/media/stream-{
-                                room_id}.m3u8'
-                        ]
-                    musician: dict = item.get('original_musician')
-                    if musician and musician.get('music_count'):  # 原创音乐人
-                        user_info['original_musician'] = item['original_musician']
-                    self.results.append(user_info)  # 用于保存信息
-                logger.info(f'采集中，已采集到 {len(self.results)} 条结果')
+            for item in awemes_list:
+                aweme = self.__normalize_aweme(item)
+                if aweme is not None:
+                    self.results.append(aweme)
+                    self.count += 1
+
+    def __normalize_aweme(self, item: dict) -> dict:
+        """
+        整理一条作品信息，直播和无法识别的类型返回None
+        """
+        # _type = item.get('media_type', item.get('media_type'))  # 2 图集 4 视频
+        _type = item.get('aweme_type', item.get('awemeType'))
+        aweme: dict = item.get('statistics', item.get('stats', {}))
+        for i in [
+                'playCount', 'downloadCount', 'forwardCount', 'collectCount', "digest", "exposure_count",
+                "live_watch_count", "play_count", "download_count", "forward_count", "lose_count",
+                "lose_comment_count"
+        ]:
+            if not aweme.get(i):
+                aweme.pop(i, '')
+        if _type <= 66 or _type in [69, 107]:  # 视频 77西瓜视频
+            play_addr = item['video'].get('play_addr')
+            if play_addr:
+                download_addr = play_addr['url_list'][-1]
             else:
-                self.has_more = False
-                logger.info(f'已达到限制采集数量： {len(self.results)}')
+                # download_addr = f"https:{item['video']['playApi']}"
+                download_addr: str = item['download']['urlList'][-1]
+                download_addr = download_addr.replace(
+                    'watermark=1', 'watermark=0')
+            aweme['download_addr'] = download_addr
+        elif _type == 68:  # 图文
+            aweme['download_addr'] = [images.get('url_list', images.get(
+                'urlList'))[-1] for images in item['images']]
+        elif _type == 101:  # 直播
+            return None
+        else:  # 其他类型作品
+            aweme['download_addr'] = '其他类型作品'
+            logger.info('其他类型作品：type', _type)
+            save_json(_type, item)  # 保存未区分的类型
+            return None
+        aweme.pop('aweme_id', '')
+        aweme['id'] = item.get('aweme_id', item.get('awemeId'))
+        aweme['time'] = item.get('create_time', item.get('createTime'))
+        aweme['type'] = _type
+        desc = str_to_path(item.get('desc'))
+        aweme['desc'] = desc
+        aweme['duration'] = item.get(
+            'duration', item['video'].get('duration'))
+        music: dict = item.get('music')
+        if music:
+            aweme['music_title'] = str_to_path(music['title'])
+            aweme['music_url'] = music.get(
+                'play_url', music.get('playUrl'))['uri']
+        cover = item['video'].get('cover')
+        if type(cover) is dict:
+            aweme['cover'] = cover['url_list'][-1]
+        else:
+            aweme['cover'] = f"https:{
+                item['video']['dynamicCover']}"
+        author = item.get('author', item.get('authorInfo'))
+        if author:
+            avatarThumb = author.get(
+                'avatar_thumb', author.get('avatarThumb'))
+            aweme['author_avatar'] = avatarThumb.get(
+                'url_list', avatarThumb.get('urlList'))[-1]
+            aweme['author_nickname'] = author.get('nickname')
+            aweme['author_uid'] = author.get(
+                'sec_uid', author.get('secUid'))
+        text_extra = item.get('text_extra', item.get('textExtra'))
+        if text_extra:
+            aweme['text_extra'] = [{
+                'tag_id': hashtag.get('hashtag_id', hashtag.get('hashtagId')),
+                'tag_name': hashtag.get('hashtag_name', hashtag.get('hashtagName'))
+            } for hashtag in text_extra]
+        # video_tag = item.get('video_tag', item.get('videoTag'))
+        # if video_tag:
+        #     aweme['video_tag'] = video_tag
+
+        if self.type == 'collection':
+            aweme['no'] = item['mix_info']['statis']['current_episode']
+        return aweme
+
+    @staticmethod
+    def __normalize_user(item: dict) -> dict:
+        """
+        整理一条用户信息
+        """
+        user_info = {}
+        user_info['nickname'] = str_to_path(item['nickname'])
+        user_info['signature'] = str_to_path(item['signature'])
+        user_info['avatar'] = item['avatar_thumb']['url_list'][0]
+        for i in [
+                'sec_uid', 'uid', 'short_id', 'unique_id', 'unique_id_modify_time', 'aweme_count', 'favoriting_count',
+                'follower_count', 'following_count', 'constellation', 'create_time', 'enterprise_verify_reason',
+                'is_gov_media_vip', 'live_status', 'total_favorited', 'share_qrcode_uri'
+        ]:
+            if item.get(i):
+                user_info[i] = item[i]
+        room_id = item.get('room_id')
+        if room_id:  # 直播间信息
+            user_info['live_room_id'] = room_id
+            user_info['live_room_url'] = [
+                f'http://pull-flv-f26.douyincdn.com/media/stream-{
+                    room_id}.flv',
+                f'http://pull-hls-f26.douyincdn.com/media/stream-{
+                    room_id}.m3u8'
+            ]
+        musician: dict = item.get('original_musician')
+        if musician and musician.get('music_count'):  # 原创音乐人
+            user_info['original_musician'] = item['original_musician']
+        return user_info
 
     def download_all(self):
         """
@@ -688,12 +1032,117 @@ class Douyin(object):
         if self.type not in ['user', 'follow', 'fans', 'live']:
             download(self.down_path, self.aria2_conf)
 
+    def download_stream(self, batch: int = None):
+        """
+        边采集边下载: 每采集到batch个作品就交给后台线程用aria2c下载，不用等全部采集完成；结束后照常保存结果
+
+        下载跟不上时队列满后采集暂停，等待下载；未找到aria2c时先采集完成再按download_all处理
+        """
+        if find_aria2c()[0] is None:
+            self.get_awemes_list()
+            self.download_all()
+            return
+        batch = batch or self.DOWNLOAD_BATCH
+        queue = Queue(maxsize=self.DOWNLOAD_QUEUE)
+        errors = []
+        worker = Thread(target=self.__download_worker, args=(queue, errors), daemon=True)
+        worker.start()
+        pending = []
+        try:
+            for aweme in self.iter_awemes():
+                pending.append(aweme)
+                if len(pending) >= batch:
+                    queue.put(pending)
+                    pending = []
+        finally:
+            if pending:
+                queue.put(pending)
+            queue.put(None)
+            worker.join()
+            self.save()
+        if errors:
+            raise errors[0]
+
+    def __download_worker(self, queue: Queue, errors: list):
+        conf = f'{self.aria2_conf}.part'
+        while True:
+            awemes = queue.get()
+            if awemes is None:
+                break
+            try:
+                with open(conf, 'w', encoding='utf-8') as f:
+                    f.writelines(self.__aria2_lines(awemes))
+                download(self.down_path, conf)
+            except Exception as e:
+                # 一批下载失败不影响后续的采集和下载，结束后抛出
+                logger.error(f'边采集边下载出错: {e}')
+                errors.append(e)
+            finally:
+                if os.path.exists(conf):
+                    os.remove(conf)
+
     def get_awemes(self):
         """获取视频列表，用于监控器调用"""
         self.__get_target_info()
         self.get_awemes_list()
         return self.results
 
+    def __aria2_lines(self, results: List[dict]) -> List[str]:
+        """
+        生成aria2c下载配置，用户类结果为主页链接
+        """
+        _ = []
+        # 保存主页链接
+        if self.type in ['user', 'follow', 'fans', 'live']:
+            _ = [
+                f"https://www.douyin.com/user/{line.get('sec_uid', 'None')}\n" for line in results
+                if line.get('sec_uid', None)
+            ]
+        # 保存作品下载配置
+        else:
+            for line in results:  # 只下载本次采集结果
+                # 使用标题_发布时间作为文件名（可读格式）
+                timestamp = line['time']
+                if timestamp:
+                    try:
+                        from datetime import datetime
+                        formatted_time = datetime.fromtimestamp(int(timestamp)).strftime('%Y-%m-%d_%H-%M-%S')
+                    except:
+                        formatted_time = str(timestamp)
+                else:
+                    formatted_time = 'unknown_time'
+
+                filename = f"{line['desc']}_{formatted_time}"
+                if self.type == 'collection':
+                    filename = f'第{line['no']}集_{filename}'
+                if type(line["download_addr"]) is list:
+                    if self.type == 'video':
+                        down_path = self.down_path.replace(
+                            line["id"], filename)
+                    else:
+                        down_path = os.path.join(
+                            self.down_path, filename)
+                    for index, addr in enumerate(line["download_addr"]):
+                        _.append(f'{addr}\n\tdir={down_path}\n\tout={
+                            line["id"]}_{index + 1}.jpeg\n')
+
+                elif type(line["download_addr"]) is str:
+                    # # 提供UA和cookie
+                    # _.append(
+                    #     f'{line["download_addr"]}\n\tdir={self.down_path}\n\tout={filename}.mp4\n\tuser-agent={
+                    #         self.request.HEADERS.get("User-Agent")}\n\theader="Cookie:{cookies_dict_to_str(self.request.COOKIES)}"\n')
+                    # 提供UA和msToken
+                    # _.append(
+                    #     f'{line["download_addr"]}\n\tdir={self.down_path}\n\tout={filename}.mp4\n\tuser-agent={
+                    #         self.request.HEADERS.get("User-Agent")}\n\theader="Cookie:msToken={self.request.get_ms_token()}"\n')
+                    # 提供UA和Cookie
+                    # 构建Cookie字符串
+                    cookie_str = '; '.join([f"{k}={v}" for k, v in self.request.COOKIES.items()])
+                    _.append(f'{line["download_addr"]}\n\tdir={self.down_path}\n\tout={filename}.mp4\n\treferer=https://www.douyin.com/\n\tuser-agent={self.request.HEADERS.get("User-Agent")}\n\theader="Cookie:{cookie_str}"\n')
+                else:
+                    logger.error("下载地址错误")
+        return _
+
     def save(self):
         if self.results:
             logger.success(f'采集完成，本次共采集到 {len(self.results)} 条结果')
@@ -701,59 +1150,12 @@ class Douyin(object):
             aria2_dir = os.path.dirname(self.aria2_conf)
             if aria2_dir:
                 os.makedirs(aria2_dir, exist_ok=True)
+            if self.type == 'collection':
+                # 合集按集数顺序保存和下载
+                self.results.sort(key=lambda item: item.get('no') or 0)
             # 保存下载配置文件
-            _ = []
             with open(self.aria2_conf, 'w', encoding='utf-8') as f:
-                # 保存主页链接
-                if self.type in ['user', 'follow', 'fans', 'live']:
-                    _ = [
-                        f"https://www.douyin.com/user/{line.get('sec_uid', 'None')}\n" for line in self.results
-                        if line.get('sec_uid', None)
-                    ]
-                # 保存作品下载配置
-                else:
-                    for line in self.results:  # 只下载本次采集结果
-                        # 使用标题_发布时间作为文件名（可读格式）
-                        timestamp = line['time']
-                        if timestamp:
-                            try:
-                                from datetime import datetime
-                                formatted_time = datetime.fromtimestamp(int(timestamp)).strftime('%Y-%m-%d_%H-%M-%S')
-                            except:
-                                formatted_time = str(timestamp)
-                        else:
-                            formatted_time = 'unknown_time'
-
-                        filename = f"{line['desc']}_{formatted_time}"
-                        if self.type == 'collection':
-                            filename = f'第{line['no']}集_{filename}'
-                        if type(line["download_addr"]) is list:
-                            if self.type == 'video':
-                                down_path = self.down_path.replace(
-                                    line["id"], filename)
-                            else:
-                                down_path = os.path.join(
-                                    self.down_path, filename)
-                            for index, addr in enumerate(line["download_addr"]):
-                                _.append(f'{addr}\n\tdir={down_path}\n\tout={
-                                    line["id"]}_{index + 1}.jpeg\n')
-
-                        elif type(line["download_addr"]) is str:
-                            # # 提供UA和cookie
-                            # _.append(
-                            #     f'{line["download_addr"]}\n\tdir={self.down_path}\n\tout={filename}.mp4\n\tuser-agent={
-                            #         self.request.HEADERS.get("User-Agent")}\n\theader="Cookie:{cookies_dict_to_str(self.request.COOKIES)}"\n')
-                            # 提供UA和msToken
-                            # _.append(
-                            #     f'{line["download_addr"]}\n\tdir={self.down_path}\n\tout={filename}.mp4\n\tuser-agent={
-                            #         self.request.HEADERS.get("User-Agent")}\n\theader="Cookie:msToken={self.request.get_ms_token()}"\n')
-                            # 提供UA和Cookie
-                            # 构建Cookie字符串
-                            cookie_str = '; '.join([f"{k}={v}" for k, v in self.request.COOKIES.items()])
-                            _.append(f'{line["download_addr"]}\n\tdir={self.down_path}\n\tout={filename}.mp4\n\treferer=https://www.douyin.com/\n\tuser-agent={self.request.HEADERS.get("User-Agent")}\n\theader="Cookie:{cookie_str}"\n')
-                        else:
-                            logger.error("下载地址错误")
-                f.writelines(_)
+                f.writelines(self.__aria2_lines(self.results))
 
             if self.type == 'post':
                 # 保存所有数据到文件，包括旧数据
@@ -5,15 +5,10 @@ import subprocess
 from loguru import logger
 
 
-def download(path, aria2_conf):
+def find_aria2c():
     """
-    命令行调用aria2c下载
+    查找aria2c可执行文件（支持打包环境），返回(路径, 尝试过的路径列表)，未找到时路径为None
     """
-    if not os.path.exists(aria2_conf):
-        logger.error('没有发现可下载的配置文件')
-        return
-
-    # 检查aria2c可执行文件是否存在（支持打包环境）
     possible_aria2c_paths = []
 
     # 1. 开发环境路径
@@ -35,14 +30,24 @@ def download(path, aria2_conf):
         possible_aria2c_paths = [path + '.exe' for path in possible_aria2c_paths]
 
     # 尝试找到存在的aria2c路径
-    aria2c_path = None
     for path in possible_aria2c_paths:
         if os.path.exists(path):
-            aria2c_path = path
-            logger.info(f"找到aria2c路径: {aria2c_path}")
-            break
+            return path, possible_aria2c_paths
+    return None, possible_aria2c_paths
+
+
+def download(path, aria2_conf):
+    """
+    命令行调用aria2c下载
+    """
+    if not os.path.exists(aria2_conf):
+        logger.error('没有发现可下载的配置文件')
+        return
 
-    if aria2c_path is None:
+    aria2c_path, possible_aria2c_paths = find_aria2c()
+    if aria2c_path:
+        logger.info(f"找到aria2c路径: {aria2c_path}")
+    else:
         logger.warning(f'未找到aria2c下载器，尝试的路径: {possible_aria2c_paths}')
         logger.info('请从 https://github.com/aria2/aria2/releases 下载aria2c并放置到项目根目录')
         logger.info(f'或者手动使用以下命令下载:')
@@ -3,12 +3,40 @@ from functools import partial  # 锁定参数
 import os
 
 # 修改subprocess.Popen以隐藏窗口并设置编码
+_Popen = subprocess.Popen
 if os.name == 'nt':  # Windows系统
-    subprocess.Popen = partial(subprocess.Popen, encoding="utf-8", creationflags=subprocess.CREATE_NO_WINDOW)
+    POPEN_KWARGS = {'encoding': 'utf-8', 'creationflags': subprocess.CREATE_NO_WINDOW}
 else:
-    subprocess.Popen = partial(subprocess.Popen, encoding="utf-8")
+    POPEN_KWARGS = {'encoding': 'utf-8'}
+subprocess.Popen = partial(_Popen, **POPEN_KWARGS)
 
 import execjs
+import execjs._external_runtime
+
+# execjs每次调用启动的node进程最长运行时间（秒），超时后结束进程并抛出subprocess.TimeoutExpired
+EXECJS_TIMEOUT = float(os.environ.get('DOUYIN_EXECJS_TIMEOUT', 30))
+
+
+class TimeoutPopen(_Popen):
+    """
+    只替换execjs使用的Popen，communicate默认带超时，避免卡住的node进程一直占用调用线程
+    """
+
+    def __init__(self, *args, **kwargs):
+        for key, value in POPEN_KWARGS.items():
+            kwargs.setdefault(key, value)
+        super().__init__(*args, **kwargs)
+
+    def communicate(self, input=None, timeout=None):
+        try:
+            return super().communicate(input, timeout or EXECJS_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.kill()
+            super().communicate()
+            raise
+
+
+execjs._external_runtime.Popen = TimeoutPopen
 
 # 使用Node.js但隐藏窗口运行
 print("使用Node.js作为JavaScript运行时（隐藏窗口）")
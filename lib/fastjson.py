@@ -0,0 +1,94 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   fastjson.py
+@Desc    :   接口响应的JSON解析，优先使用orjson，直接解析响应的原始字节，并按投影只保留需要的字段
+'''
+import ujson as json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 作品列表中每个作品保留的字段，与Douyin.__append_awemes读取的字段一致；True表示保留整个值
+AWEME = {
+    'aweme_id': True,
+    'awemeId': True,
+    'aweme_type': True,
+    'awemeType': True,
+    'create_time': True,
+    'createTime': True,
+    'is_top': True,
+    'tag': {'isTop': True},
+    'desc': True,
+    'duration': True,
+    'statistics': True,
+    'stats': True,
+    'video': {
+        'play_addr': {'url_list': True},
+        'cover': {'url_list': True},
+        'dynamicCover': True,
+        'duration': True,
+    },
+    'download': {'urlList': True},
+    'images': {'url_list': True, 'urlList': True},
+    'music': {'title': True, 'play_url': {'uri': True}, 'playUrl': {'uri': True}},
+    'author': {'nickname': True, 'sec_uid': True, 'secUid': True,
+               'avatar_thumb': {'url_list': True}, 'avatarThumb': {'urlList': True}},
+    'authorInfo': {'nickname': True, 'sec_uid': True, 'secUid': True,
+                   'avatar_thumb': {'url_list': True}, 'avatarThumb': {'urlList': True}},
+    'text_extra': {'hashtag_id': True, 'hashtagId': True, 'hashtag_name': True, 'hashtagName': True},
+    'textExtra': {'hashtag_id': True, 'hashtagId': True, 'hashtag_name': True, 'hashtagName': True},
+    'mix_info': {'statis': {'current_episode': True}},
+}
+# 搜索结果的作品包在aweme_info中
+AWEME_ITEM = dict(AWEME, aweme_info=AWEME)
+
+# 作品列表接口（主页、喜欢、收藏、合集、搜索等）的投影，保留翻页和状态字段
+AWEME_PAGE = {
+    'status_code': True,
+    'status_msg': True,
+    'has_more': True,
+    'max_cursor': True,
+    'min_cursor': True,
+    'cursor': True,
+    'min_time': True,
+    'log_pb': True,
+    'aweme_list': AWEME_ITEM,
+    'data': AWEME_ITEM,
+}
+
+
+def loads(content):
+    """
+    解析JSON，content可以是bytes或str；有orjson时直接解析原始字节，不需要先解码成str
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def project(value, spec):
+    """
+    按投影保留字段: spec为True时保留整个值，为dict时只保留其中的键并递归处理；列表按同一投影处理每个元素
+    """
+    if spec is True:
+        return value
+    if isinstance(value, list):
+        return [project(item, spec) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], sub) for key, sub in spec.items() if key in value}
+    return value
+
+
+def decode(content, spec: dict = None):
+    """
+    解析响应内容，指定spec时只返回投影后的字段，解析出的完整结构随即释放
+
+    解析失败时抛出ValueError（orjson.JSONDecodeError和ujson的错误都是ValueError的子类）
+    """
+    data = loads(content)
+    if spec is None or not isinstance(data, dict):
+        return data
+    return project(data, spec)
@@ -0,0 +1,123 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   fingerprint.py
+@Desc    :   设备指纹缓存，按cookie身份保存webid、verifyFp、msToken和uifid，多个进程和重启后共用
+'''
+import os
+import random
+import threading
+import time
+
+import ujson as json
+from loguru import logger
+
+# 指纹中保存的字段
+FIELDS = ('webid', 'verifyFp', 'msToken', 'uifid')
+
+
+def gen_verify_fp() -> str:
+    """
+    按网页端算法生成verifyFp（s_v_web_id）: verify_ + 毫秒时间戳的36进制 + _ + 36位随机串
+    """
+    chars = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+    millis = int(time.time() * 1000)
+    stamp = ''
+    while millis:
+        millis, index = divmod(millis, 36)
+        stamp = chars[index].lower() + stamp
+    uuid = [''] * 36
+    uuid[8] = uuid[13] = uuid[18] = uuid[23] = '_'
+    uuid[14] = '4'
+    for i in range(36):
+        if not uuid[i]:
+            index = random.randint(0, len(chars) - 1)
+            uuid[i] = chars[(index & 3) | 8 if i == 19 else index]
+    return f'verify_{stamp}_{"".join(uuid)}'
+
+
+class FingerprintStore(object):
+    """
+    线程安全的指纹缓存，保存在JSON文件中: {cookie身份: {webid, verifyFp, msToken, uifid, updated}}
+
+    文件被其他进程修改后自动重新读取，写入时先合并文件中的最新内容再整体替换，多个进程可以共用一个文件
+    """
+
+    PATH = os.environ.get('DOUYIN_FINGERPRINT_FILE', 'config/fingerprint.json')
+
+    def __init__(self, path: str = None):
+        self.path = path or self.PATH
+        self.data = {}
+        self.mtime = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self.mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+            self.mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.warning(f'读取指纹缓存失败: {e}')
+
+    def _save(self):
+        path = os.path.dirname(self.path)
+        if path:
+            os.makedirs(path, exist_ok=True)
+        tmp = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+            self.mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            logger.warning(f'保存指纹缓存失败: {e}')
+
+    def get(self, identity: str) -> dict:
+        """
+        返回保存的指纹，没有时返回空字典
+        """
+        with self.lock:
+            self._load()
+            return dict(self.data.get(identity, {}))
+
+    def set(self, identity: str, fingerprint: dict):
+        with self.lock:
+            self._load()
+            entry = {key: fingerprint[key] for key in FIELDS if fingerprint.get(key)}
+            entry['updated'] = int(time.time())
+            self.data[identity] = entry
+            self._save()
+
+    def invalidate(self, identity: str):
+        """
+        接口开始拒绝请求时调用，下次使用时重新生成指纹
+        """
+        with self.lock:
+            self._load()
+            if self.data.pop(identity, None) is not None:
+                self._save()
+                logger.info(f'已清除指纹缓存: {identity}')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_fingerprint_store() -> FingerprintStore:
+    """
+    获取全局共享的指纹缓存，首次调用时创建
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FingerprintStore()
+        return _store
+
+
+if __name__ == "__main__":
+    print(gen_verify_fp())
@@ -0,0 +1,73 @@
+// 常驻签名进程：启动时一次性加载签名脚本，之后通过stdin/stdout按行收发JSON
+// 请求: {"id": 1, "fn": "sign_datail", "args": ["query", "ua"]}
+// 响应: {"id": 1, "result": "..."} 或 {"id": 1, "error": "..."}
+// 批量请求: {"id": 2, "fn": "sign_datail", "batch": [["query1", "ua"], ["query2", "ua"]]}
+// 批量响应: {"id": 2, "result": ["...", null], "errors": {"1": "..."}}，单项失败时结果为null
+var fs = require('fs');
+var vm = require('vm');
+var readline = require('readline');
+
+// 标准输出只用于传输响应，脚本内的日志全部转到stderr
+var write = process.stdout.write.bind(process.stdout);
+console.log = console.info = console.warn = console.debug = function () {
+    process.stderr.write(Array.prototype.join.call(arguments, ' ') + '\n');
+};
+
+// 8.动态url测试.js 顶层使用require加载jsdom
+global.require = require;
+
+var functions = {};
+var errors = {};
+
+function load(file) {
+    try {
+        var names = Object.getOwnPropertyNames(global);
+        vm.runInThisContext(fs.readFileSync(file, 'utf8'), {filename: file});
+        Object.getOwnPropertyNames(global).forEach(function (name) {
+            if (names.indexOf(name) === -1 && typeof global[name] === 'function') {
+                functions[name] = global[name];
+            }
+        });
+    } catch (e) {
+        errors[file] = String(e && e.message || e);
+    }
+}
+
+process.argv.slice(2).forEach(load);
+
+write(JSON.stringify({id: 0, ready: true, functions: Object.keys(functions), errors: errors}) + '\n');
+
+readline.createInterface({input: process.stdin}).on('line', function (line) {
+    if (!line) {
+        return;
+    }
+    var request;
+    try {
+        request = JSON.parse(line);
+    } catch (e) {
+        return;
+    }
+    var response = {id: request.id};
+    try {
+        var fn = functions[request.fn];
+        if (!fn) {
+            throw new Error('未加载的函数: ' + request.fn + ' ' + JSON.stringify(errors));
+        }
+        if (request.batch) {
+            response.result = request.batch.map(function (args, index) {
+                try {
+                    return fn.apply(null, args);
+                } catch (e) {
+                    response.errors = response.errors || {};
+                    response.errors[index] = String(e && e.message || e);
+                    return null;
+                }
+            });
+        } else {
+            response.result = fn.apply(null, request.args || []);
+        }
+    } catch (e) {
+        response.error = String(e && e.message || e);
+    }
+    write(JSON.stringify(response) + '\n');
+});
@@ -0,0 +1,86 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   metrics.py
+@Desc    :   接口调用统计，代替每次请求输出的日志，按固定间隔输出一行汇总，并控制请求详情日志的采样
+'''
+import os
+import threading
+import time
+
+from loguru import logger
+
+
+class ApiStats(object):
+    """
+    线程安全的接口调用计数
+
+    record记录每次getJSON的结果，每隔interval秒在INFO级别输出一次各接口的汇总；
+    sample每sample_rate次成功调用返回一次True，用于决定是否输出这次请求的完整参数（DEBUG级别），为0时不输出
+    """
+
+    INTERVAL = float(os.environ.get('DOUYIN_STATS_INTERVAL', 60))
+    SAMPLE_RATE = int(os.environ.get('DOUYIN_LOG_SAMPLE', 100))
+
+    def __init__(self, interval: float = None, sample_rate: int = None):
+        self.interval = interval or self.INTERVAL
+        self.sample_rate = self.SAMPLE_RATE if sample_rate is None else max(0, int(sample_rate))
+        self.window = {}  # 本次汇总周期内的计数: uri -> 计数
+        self.totals = {}  # 进程启动以来的计数
+        self.successes = {}  # 各接口的成功次数，用于采样
+        self.last_report = time.monotonic()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _add(counters: dict, uri: str, ok: bool, attempts: int, size: int, seconds: float):
+        counter = counters.get(uri)
+        if counter is None:
+            counter = counters[uri] = {'calls': 0, 'ok': 0, 'failed': 0, 'retries': 0, 'bytes': 0, 'seconds': 0.0}
+        counter['calls'] += 1
+        counter['ok' if ok else 'failed'] += 1
+        counter['retries'] += max(0, attempts - 1)
+        counter['bytes'] += size
+        counter['seconds'] += seconds
+
+    def record(self, uri: str, ok: bool, attempts: int = 1, size: int = 0, seconds: float = 0.0):
+        now = time.monotonic()
+        with self.lock:
+            self._add(self.window, uri, ok, attempts, size, seconds)
+            self._add(self.totals, uri, ok, attempts, size, seconds)
+            if now - self.last_report < self.interval:
+                return
+            window, self.window = self.window, {}
+            elapsed, self.last_report = now - self.last_report, now
+        logger.info(f'接口统计（{elapsed:.0f}秒）: ' + '; '.join([
+            f"{uri} 调用{c['calls']} 成功{c['ok']} 失败{c['failed']} 重试{c['retries']} "
+            f"平均{c['seconds'] / c['calls'] * 1000:.0f}ms {c['bytes'] / 1024:.0f}KB"
+            for uri, c in sorted(window.items())]))
+
+    def sample(self, uri: str) -> bool:
+        """
+        是否输出这次成功调用的完整请求日志，每个接口的第1次和之后每sample_rate次输出一次
+        """
+        if not self.sample_rate:
+            return False
+        with self.lock:
+            count = self.successes.get(uri, 0)
+            self.successes[uri] = count + 1
+        return count % self.sample_rate == 0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {uri: dict(counter) for uri, counter in self.totals.items()}
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_api_stats() -> ApiStats:
+    """
+    获取全局共享的接口统计，首次调用时创建
+    """
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = ApiStats()
+        return _stats
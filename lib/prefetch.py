@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   prefetch.py
+@Desc    :   翻页预取: 按offset翻页的接口可以提前确定后续页的参数，在处理当前页时后台并发请求后面几页
+'''
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher(object):
+    """
+    按键在后台线程提前执行请求，同时最多window个；取用时等待结果，没有提前请求的键由调用方自己请求
+
+    不再需要的请求用cancel取消，尚未开始的不会发送，已经在进行的结果被丢弃；各请求在提交时调用方的上下文中运行，
+    取消令牌和重试预算照常生效
+
+        prefetcher = Prefetcher(3)
+        try:
+            prefetcher.submit(18, fetch, 18)
+            found, resp = prefetcher.pop(18)
+        finally:
+            prefetcher.close()
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='Prefetch')
+        self.futures = {}
+
+    def __len__(self):
+        return len(self.futures)
+
+    def submit(self, key, fn, *args, **kwargs) -> bool:
+        """
+        提前请求，已经提交过或进行中的请求已达到window个时返回False
+        """
+        if key in self.futures or len(self.futures) >= self.window:
+            return False
+        self.futures[key] = self.executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        return True
+
+    def pop(self, key) -> tuple:
+        """
+        取出提前请求的结果，返回(是否提前请求过, 结果)；请求出错时抛出原来的异常
+        """
+        future = self.futures.pop(key, None)
+        if future is None:
+            return False, None
+        return True, future.result()
+
+    def cancel(self):
+        """
+        取消所有未取用的请求
+        """
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+
+    def close(self):
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,236 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   proxy_pool.py
+@Desc    :   代理池，按接口请求的实际结果给每个代理打分（延迟和成功率），每次请求使用最健康且有空闲的代理，
+             连续失败的代理暂停使用，暂停时间指数增长
+'''
+import os
+import re
+import threading
+import time
+
+from loguru import logger
+
+# Request的proxy_url为此值时使用全局代理池
+POOL = 'pool'
+
+
+def parse_proxy(proxy_url: str) -> dict:
+    """
+    把代理地址转换为requests的proxies参数，没有协议时按socks5处理；proxy_url为空时返回None
+    """
+    if not proxy_url:
+        return None
+    if proxy_url.startswith('http://'):
+        return {'http': proxy_url, 'https': proxy_url.replace('http://', 'https://')}
+    if proxy_url.startswith('https://'):
+        return {'http': proxy_url.replace('https://', 'http://'), 'https': proxy_url}
+    if proxy_url.startswith('socks5://'):
+        return {'http': proxy_url, 'https': proxy_url}
+    if ':' in proxy_url:
+        # ip:port格式，默认使用socks5（最常用）
+        logger.info(f"使用SOCKS5代理: {proxy_url}")
+        return {'http': f'socks5://{proxy_url}', 'https': f'socks5://{proxy_url}'}
+    # 其他格式，默认为http
+    return {'http': f'http://{proxy_url}', 'https': f'https://{proxy_url}'}
+
+
+def load_proxies(source) -> list:
+    """
+    读取代理列表: source可以是列表、代理文件路径（每行一个，#开头为注释），或用逗号、分号、空白分隔的字符串
+    """
+    if not source:
+        return []
+    if isinstance(source, str):
+        if os.path.isfile(source):
+            with open(source, 'r', encoding='utf-8') as f:
+                source = [line.split('#')[0] for line in f]
+        else:
+            source = re.split(r'[,;\s]+', source)
+    proxies = []
+    for proxy_url in source:
+        proxy_url = proxy_url.strip()
+        if proxy_url and proxy_url not in proxies:
+            proxies.append(proxy_url)
+    return proxies
+
+
+def resolve_proxy_url(value: str) -> str:
+    """
+    界面中填写的代理: 填写了多个代理或代理文件时加载到全局代理池并返回POOL，否则原样返回
+    """
+    value = (value or '').strip()
+    if value == POOL:
+        return value
+    proxies = load_proxies(value)
+    if len(proxies) > 1 or (value and os.path.isfile(value)):
+        configure_proxy_pool(proxies)
+        return POOL
+    return value
+
+
+class Proxy(object):
+    """
+    代理池中的一个代理及其统计
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.proxies = parse_proxy(url)
+        self.latency = None  # 成功请求耗时的指数移动平均（秒），未使用过时为None
+        self.success = 1.0  # 成功率的指数移动平均，新代理先按全部成功计算，保证会被尝试
+        self.inflight = 0  # 正在使用此代理的请求数
+        self.failures = 0  # 连续失败次数
+        self.strikes = 0  # 连续被暂停的次数，决定下次暂停时间
+        self.until = 0.0  # 暂停到的时间（time.monotonic）
+        self.requests = 0
+        self.errors = 0
+
+    def score(self, default_latency: float) -> float:
+        """
+        健康分数，越高越好: 成功率 / 平均延迟，按正在进行的请求数分摊
+        """
+        return self.success / (self.latency or default_latency) / (1 + self.inflight)
+
+
+class ProxyPool(object):
+    """
+    线程安全的代理池
+
+    acquire返回(代理, 需要等待的秒数)，请求结束后必须调用release报告结果；
+    连续失败failures次的代理暂停cooldown秒，再次被暂停时翻倍，最长max_cooldown秒，成功一次后恢复
+
+        proxy, wait = pool.acquire()
+        while proxy is None and wait:  # 所有代理都已满max_inflight
+            time.sleep(wait)
+            proxy, wait = pool.acquire()
+        time.sleep(wait)
+        try:
+            ...  # 使用proxy.proxies发送请求
+        finally:
+            pool.release(proxy, ok, seconds)
+    """
+
+    MAX_INFLIGHT = int(os.environ.get('DOUYIN_PROXY_MAX_INFLIGHT', 4))
+    COOLDOWN = float(os.environ.get('DOUYIN_PROXY_COOLDOWN', 30))
+    MAX_COOLDOWN = float(os.environ.get('DOUYIN_PROXY_MAX_COOLDOWN', 600))
+    FAILURES = int(os.environ.get('DOUYIN_PROXY_FAILURES', 2))
+    DEFAULT_LATENCY = 1.0  # 未使用过的代理按1秒延迟计算分数
+    BUSY_WAIT = 0.05  # 所有代理都已满max_inflight时，调用方等待多久后重新选择（秒）
+    ALPHA = 0.3  # 指数移动平均中最新结果的权重
+
+    def __init__(self, proxies=None, max_inflight: int = None, cooldown: float = None, max_cooldown: float = None,
+                 failures: int = None):
+        self.max_inflight = max_inflight or self.MAX_INFLIGHT
+        self.cooldown = cooldown or self.COOLDOWN
+        self.max_cooldown = max_cooldown or self.MAX_COOLDOWN
+        self.failures = failures or self.FAILURES
+        self.proxies = []
+        self.lock = threading.Lock()
+        self.update(proxies)
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def update(self, proxies):
+        """
+        替换代理列表，仍在列表中的代理保留统计
+        """
+        urls = load_proxies(proxies)
+        with self.lock:
+            existing = {proxy.url: proxy for proxy in self.proxies}
+            self.proxies = [existing.get(url) or Proxy(url) for url in urls]
+        if urls:
+            logger.info(f'代理池已加载 {len(urls)} 个代理')
+
+    def acquire(self) -> tuple:
+        """
+        选择代理，返回(代理, 需要等待的秒数)；代理池为空时返回(None, 0)
+
+        每个代理同时进行的请求不超过max_inflight: 选择未暂停且未满的代理中分数最高的；未暂停的代理都已满时
+        返回(None, BUSY_WAIT)，调用方等待后重新选择；全部暂停时返回未满的代理中最早恢复的和剩余暂停时间
+        """
+        now = time.monotonic()
+        with self.lock:
+            if not self.proxies:
+                return None, 0.0
+            free = [proxy for proxy in self.proxies if proxy.inflight < self.max_inflight]
+            available = [proxy for proxy in free if proxy.until <= now]
+            if available:
+                proxy = max(available, key=lambda proxy: proxy.score(self.DEFAULT_LATENCY))
+                wait = 0.0
+            elif free and all(proxy.until > now for proxy in self.proxies):
+                proxy = min(free, key=lambda proxy: proxy.until)
+                wait = proxy.until - now
+            else:
+                return None, self.BUSY_WAIT
+            proxy.inflight += 1
+            return proxy, wait
+
+    def release(self, proxy: Proxy, ok: bool = None, seconds: float = 0.0):
+        """
+        报告请求结果: ok为True时更新延迟，为False时计入失败，为None（请求未发送）时只归还占用
+        """
+        if proxy is None:
+            return
+        with self.lock:
+            proxy.inflight = max(0, proxy.inflight - 1)
+            if ok is None:
+                return
+            proxy.requests += 1
+            proxy.success = (1 - self.ALPHA) * proxy.success + self.ALPHA * (1.0 if ok else 0.0)
+            if ok:
+                proxy.latency = seconds if proxy.latency is None else (1 - self.ALPHA) * proxy.latency + self.ALPHA * seconds
+                proxy.failures = 0
+                proxy.strikes = 0
+                return
+            proxy.errors += 1
+            proxy.failures += 1
+            if proxy.failures < self.failures:
+                return
+            cooldown = min(self.max_cooldown, self.cooldown * 2 ** proxy.strikes)
+            proxy.strikes += 1
+            proxy.failures = 0
+            proxy.until = time.monotonic() + cooldown
+        logger.warning(f'代理连续失败，暂停使用{cooldown:.0f}秒: {proxy.url}')
+
+    def snapshot(self) -> list:
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                'url': proxy.url,
+                'latency_ms': round(proxy.latency * 1000) if proxy.latency is not None else None,
+                'success_rate': round(proxy.success, 3),
+                'inflight': proxy.inflight,
+                'requests': proxy.requests,
+                'errors': proxy.errors,
+                'paused_seconds': round(max(0.0, proxy.until - now), 1),
+            } for proxy in self.proxies]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_proxy_pool() -> ProxyPool:
+    """
+    获取全局共享的代理池，首次调用时从DOUYIN_PROXY_FILE指定的文件加载（默认config/proxies.txt，不存在时为空）
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProxyPool(os.environ.get('DOUYIN_PROXY_FILE', 'config/proxies.txt'))
+        return _pool
+
+
+def configure_proxy_pool(proxies=None, max_inflight: int = None, cooldown: float = None) -> ProxyPool:
+    """
+    配置全局代理池；已创建时原地更新，使用中的Request实例立即生效
+    """
+    pool = get_proxy_pool()
+    with pool.lock:
+        pool.max_inflight = max_inflight or pool.max_inflight
+        pool.cooldown = cooldown or pool.cooldown
+    if proxies is not None and load_proxies(proxies) != [proxy.url for proxy in pool.proxies]:
+        pool.update(proxies)
+    return pool
@@ -0,0 +1,178 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   ratelimit.py
+@Desc    :   自适应令牌桶限速，按(接口, cookie身份, 代理)分别控制请求速率
+             成功时缓慢提速，被限流时成倍降速并暂停一段时间（AIMD），在不触发反爬的前提下保持尽可能高的持续速率
+'''
+import os
+import threading
+import time
+
+from loguru import logger
+
+
+class TokenBucket(object):
+    """
+    单个限速键的令牌桶
+
+    令牌可以透支为负数，表示已经排队等待的请求，reserve返回本次请求需要等待的秒数，
+    同步请求sleep、异步请求await asyncio.sleep即可，排队顺序与调用顺序一致
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float, max_rate: float):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # 被限流后暂停到此时间
+        self.last_decrease = 0.0
+        self.throttles = 0  # 连续被限流的次数
+        self.successes = 0
+        self.failures = 0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        self._refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def success(self, increase: float):
+        self.successes += 1
+        self.throttles = 0
+        self.rate = min(self.max_rate, self.rate + increase)
+
+    def throttle(self, now: float, decrease: float, interval: float, cooldown: float, max_cooldown: float) -> bool:
+        """
+        返回是否降速；并发中的多个请求同时失败只算一次，interval秒内不重复降速
+        """
+        self.failures += 1
+        if now - self.last_decrease < interval:
+            return False
+        self._refill(now)
+        self.last_decrease = now
+        self.throttles += 1
+        self.rate = max(self.min_rate, self.rate * decrease)
+        # 丢弃积攒的令牌，暂停时间随连续限流次数翻倍
+        self.tokens = min(self.tokens, 0)
+        self.blocked_until = max(self.blocked_until, now + min(max_cooldown, cooldown * 2 ** (self.throttles - 1)))
+        return True
+
+
+class RateLimiter(object):
+    """
+    线程安全的限速器，所有Request实例共用
+
+    每个(接口路径, cookie身份, 代理)一个令牌桶，不同账号和代理之间互不影响；
+    rates可以为单个接口路径指定初始速率，未指定的使用rate
+    """
+
+    RATE = float(os.environ.get('DOUYIN_RATE', 2))  # 每个限速键的初始速率（次/秒）
+    BURST = float(os.environ.get('DOUYIN_RATE_BURST', 4))  # 空闲后允许的突发请求数
+    MIN_RATE = float(os.environ.get('DOUYIN_RATE_MIN', 0.2))
+    MAX_RATE = float(os.environ.get('DOUYIN_RATE_MAX', 10))
+    INCREASE = 0.1  # 每次成功增加的速率
+    DECREASE = 0.5  # 被限流时速率乘以的系数
+    DECREASE_INTERVAL = 1.0  # 两次降速之间的最短间隔（秒）
+    COOLDOWN = 1.0  # 被限流后的暂停时间（秒），连续限流时翻倍
+    MAX_COOLDOWN = 60.0
+
+    def __init__(self, rate: float = None, burst: float = None, min_rate: float = None, max_rate: float = None,
+                 rates: dict = None):
+        self.rate = rate or self.RATE
+        self.burst = max(1.0, burst or self.BURST)
+        self.min_rate = min_rate or self.MIN_RATE
+        self.max_rate = max(self.rate, max_rate or self.MAX_RATE)
+        self.rates = dict(rates or {})
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def _bucket(self, key: tuple) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            rate = self.rates.get(key[0], self.rate)
+            bucket = TokenBucket(rate, self.burst, min(rate, self.min_rate), max(rate, self.max_rate))
+            self.buckets[key] = bucket
+        return bucket
+
+    def reserve(self, key: tuple) -> float:
+        """
+        预留一个令牌，返回发送请求前需要等待的秒数
+        """
+        with self.lock:
+            return self._bucket(key).reserve(time.monotonic())
+
+    def acquire(self, key: tuple):
+        wait = self.reserve(key)
+        if wait > 0:
+            time.sleep(wait)
+
+    def success(self, key: tuple):
+        with self.lock:
+            self._bucket(key).success(self.INCREASE)
+
+    def throttle(self, key: tuple, reason: str = ''):
+        """
+        请求被限流（返回错误状态码、空响应等）时调用
+        """
+        with self.lock:
+            bucket = self._bucket(key)
+            decreased = bucket.throttle(time.monotonic(), self.DECREASE, self.DECREASE_INTERVAL, self.COOLDOWN,
+                                        self.MAX_COOLDOWN)
+            rate, cooldown = bucket.rate, bucket.blocked_until - time.monotonic()
+        if decreased:
+            logger.warning(f'请求被限流({reason})，{key[0]} 降速至{rate:.2f}次/秒，暂停{cooldown:.1f}秒')
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {key: {'rate': round(bucket.rate, 3), 'successes': bucket.successes, 'failures': bucket.failures}
+                    for key, bucket in self.buckets.items()}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    获取全局共享的限速器，首次调用时创建
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def configure_rate_limiter(rate: float = None, burst: float = None, min_rate: float = None, max_rate: float = None,
+                           rates: dict = None) -> RateLimiter:
+    """
+    按新配置重建全局限速器，配置未变化时直接返回现有限速器
+    """
+    global _limiter
+    limiter = RateLimiter(rate, burst, min_rate, max_rate, rates)
+    with _limiter_lock:
+        if _limiter is not None and (
+                (_limiter.rate, _limiter.burst, _limiter.min_rate, _limiter.max_rate, _limiter.rates)
+                == (limiter.rate, limiter.burst, limiter.min_rate, limiter.max_rate, limiter.rates)):
+            return _limiter
+        _limiter = limiter
+        return _limiter
+
+
+if __name__ == "__main__":
+    limiter = get_rate_limiter()
+    key = ('/aweme/v1/web/aweme/post/', 'test', '')
+    start = time.monotonic()
+    for i in range(10):
+        limiter.acquire(key)
+        limiter.success(key)
+        print(f'{time.monotonic() - start:.2f}s', limiter.stats()[key])
+    limiter.throttle(key, 'test')
+    limiter.acquire(key)
+    print(f'{time.monotonic() - start:.2f}s', limiter.stats()[key])
@@ -0,0 +1,285 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   replay.py
+@Desc    :   HTTP录制与回放: 录制模式把每次请求和响应写入压缩存档（cookie只保存身份标识），
+             回放模式从存档返回响应，不访问网络，用于排除网络波动后对签名、解析、数据库写入等CPU开销做回归测试
+
+用法:
+    # 录制一轮真实的监控检查
+    DOUYIN_HTTP_MODE=record DOUYIN_HTTP_ARCHIVE=monitor.har.gz python web_monitor.py
+    # 全速回放（同时放开接口限速）
+    DOUYIN_HTTP_MODE=replay DOUYIN_HTTP_ARCHIVE=monitor.har.gz python ...
+
+    # 或在代码中创建Request之前调用
+    configure_replay('replay', 'monitor.har.gz')
+'''
+import base64
+import gzip
+import os
+import threading
+import time
+import urllib.parse
+
+import requests
+import ujson as json
+from loguru import logger
+from requests.structures import CaseInsensitiveDict
+
+MODES = ('record', 'replay')
+# 不参与请求匹配的参数: 签名、时间戳、设备指纹，以及Request.PARAMS中固定的客户端环境参数，每次运行都可能不同
+IGNORED_PARAMS = {
+    'a_bogus', 'X-Bogus', '_signature', 'timestamp', 'msToken', 'verifyFp', 'fp', 'webid', 'uifid',
+    'x-secsdk-web-signature', 'device_platform', 'aid', 'channel', 'source', 'personal_center_strategy',
+    'profile_other_record_enable', 'land_to', 'update_version_code', 'pc_client_type', 'pc_libra_divert',
+    'support_h265', 'support_dash', 'cpu_core_num', 'version_code', 'version_name', 'cookie_enabled',
+    'screen_width', 'screen_height', 'browser_language', 'browser_platform', 'browser_name', 'browser_version',
+    'browser_online', 'engine_name', 'engine_version', 'os_name', 'os_version', 'device_memory', 'platform',
+    'downlink', 'effective_type', 'round_trip_time',
+}
+# 存档中保存的响应头，Set-Cookie等不保存
+KEPT_HEADERS = ('content-type', 'location', 'content-range', 'accept-ranges')
+
+
+def request_key(method: str, url: str, params: dict = None, data=None) -> str:
+    """
+    请求的匹配键: 方法、域名、路径和去掉IGNORED_PARAMS后按名称排序的参数
+    """
+    parts = urllib.parse.urlsplit(url)
+    query = dict(urllib.parse.parse_qsl(parts.query, keep_blank_values=True))
+    query.update({k: v for k, v in (params or {}).items() if v is not None})
+    items = sorted((k, str(v)) for k, v in query.items() if k not in IGNORED_PARAMS)
+    key = f'{method.upper()} {parts.netloc}{parts.path}?{urllib.parse.urlencode(items)}'
+    if isinstance(data, dict):
+        key += ' ' + urllib.parse.urlencode(sorted((k, str(v)) for k, v in data.items()))
+    elif data:
+        key += ' ' + (data.decode('utf-8', 'replace') if isinstance(data, bytes) else str(data))
+    return key
+
+
+def cookie_label(cookies: dict) -> str:
+    """
+    存档中代替cookie的账号标识，不保存cookie内容
+    """
+    # cookies模块依赖session模块，在使用时导入，避免循环导入
+    try:
+        from .cookies import cookie_identity
+    except ImportError:
+        from cookies import cookie_identity
+    return cookie_identity(cookies or {})
+
+
+class HttpArchive(object):
+    """
+    gzip压缩的JSON Lines存档，每行一次请求:
+    {key, method, url, cookie, status, headers, body（utf-8文本）或body_b64, elapsed}
+
+    url中的签名和设备指纹参数在写入前去掉
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+        with self.lock:
+            if self.file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.file = gzip.open(self.path, 'ab')
+            self.file.write(line)
+            # 每条记录都刷新到磁盘，进程被中断时已录制的部分仍然可用
+            self.file.flush()
+            self.count += 1
+
+    def load(self) -> dict:
+        """
+        读取存档，返回 匹配键 -> [记录, ...]（按录制顺序）
+        """
+        records = {}
+        with gzip.open(self.path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records.setdefault(record['key'], []).append(record)
+        return records
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def _strip_url(url: str) -> str:
+    parts = urllib.parse.urlsplit(url)
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if k not in IGNORED_PARAMS]
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+def _build_response(record: dict, url: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = record['status']
+    response.headers = CaseInsensitiveDict(record.get('headers') or {})
+    if 'body_b64' in record:
+        response._content = base64.b64decode(record['body_b64'])
+    else:
+        response._content = record.get('body', '').encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = url
+    response.reason = 'Replayed'
+    return response
+
+
+class RecordingSession(object):
+    """
+    包装连接池，请求照常发送，同时把请求和响应写入存档；其余属性（timeout、pool_size等）与被包装的连接池相同
+    """
+
+    def __init__(self, session, archive: HttpArchive):
+        self.inner = session
+        self.archive = archive
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def request(self, method: str, url: str, params: dict = None, data=None, cookies: dict = None, **kwargs):
+        started = time.perf_counter()
+        response = self.inner.request(method, url, params=params, data=data, cookies=cookies, **kwargs)
+        elapsed = time.perf_counter() - started
+        content = response.content
+        record = {
+            'key': request_key(method, url, params, data),
+            'method': method.upper(),
+            'url': _strip_url(str(response.url or url)),
+            'cookie': cookie_label(cookies),
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() in KEPT_HEADERS},
+            'elapsed': round(elapsed, 4),
+        }
+        try:
+            record['body'] = content.decode('utf-8')
+        except UnicodeDecodeError:
+            record['body_b64'] = base64.b64encode(content).decode('ascii')
+        self.archive.append(record)
+        return response
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        self.archive.close()
+        self.inner.close()
+
+
+class ReplaySession(object):
+    """
+    从存档返回响应的连接池，不访问网络
+
+    同一请求录制了多次时按录制顺序依次返回，用完后重复返回最后一次；存档中没有的请求抛出ConnectionError，
+    按网络异常处理；realtime为True时按录制时的耗时等待，否则全速返回
+    """
+
+    def __init__(self, archive: HttpArchive, session=None, realtime: bool = False):
+        self.inner = session
+        self.archive = archive
+        self.realtime = realtime
+        self.records = archive.load()
+        self.positions = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        logger.info(f'HTTP回放: 已加载 {sum(len(v) for v in self.records.values())} 条记录，{self.archive.path}')
+
+    def __getattr__(self, name):
+        if self.inner is None:
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def request(self, method: str, url: str, params: dict = None, data=None, **kwargs):
+        key = request_key(method, url, params, data)
+        with self.lock:
+            records = self.records.get(key)
+            if not records:
+                self.misses += 1
+                record = None
+            else:
+                self.hits += 1
+                position = self.positions.get(key, 0)
+                self.positions[key] = position + 1
+                record = records[min(position, len(records) - 1)]
+        if record is None:
+            logger.warning(f'HTTP回放: 存档中没有此请求: {key}')
+            raise requests.exceptions.ConnectionError(f'回放存档中没有此请求: {key}')
+        if self.realtime:
+            time.sleep(record.get('elapsed', 0))
+        return _build_response(record, record.get('url') or url)
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        logger.info(f'HTTP回放: 命中 {self.hits} 次，未命中 {self.misses} 次')
+        if self.inner is not None:
+            self.inner.close()
+
+
+_mode = os.environ.get('DOUYIN_HTTP_MODE', '')
+_path = os.environ.get('DOUYIN_HTTP_ARCHIVE', 'config/http_archive.jsonl.gz')
+_realtime = os.environ.get('DOUYIN_HTTP_REALTIME', '') == '1'
+_lock = threading.Lock()
+
+
+def wrap_session(session):
+    """
+    按当前的录制/回放设置包装新建的连接池，未启用时原样返回；由session模块在创建连接池时调用
+    """
+    with _lock:
+        if _mode == 'record':
+            logger.info(f'HTTP录制: 写入 {_path}')
+            return RecordingSession(session, HttpArchive(_path))
+        if _mode == 'replay':
+            return ReplaySession(HttpArchive(_path), session, _realtime)
+    return session
+
+
+def unwrap_session(session):
+    """
+    返回被包装的原始连接池
+    """
+    return session.inner if isinstance(session, (RecordingSession, ReplaySession)) else session
+
+
+def configure_replay(mode: str = '', path: str = None, realtime: bool = None):
+    """
+    设置录制/回放模式: mode为record、replay或空（关闭），并重建全局连接池；
+    使用全局连接池的Request实例（包括get_request缓存的）下次请求即使用新的连接池，创建时指定了session的不受影响
+    """
+    global _mode, _path, _realtime
+    if mode and mode not in MODES:
+        raise ValueError(f'未知的HTTP模式: {mode}，可选 {", ".join(MODES)}')
+    with _lock:
+        _mode = mode or ''
+        _path = path or _path
+        _realtime = _realtime if realtime is None else realtime
+    try:
+        from .session import reset_session
+    except ImportError:
+        from session import reset_session
+    reset_session()
@@ -11,18 +11,46 @@ import os
 import time
 import random
 import re
+import threading
+import urllib.parse
+from collections import OrderedDict
 from urllib.parse import quote
 
 import requests
+import ujson as json
 from loguru import logger
 
 try:
-    from .cookies import get_cookie_dict
+    from . import abogus
+    from . import cancel
+    from . import fastjson
+    from .breaker import get_circuit_breaker
+    from .cookies import cookie_identity, get_cookie_dict
     from .execjs_fix import execjs
+    from .fingerprint import gen_verify_fp, get_fingerprint_store
+    from .metrics import get_api_stats
+    from .proxy_pool import POOL, get_proxy_pool, parse_proxy
+    from .ratelimit import get_rate_limiter
+    from .retry import current_budget
+    from .session import get_session
+    from .sign_pool import get_sign_pool
+    from .util import get_js_path, get_node_modules_path
 except ImportError:
     # 当作为独立模块运行时使用绝对导入
-    from cookies import get_cookie_dict
+    import abogus
+    import cancel
+    import fastjson
+    from breaker import get_circuit_breaker
+    from cookies import cookie_identity, get_cookie_dict
     from execjs_fix import execjs
+    from fingerprint import gen_verify_fp, get_fingerprint_store
+    from metrics import get_api_stats
+    from proxy_pool import POOL, get_proxy_pool, parse_proxy
+    from ratelimit import get_rate_limiter
+    from retry import current_budget
+    from session import get_session
+    from sign_pool import get_sign_pool
+    from util import get_js_path, get_node_modules_path
 
 
 class Request(object):
@@ -84,17 +112,40 @@ class Request(object):
         'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36',
     }
     filepath = os.path.dirname(__file__)
+    # node在node_modules目录下运行即可找到内置的jsdom，每个上下文固定cwd，无需切换进程工作目录
+    NODE_CWD = get_node_modules_path() if os.path.isdir(get_node_modules_path()) else None
     try:
         SIGN = execjs.compile(
-            open(os.path.join(filepath, 'js/douyin_minimal.js'), 'r', encoding='utf-8').read())
+            open(os.path.join(filepath, 'js/douyin_minimal.js'), 'r', encoding='utf-8').read(), cwd=NODE_CWD)
     except Exception as e:
         # 如果JavaScript编译失败，使用备用方案
         logger.warning(f"JavaScript编译失败，使用备用签名方案: {e}")
         SIGN = None
+    A_BOGUS = None  # execjs后端的a_bogus上下文，首次使用时编译
     WEBID = ''
-
-    def __init__(self, cookie='', UA='', proxy_url=''):
+    # 签名后端: pool 常驻node进程池（默认）; execjs 每次调用启动新的node进程; native 纯Python实现，无需node
+    SIGNER = 'pool'
+    # 批量预签名的结果，所有实例共享: (uri, 参数, UA, cookie) -> (签名时间, 完整参数, 签名)
+    PRESIGNED = {}
+    PRESIGNED_LOCK = threading.Lock()
+    PRESIGN_TTL = 120  # 预签名结果的有效期（秒），超时后重新签名
+
+    def __init__(self, cookie='', UA='', proxy_url='', signer='', session=None, limiter=None, breaker=None,
+                 fingerprints=None, proxy_pool=None):
         self.COOKIES = get_cookie_dict(cookie)
+        self.signer = signer or self.SIGNER
+        # 连接池、限速器、熔断器、指纹缓存和代理池未指定时在使用时取全局共享的对象（见下面的属性），
+        # get_request缓存的实例在configure_*重建这些对象后也立即使用新的
+        self._session = session
+        self._limiter = limiter
+        self._breaker = breaker
+        self._fingerprints = fingerprints
+        self.identity = cookie_identity(self.COOKIES)
+        self.fingerprint = None
+        self.lock = threading.Lock()
+        # 每个实例持有独立的请求头和参数，避免修改类属性影响其他线程中的实例
+        self.HEADERS = self.HEADERS.copy()
+        self.PARAMS = self.PARAMS.copy()
         if UA:  # 如果需要访问搜索页面源码等内容，需要提供cookie对应的UA
             version = UA.split(' Chrome/')[1].split(' ')[0]
             _version = version.split('.')[0]
@@ -107,57 +158,111 @@ class Request(object):
                 "engine_version": version,  # 主要是这个
             })
 
-        # 设置代理
-        self.proxies = None
-        if proxy_url:
-            if proxy_url.startswith('http://'):
-                https_url = proxy_url.replace('http://', 'https://')
-                self.proxies = {'http': proxy_url, 'https': https_url}
-            elif proxy_url.startswith('https://'):
-                http_url = proxy_url.replace('https://', 'http://')
-                self.proxies = {'http': http_url, 'https': proxy_url}
-            elif proxy_url.startswith('socks5://'):
-                self.proxies = {'http': proxy_url, 'https': proxy_url}
-            elif ':' in proxy_url and not proxy_url.startswith(('http://', 'https://', 'socks5://')):
-                # ip:port格式，尝试多种协议
-                # 首先尝试socks5（最常用）
-                self.proxies = {'http': f'socks5://{proxy_url}', 'https': f'socks5://{proxy_url}'}
-                logger.info(f"使用SOCKS5代理: {proxy_url}")
-            else:
-                # 其他格式，默认为http
-                self.proxies = {'http': f'http://{proxy_url}', 'https': f'https://{proxy_url}'}
+        # 设置代理，proxy_url为POOL或传入proxy_pool时每次请求从代理池选择代理
+        self._proxy_pool = proxy_pool
+        self.use_proxy_pool = proxy_pool is not None or proxy_url == POOL
+        self.proxies = None if self.use_proxy_pool else parse_proxy(proxy_url)
 
         # 如果设置了代理，添加调试信息
-        if self.proxies:
+        if self.proxy_pool is not None:
+            if len(self.proxy_pool):
+                logger.info(f"使用代理池，共 {len(self.proxy_pool)} 个代理")
+            else:
+                logger.warning("代理池为空，使用直连模式")
+        elif self.proxies:
             logger.info(f"代理设置完成: HTTP={self.proxies.get('http', 'None')}, HTTPS={self.proxies.get('https', 'None')}")
         else:
             logger.info("未设置代理，使用直连模式")
 
-
+    @property
+    def session(self):
+        # 默认使用全局共享的连接池，所有实例复用到抖音的keep-alive连接
+        return self._session or get_session()
+
+    @property
+    def limiter(self):
+        # 默认使用全局共享的限速器，同一账号和代理的所有实例共用速率
+        return self._limiter or get_rate_limiter()
+
+    @property
+    def breaker(self):
+        # 同一账号和代理连续失败时熔断，所有实例一起暂停请求
+        return self._breaker or get_circuit_breaker()
+
+    @property
+    def fingerprints(self):
+        # 设备指纹按cookie身份持久化，新实例不再重新请求首页获取webid
+        return self._fingerprints or get_fingerprint_store()
+
+    @property
+    def proxy_pool(self):
+        if not self.use_proxy_pool:
+            return None
+        # 代理池定义了__len__，传入空代理池时不能用or判断
+        return self._proxy_pool if self._proxy_pool is not None else get_proxy_pool()
 
     def get_params(self, params: dict) -> dict:
+        fingerprint = self.get_fingerprint()
         params.update(self.PARAMS)
-        params['msToken'] = self.get_ms_token()
+        params['msToken'] = fingerprint['msToken']
         params['screen_width'] = self.COOKIES.get('dy_swidth', 2560)
         params['screen_height'] = self.COOKIES.get('dy_sheight', 1440)
         params['cpu_core_num'] = self.COOKIES.get('device_web_cpu_core', 12)
         params['device_memory'] = self.COOKIES.get('device_web_memory_size', 8)
-        params['verifyFp'] = self.COOKIES.get('s_v_web_id', None)
-        params['fp'] = self.COOKIES.get('s_v_web_id', None)
-        params['webid'] = self.get_webid()
+        params['verifyFp'] = fingerprint['verifyFp']
+        params['fp'] = fingerprint['verifyFp']
+        params['webid'] = fingerprint['webid']
         # 添加uifid参数
         if 'uifid' not in params:
-            params['uifid'] = self.HEADERS.get('uifid', '')
+            params['uifid'] = fingerprint['uifid']
         return params
 
+    def get_fingerprint(self) -> dict:
+        """
+        返回设备指纹{webid, verifyFp, msToken, uifid}，cookie中有的值优先使用cookie，
+        其余的从指纹缓存中读取，缓存中没有时生成一次并保存
+        """
+        # 同一实例可能被多个线程共用，只生成一次
+        with self.lock:
+            if self.fingerprint is None:
+                stored = self.fingerprints.get(self.identity)
+                fingerprint = {
+                    'webid': self.WEBID or stored.get('webid') or self.get_webid(),
+                    'verifyFp': self.COOKIES.get('s_v_web_id') or stored.get('verifyFp') or gen_verify_fp(),
+                    'msToken': self.COOKIES.get('msToken') or stored.get('msToken') or self.get_ms_token(),
+                    'uifid': self.COOKIES.get('UIFID') or stored.get('uifid') or self.HEADERS.get('uifid', ''),
+                }
+                if any(stored.get(key) != value for key, value in fingerprint.items()):
+                    self.fingerprints.set(self.identity, fingerprint)
+                self.fingerprint = fingerprint
+            return self.fingerprint
+
+    def reset_fingerprint(self):
+        """
+        接口持续拒绝请求时清除指纹缓存，下次请求重新生成
+        """
+        with self.lock:
+            self.fingerprints.invalidate(self.identity)
+            self.fingerprint = None
+            # 清除get_webid保存在实例上的结果，类属性上手动指定的WEBID保持不变
+            self.__dict__.pop('WEBID', None)
+
     def get_sign(self, uri: str, params: dict) -> str:
-        """获取签名，使用嵌入式JS引擎"""
-        if self.SIGN:
+        """获取签名，使用纯Python实现、常驻签名进程池或嵌入式JS引擎"""
+        query = '&'.join([f'{k}={quote(str(v))}' for k, v in params.items()])
+        call_name = 'sign_datail'
+        if 'reply' in uri:
+            call_name = 'sign_reply'
+        if self.signer == 'native':
+            return getattr(abogus, call_name)(query, self.HEADERS.get("user-agent"))
+        if self.signer == 'pool':
+            try:
+                return get_sign_pool().call(call_name, query, self.HEADERS.get("user-agent"))
+            except Exception as e:
+                logger.warning(f"签名进程池签名失败: {e}，移除签名参数")
+                return None
+        elif self.SIGN:
             try:
-                query = '&'.join([f'{k}={quote(str(v))}' for k, v in params.items()])
-                call_name = 'sign_datail'
-                if 'reply' in uri:
-                    call_name = 'sign_reply'
                 return self.SIGN.call(call_name, query, self.HEADERS.get("user-agent"))
             except Exception as e:
                 logger.warning(f"JavaScript签名失败: {e}，移除签名参数")
@@ -166,6 +271,80 @@ class Request(object):
             logger.warning("JavaScript签名不可用，移除签名参数")
             return None
 
+    def sign_many(self, uri: str, params_list: list) -> list:
+        """
+        一次调用JS运行时为多组参数签名，返回与params_list顺序一致的签名列表，失败的项为None
+        """
+        if not params_list:
+            return []
+        ua = self.HEADERS.get("user-agent")
+        args_list = [['&'.join([f'{k}={quote(str(v))}' for k, v in params.items()]), ua] for params in params_list]
+        call_name = 'sign_datail'
+        if 'reply' in uri:
+            call_name = 'sign_reply'
+        if self.signer == 'native':
+            return [getattr(abogus, call_name)(*args) for args in args_list]
+        try:
+            if self.signer == 'pool':
+                return get_sign_pool().call_many(call_name, args_list)
+            elif self.SIGN:
+                # 一次eval在同一个node进程中完成全部签名
+                return self.SIGN.eval(
+                    f'{json.dumps(args_list)}.map(function (args) {{ return {call_name}.apply(this, args); }})')
+            logger.warning("JavaScript签名不可用，移除签名参数")
+        except Exception as e:
+            logger.warning(f"批量签名失败: {e}，移除签名参数")
+        return [None] * len(params_list)
+
+    def presign(self, uri: str, params_list: list) -> int:
+        """
+        为已知的多组请求参数批量签名，之后getJSON遇到相同的uri和参数时直接使用，返回签名成功的数量
+        """
+        prepared = [self.get_params(params.copy()) for params in params_list]
+        signs = self.sign_many(uri, prepared)
+        now = time.time()
+        count = 0
+        with self.PRESIGNED_LOCK:
+            # 清理过期未使用的结果
+            for key in [key for key, value in self.PRESIGNED.items() if now - value[0] > self.PRESIGN_TTL]:
+                del self.PRESIGNED[key]
+            for params, full_params, sign in zip(params_list, prepared, signs):
+                if sign:
+                    self.PRESIGNED[self._presign_key(uri, params)] = (now, full_params, sign)
+                    count += 1
+        logger.debug(f'批量签名完成: {uri}, {count}/{len(params_list)}')
+        return count
+
+    def has_presigned(self, uri: str, params: dict) -> bool:
+        entry = self.PRESIGNED.get(self._presign_key(uri, params))
+        return entry is not None and time.time() - entry[0] <= self.PRESIGN_TTL
+
+    def _pop_presigned(self, uri: str, params: dict):
+        with self.PRESIGNED_LOCK:
+            entry = self.PRESIGNED.pop(self._presign_key(uri, params), None)
+        if entry and time.time() - entry[0] <= self.PRESIGN_TTL:
+            return entry[1], entry[2]
+        return None
+
+    def _presign_key(self, uri: str, params: dict) -> tuple:
+        # 签名依赖cookie中的参数和UA，不同账号或UA的实例之间不能混用
+        return (uri, tuple((k, str(v)) for k, v in params.items()), self.HEADERS.get("user-agent"),
+                tuple(sorted(self.COOKIES.items())))
+
+    def get_a_bogus(self, url: str) -> str:
+        """获取用户主页接口的a_bogus，url为带完整参数的请求地址"""
+        if self.signer == 'native':
+            # 纯Python实现没有jsdom环境，按douyin.js算法对url中的参数签名
+            return abogus.sign_datail(urllib.parse.urlsplit(url).query, self.HEADERS.get("user-agent"))
+        if self.signer == 'pool':
+            return get_sign_pool().call('get_a_bogus', url)
+        if Request.A_BOGUS is None:
+            # 指定execjs使用Node引擎（避免默认用其他JS引擎导致不兼容）
+            node_env = execjs.get(execjs.runtime_names.Node)
+            js_file_path = get_js_path('8.动态url测试.js')
+            Request.A_BOGUS = node_env.compile(open(js_file_path, 'r', encoding='utf-8').read(), cwd=self.NODE_CWD)
+        return Request.A_BOGUS.call('get_a_bogus', url)
+
     def get_webid(self):
         import base64
         import re
@@ -213,179 +392,283 @@ class Request(object):
                 ms_token += base_str[random.randint(0, length)]
         return ms_token
 
+    def rate_key(self, uri: str, proxies: dict = None) -> tuple:
+        """
+        限速键: (接口路径, cookie身份, 代理)，使用代理池时每个代理单独限速
+        """
+        return uri.split('?')[0], self.identity, (proxies or self.proxies or {}).get('http', '')
+
+    def breaker_key(self) -> tuple:
+        """
+        熔断键: (cookie身份, 代理)，cookie或代理被封时该账号的所有接口都会失败；
+        使用代理池时单个代理的失败由代理池暂停，熔断只针对cookie
+        """
+        if self.proxy_pool is not None:
+            return self.identity, POOL
+        return self.identity, (self.proxies or {}).get('http', '')
+
+    def acquire_proxy(self) -> tuple:
+        """
+        从代理池选择本次请求的代理，返回(代理, proxies)；没有使用代理池时返回(None, self.proxies)
+        所有代理都已满max_inflight时等待其他请求归还代理，都在暂停中时等待最早恢复的代理，等待计入重试预算并且可以被取消
+        """
+        pool = self.proxy_pool
+        if pool is None:
+            return None, self.proxies
+        budget = current_budget()
+        proxy, wait = pool.acquire()
+        while proxy is None:
+            if not wait:
+                # 代理池为空
+                return None, None
+            cancel.sleep(budget.wait(wait) if budget else wait)
+            proxy, wait = pool.acquire()
+        try:
+            cancel.sleep(budget.wait(wait) if budget else wait)
+        except BaseException:
+            pool.release(proxy)
+            raise
+        return proxy, proxy.proxies
+
+    def release_proxy(self, proxy, ok: bool = None, seconds: float = 0.0):
+        if proxy is not None:
+            self.proxy_pool.release(proxy, ok, seconds)
+
+    @staticmethod
+    def response_error(status_code: int, text, json_data: dict = None) -> str:
+        """
+        返回响应失败的原因，成功的响应返回空字符串；text为响应内容（str或bytes）
+        """
+        if status_code != 200:
+            return f'HTTP {status_code}'
+        if not text:
+            return '响应为空'
+        if json_data is None:
+            return '响应不是JSON'
+        if json_data.get('status_code', 0) != 0:
+            return f'status_code={json_data.get("status_code")}'
+        return ''
+
+    def rate_feedback(self, key: tuple, status_code: int, text, json_data: dict = None) -> bool:
+        """
+        根据响应调整限速，返回是否为成功的响应；错误状态码、空响应和非JSON响应都视为被限流
+        """
+        error = self.response_error(status_code, text, json_data)
+        if error:
+            self.limiter.throttle(key, error)
+            return False
+        self.limiter.success(key)
+        return True
+
     def getHTML(self, url) -> str:
+        """
+        请求页面源码，失败时返回空字符串；与getJSON一样经过熔断、限速和重试预算的超时，结果计入熔断和限速
+        """
+        cancel.check_cancelled()
+        breaker_key = self.breaker_key()
+        self.breaker.before_request(breaker_key)
         headers = self.HEADERS.copy()
         headers['sec-fetch-dest'] = 'document'
-        response = requests.get(url, headers=headers, cookies=self.COOKIES, proxies=self.proxies)
-        if response.status_code != 200 or response.text == '':
+        budget = current_budget()
+        timeout = budget.timeout(self.session.timeout) if budget else self.session.timeout
+        proxy, proxies = self.acquire_proxy()
+        key = self.rate_key(urllib.parse.urlsplit(url).path, proxies)
+        ok = False
+        sent = time.perf_counter()
+        try:
+            wait = self.limiter.reserve(key)
+            cancel.sleep(budget.wait(wait) if budget else wait)
+            sent = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, cookies=self.COOKIES, proxies=proxies, timeout=timeout)
+                ok = response.status_code == 200 and response.text != ''
+            except Exception:
+                # 请求没有结果时也要记为失败，否则熔断中的探测请求一直不结束
+                self.breaker.failure(breaker_key)
+                raise
+        finally:
+            self.release_proxy(proxy, ok, time.perf_counter() - sent)
+        self.breaker.record(breaker_key, ok)
+        if not ok:
+            self.limiter.throttle(key, self.response_error(response.status_code, response.text, {}))
             logger.error(f'HTML请求失败, url: {url}, header: {headers}')
             return ''
+        self.limiter.success(key)
         return response.text
 
-    def getJSON(self, uri: str, params: dict, data: dict = None, max_retries: int = 3):
-        import time
-        import urllib.parse
-        import sys
-
-        # 获取node_modules的正确路径（支持开发环境、PyInstaller和Nuitka）
-        possible_node_paths = []
-
-        # 1. 开发环境路径
-        possible_node_paths.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "node_modules"))
-        possible_node_paths.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "node_modules"))
-
-        # 2. 打包环境路径
-        if getattr(sys, 'frozen', False):
-            # PyInstaller环境
-            if hasattr(sys, '_MEIPASS'):
-                possible_node_paths.append(os.path.join(sys._MEIPASS, "node_modules"))
-
-            # Nuitka环境 - 使用可执行文件目录
-            exe_dir = os.path.dirname(os.path.abspath(sys.executable))
-            possible_node_paths.append(os.path.join(exe_dir, "node_modules"))
-
-        # 尝试找到存在的node_modules路径
-        NODE_MODULES_PATH = None
-        for path in possible_node_paths:
-            if os.path.exists(path):
-                NODE_MODULES_PATH = path
-                logger.info(f"找到node_modules路径: {NODE_MODULES_PATH}")
-                break
-
-        if NODE_MODULES_PATH is None:
-            logger.warning(f"未找到node_modules目录，尝试的路径: {possible_node_paths}")
-            # 使用第一个路径作为fallback
-            NODE_MODULES_PATH = possible_node_paths[0]
-
-        # 设置Node的模块查找环境变量（关键，让Node能找到内置的jsdom）
-        os.environ["NODE_PATH"] = NODE_MODULES_PATH
-        # 保存当前工作目录并切换到node_modules目录（确保Node.js能正确解析模块）
-        original_cwd = os.getcwd()
-        try:
-            os.chdir(NODE_MODULES_PATH)
-            # 可选：指定execjs使用Node引擎（避免默认用其他JS引擎导致不兼容）
-            node_env = execjs.get(execjs.runtime_names.Node)
-
-            url = f'{self.HOST}{uri}'
+    def prepare_json(self, uri: str, params: dict) -> tuple[str, dict, dict]:
+        """
+        补全参数、签名并设置Referer，返回请求的url、参数和请求头，同步和异步请求共用
+        """
+        # 签名只依赖启动时固定的node模块查找环境，不修改进程级的工作目录和环境变量，可在多线程中并发调用
+        url = f'{self.HOST}{uri}'
+        presigned = self._pop_presigned(uri, params)
+        if presigned:
+            # 使用presign提前批量签好的参数
+            params, sign = presigned
+        else:
             params = self.get_params(params)
             # 尝试获取签名，如果失败则不添加签名参数
             sign = self.get_sign(uri, params)  # 这里调用的是返回str的get_sign方法
-            if sign:
-                params["a_bogus"] = sign
-
-            # 动态设置Referer
-            headers = self.HEADERS.copy()
-            if '/search/' in uri:
-                headers['referer'] = 'https://www.douyin.com/search/'
-            elif '/user/profile/other/' in uri:
-                params['timestamp'] = str(int(time.time()))
-                encoded_params_string = urllib.parse.urlencode(params)
-                url1 = url + '?' + encoded_params_string
-                # 使用资源路径查找JS文件（支持打包环境）
-                import sys
-                possible_js_paths = []
-
-                # 1. 开发环境路径
-                possible_js_paths.append(os.path.join(os.path.dirname(__file__), 'js', '8.动态url测试.js'))
-
-                # 2. 打包环境路径
-                if getattr(sys, 'frozen', False):
-                    # PyInstaller环境
-                    if hasattr(sys, '_MEIPASS'):
-                        possible_js_paths.append(os.path.join(sys._MEIPASS, 'lib', 'js', '8.动态url测试.js'))
-
-                    # Nuitka环境 - 使用可执行文件目录
-                    exe_dir = os.path.dirname(os.path.abspath(sys.executable))
-                    possible_js_paths.append(os.path.join(exe_dir, 'lib', 'js', '8.动态url测试.js'))
-                    possible_js_paths.append(os.path.join(exe_dir, 'js', '8.动态url测试.js'))
-
-                # 尝试找到存在的JS文件路径
-                js_file_path = None
-                for path in possible_js_paths:
-                    if os.path.exists(path):
-                        js_file_path = path
-                        logger.info(f"找到JS文件路径: {js_file_path}")
-                        break
-
-                if js_file_path is None:
-                    logger.warning(f"未找到JS文件，尝试的路径: {possible_js_paths}")
-                    # 使用第一个路径作为fallback
-                    js_file_path = possible_js_paths[0]
-
-                a_bogus = node_env.compile(open(js_file_path, 'r', encoding='utf-8').read()).call('get_a_bogus', url1)
-                params['a_bogus'] = a_bogus
-                headers['referer'] = f'https://www.douyin.com/user/{params.get("sec_user_id", "")}?from_tab_name=main'
-        finally:
-            # 恢复原始工作目录
-            os.chdir(original_cwd)
-        # 记录API调用详情
-        # encoded_params_string = urllib.parse.urlencode(params)
-        # url = url + '?' + encoded_params_string 
-        logger.info(f'API调用: {uri}')
-        logger.info(f'完整URL: {url}')
-        logger.info(f'完整headers: {headers}')
-        logger.info(f'完整params: {params}')
-        logger.info(f'关键参数: sec_user_id={params.get("sec_user_id", "N/A")}, max_cursor={params.get("max_cursor", "N/A")}, count={params.get("count", "N/A")}')
-        logger.info(f'请求方法: {"POST" if data else "GET"}')
+        if sign:
+            params["a_bogus"] = sign
+
+        # 动态设置Referer
+        headers = self.HEADERS.copy()
+        if '/search/' in uri:
+            headers['referer'] = 'https://www.douyin.com/search/'
+        elif '/user/profile/other/' in uri:
+            params['timestamp'] = str(int(time.time()))
+            encoded_params_string = urllib.parse.urlencode(params)
+            url1 = url + '?' + encoded_params_string
+            a_bogus = self.get_a_bogus(url1)
+            params['a_bogus'] = a_bogus
+            headers['referer'] = f'https://www.douyin.com/user/{params.get("sec_user_id", "")}?from_tab_name=main'
+        return url, params, headers
+
+    @staticmethod
+    def response_summary(json_data: dict) -> str:
+        """
+        成功响应的数据概要，只在输出请求详情时调用
+        """
+        if 'aweme_list' in json_data:
+            return f'视频列表，数量: {len(json_data.get("aweme_list") or [])}'
+        if 'user_list' in json_data:
+            return f'用户列表，数量: {len(json_data.get("user_list") or [])}'
+        if 'user' in json_data:
+            user_info = json_data.get('user') or {}
+            return f'用户信息: {user_info.get("nickname", "未知")} (uid: {user_info.get("uid", "N/A")})'
+        return '返回数据结构未知'
+
+    def log_call(self, level: str, method: str, uri: str, url: str, headers: dict, params: dict, result: str):
+        """
+        输出一次请求的完整url、请求头和参数；使用lazy，日志级别未启用时不格式化
+        """
+        logger.opt(lazy=True).log(
+            level, 'API调用: {} {}\n完整URL: {}\n完整headers: {}\n完整params: {}\n结果: {}',
+            lambda: method, lambda: uri, lambda: url, lambda: headers, lambda: params, lambda: result)
+
+    def getJSON(self, uri: str, params: dict, data: dict = None, max_retries: int = 3, projection: dict = None):
+        """
+        请求接口并解析JSON，失败时返回空字典；指定projection（见fastjson.AWEME_PAGE）时只返回投影中的字段
+        """
+        url, params, headers = self.prepare_json(uri, params)
+        # 每次调用只计数，完整的请求详情在DEBUG级别按采样输出，失败时才在WARNING/ERROR级别输出
+        stats = get_api_stats()
+        started = time.perf_counter()
+        method = 'POST' if data else 'GET'
         
+        breaker_key = self.breaker_key()
+        # 调用方设置了重试预算时，重试次数、等待和超时都不超过预算，用完后抛出RetryBudgetExceeded
+        budget = current_budget()
+        rejected = False  # 是否有请求得到了服务器的失败响应
         for attempt in range(max_retries):
+            # 已取消时抛出OperationCancelled，熔断中直接抛出CircuitOpenError，不再发送请求和重试
+            cancel.check_cancelled()
+            self.breaker.before_request(breaker_key)
+            timeout = budget.timeout(self.session.timeout) if budget else self.session.timeout
+            # 使用代理池时每次尝试重新选择代理，结果报告给代理池用于打分
+            proxy, proxies = self.acquire_proxy()
+            key = self.rate_key(uri, proxies)
+            outcome = None
+            sent = time.perf_counter()
             try:
+                # 按限速器的速率发送，被限流后的等待也由限速器控制，等待期间可以被取消
+                wait = self.limiter.reserve(key)
+                cancel.sleep(budget.wait(wait) if budget else wait)
+                sent = time.perf_counter()
                 if data:
-                    response = requests.post(
-                        url, params=params, data=data, headers=headers, cookies=self.COOKIES, proxies=self.proxies, timeout=30)
+                    response = self.session.post(
+                        url, params=params, data=data, headers=headers, cookies=self.COOKIES, proxies=proxies, timeout=timeout)
                 else:
-                    response = requests.get(
-                        url, params=params, headers=headers, cookies=self.COOKIES, proxies=self.proxies, timeout=30)
-                
-                # 记录响应状态
-                logger.info(f'响应状态码: {response.status_code}, 响应大小: {len(response.text)} 字符')
+                    response = self.session.get(
+                        url, params=params, headers=headers, cookies=self.COOKIES, proxies=proxies, timeout=timeout)
                 
-                # 检查响应状态
-                if response.status_code == 200 and response.text:
+                # 检查响应状态，直接解析原始字节，不生成response.text
+                content = response.content
+                json_data = None
+                if response.status_code == 200 and content:
                     try:
-                        json_data = response.json()
-                        if json_data.get('status_code', 0) == 0:
-                            # 记录成功响应的数据概要
-                            if 'aweme_list' in json_data:
-                                logger.info(f'成功获取视频列表，数量: {len(json_data.get("aweme_list", []))}')
-                            elif 'user_list' in json_data:
-                                logger.info(f'成功获取用户列表，数量: {len(json_data.get("user_list", []))}')
-                            elif 'user' in json_data:
-                                user_info = json_data.get('user', {})
-                                logger.info(f'成功获取用户信息: {user_info.get("nickname", "未知")} (uid: {user_info.get("uid", "N/A")})')
-                            else:
-                                logger.info('API调用成功，返回数据结构未知')
-                            return json_data
-                        else:
-                            logger.warning(f'API返回错误状态码: {json_data.get("status_code")}, 消息: {json_data.get("status_msg", "未知错误")}')
+                        json_data = fastjson.decode(content, projection)
                     except ValueError:
                         logger.error(f'响应不是有效的JSON格式: {response.text[:200]}')
+                ok = outcome = self.rate_feedback(key, response.status_code, content, json_data)
+                self.breaker.record(breaker_key, ok)
+                if ok:
+                    stats.record(uri, True, attempt + 1, len(content), time.perf_counter() - started)
+                    if stats.sample(uri):
+                        self.log_call('DEBUG', method, uri, url, headers, params, self.response_summary(json_data))
+                    return json_data
+                rejected = True
+                if json_data is not None:
+                    logger.warning(f'API返回错误状态码: {json_data.get("status_code")}, 消息: {json_data.get("status_msg", "未知错误")}')
                 
                 # 如果是最后一次尝试，记录详细错误
                 if attempt == max_retries - 1:
                     logger.error(
                         f'JSON请求失败：url: {url}, code: {response.status_code}, body: {response.text[:500]}')
-                    if response.status_code == 200 and not response.text:
+                    if response.status_code == 200 and not content:
                         logger.error('响应为空，可能被反爬虫系统拦截')
+                    self.log_call('DEBUG', method, uri, url, headers, params,
+                                  self.response_error(response.status_code, content, json_data))
                 else:
+                    # 退避等待在下次发送前由限速器完成
                     logger.warning(f'请求失败，第{attempt + 1}次重试中...')
-                    import time
-                    time.sleep(2 ** attempt)  # 指数退避
+                    if budget:
+                        budget.retry(f'{uri} {self.response_error(response.status_code, content, json_data)}')
                     
             except requests.exceptions.RequestException as e:
+                self.breaker.failure(breaker_key)
+                self.release_proxy(proxy, False, time.perf_counter() - sent)
+                proxy = None
                 if attempt == max_retries - 1:
                     logger.error(f'网络请求异常: {e}')
                 else:
                     logger.warning(f'网络异常，第{attempt + 1}次重试中...')
-                    import time
-                    time.sleep(2 ** attempt)
+                    if budget:
+                        budget.retry(f'{uri} 网络异常: {e}')
+                    # 使用代理池时下次尝试换一个代理，不需要退避等待
+                    if self.proxy_pool is None:
+                        cancel.sleep(budget.wait(2 ** attempt) if budget else 2 ** attempt)
+            finally:
+                self.release_proxy(proxy, outcome, time.perf_counter() - sent)
         
-        # 所有重试都失败后，删除可能无效的cookie文件
-        if os.path.exists('cookie.json'):
-            os.remove('cookie.json')
+        stats.record(uri, False, max_retries, 0, time.perf_counter() - started)
+        if rejected:
+            # 服务器拒绝过请求（错误状态码、空响应或验证页）时，删除可能无效的cookie文件和指纹；
+            # 只是网络异常或超时（代理、DNS故障）时保留，恢复后继续使用同一个设备指纹
+            if os.path.exists('cookie.json'):
+                os.remove('cookie.json')
+            self.reset_fingerprint()
         return {}
 
 
+_requests = OrderedDict()
+_requests_lock = threading.Lock()
+REQUEST_CACHE_SIZE = 32  # 最多缓存的Request实例数，超出时丢弃最久未使用的
+
+
+def get_request(cookie: str = '', proxy_url: str = '', UA: str = '', signer: str = '') -> Request:
+    """
+    按(cookie, 代理, UA, 签名后端)返回共享的Request实例，首次使用时创建，之后不再解析和保存cookie、输出代理设置；
+    Request创建后只读（指纹只生成一次），可以在多个线程中同时使用；连接池、限速器、熔断器和代理池在每次请求时取全局对象，
+    configure_*重新配置后缓存的实例也使用新的配置。
+    cookie为空时每次都从配置文件读取，不缓存，保证自动刷新的cookie能立即生效
+    """
+    if not cookie:
+        return Request(cookie, UA, proxy_url, signer)
+    key = (cookie, proxy_url, UA, signer)
+    with _requests_lock:
+        request = _requests.get(key)
+        if request is None:
+            request = _requests[key] = Request(cookie, UA, proxy_url, signer)
+            while len(_requests) > REQUEST_CACHE_SIZE:
+                _requests.popitem(last=False)
+        else:
+            _requests.move_to_end(key)
+        return request
+
+
 if __name__ == "__main__":
     r = Request()
     print(r.get_webid())
@@ -0,0 +1,105 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   retry.py
+@Desc    :   重试预算，一次操作（如检查一个主页）的所有重试共用一个截止时间和最大重试次数
+'''
+import contextvars
+import os
+import time
+
+from loguru import logger
+
+# 当前线程（或协程）正在使用的重试预算，getJSON和get_awemes_list等各层都从这里读取
+_current = contextvars.ContextVar('retry_budget', default=None)
+
+
+class RetryBudgetExceeded(Exception):
+    """重试预算已用完，请求未发送"""
+
+    def __init__(self, budget: 'RetryBudget', reason: str):
+        self.budget = budget
+        super().__init__(f'{reason}，已重试{budget.retries}次，用时{budget.elapsed():.1f}秒，'
+                         f'重试原因: {budget.summary() or "无"}')
+
+
+class RetryBudget(object):
+    """
+    一次操作的重试预算
+
+    deadline为整个操作的最长耗时（秒），max_retries为各层重试次数的总和，任一用完后不再发送请求，抛出RetryBudgetExceeded；
+    使用with进入后，同一线程中的getJSON、get_awemes_list等都按这个预算重试，每次重试的原因记录在reasons中
+
+        with RetryBudget(deadline=60, max_retries=6):
+            douyin.get_awemes()
+    """
+
+    DEADLINE = float(os.environ.get('DOUYIN_RETRY_DEADLINE', 120))
+    MAX_RETRIES = int(os.environ.get('DOUYIN_RETRY_MAX', 10))
+
+    def __init__(self, deadline: float = None, max_retries: int = None):
+        self.deadline = deadline or self.DEADLINE
+        self.max_retries = self.MAX_RETRIES if max_retries is None else max(0, int(max_retries))
+        self.started = time.monotonic()
+        self.retries = 0
+        self.reasons = []  # [(开始后的秒数, 原因)]
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *args):
+        _current.reset(self._token)
+        self._token = None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - self.elapsed())
+
+    def check(self):
+        """
+        发送请求前调用，预算用完时抛出RetryBudgetExceeded
+        """
+        if self.remaining() <= 0:
+            raise RetryBudgetExceeded(self, f'超过{self.deadline:.0f}秒的截止时间')
+
+    def retry(self, reason: str):
+        """
+        记录一次重试，重试次数用完时抛出RetryBudgetExceeded
+        """
+        self.reasons.append((round(self.elapsed(), 3), reason))
+        if self.retries >= self.max_retries:
+            raise RetryBudgetExceeded(self, f'超过{self.max_retries}次的重试次数')
+        self.retries += 1
+        logger.debug(f'第{self.retries}次重试（剩余{self.remaining():.1f}秒）: {reason}')
+        self.check()
+
+    def timeout(self, timeout):
+        """
+        单次请求的超时时间，不超过剩余预算；timeout可以是(连接超时, 读取超时)
+        """
+        self.check()
+        remaining = self.remaining()
+        if isinstance(timeout, tuple):
+            return tuple(min(value, remaining) for value in timeout)
+        return min(timeout, remaining)
+
+    def wait(self, seconds: float) -> float:
+        """
+        检查重试前的等待时间，超过剩余预算时直接抛出RetryBudgetExceeded，不再白白等待
+        """
+        if seconds > 0 and seconds >= self.remaining():
+            raise RetryBudgetExceeded(self, f'需要等待{seconds:.1f}秒，超过剩余时间')
+        return seconds
+
+    def summary(self) -> str:
+        return '; '.join([f'{elapsed:.1f}s {reason}' for elapsed, reason in self.reasons])
+
+
+def current_budget() -> RetryBudget:
+    """
+    返回当前线程正在使用的重试预算，没有时返回None
+    """
+    return _current.get()
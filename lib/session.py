@@ -0,0 +1,275 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   session.py
+@Desc    :   全局共享的HTTP连接池，复用到抖音各域名的TCP/TLS连接
+'''
+import asyncio
+import os
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from .replay import unwrap_session, wrap_session
+except ImportError:
+    # 当作为独立模块运行时使用绝对导入
+    from replay import unwrap_session, wrap_session
+
+# HTTP/2需要httpx和h2（pip install httpx[http2]），未安装时使用HTTP/1.1
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+try:
+    import h2  # noqa: F401
+    H2_AVAILABLE = True
+except ImportError:
+    H2_AVAILABLE = False
+
+
+class HttpSession(object):
+    """
+    线程安全的共享连接池
+
+    所有Request实例共用同一个requests.Session，连接保持keep-alive并在线程之间复用；
+    cookie由每次请求单独传入，响应中的Set-Cookie不会写入共享会话，不同账号之间互不影响
+    """
+
+    POOL_SIZE = int(os.environ.get('DOUYIN_HTTP_POOL_SIZE', 32))  # 每个域名保持的最大连接数
+    POOL_CONNECTIONS = int(os.environ.get('DOUYIN_HTTP_POOL_HOSTS', 16))  # 缓存连接池的域名数
+    RETRIES = int(os.environ.get('DOUYIN_HTTP_RETRIES', 2))
+    # 连接失败和网关错误在连接池层面重试，业务层面的重试仍由getJSON处理
+    RETRY_STATUS = (502, 503, 504)
+    # 未指定timeout的请求使用的连接超时和读取超时（秒），避免卡住的连接一直占用线程
+    CONNECT_TIMEOUT = float(os.environ.get('DOUYIN_CONNECT_TIMEOUT', 5))
+    READ_TIMEOUT = float(os.environ.get('DOUYIN_READ_TIMEOUT', 30))
+
+    def __init__(self, pool_size: int = 32, retries: int = 2, host_pool_sizes: dict = None,
+                 connect_timeout: float = None, read_timeout: float = None):
+        self.pool_size = max(1, int(pool_size))
+        self.retries = max(0, int(retries))
+        self.host_pool_sizes = dict(host_pool_sizes or {})
+        self.timeout = (connect_timeout or self.CONNECT_TIMEOUT, read_timeout or self.READ_TIMEOUT)
+        self.session = requests.Session()
+        # 拒绝保存任何响应cookie
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = self._adapter(self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # 单独指定连接数的域名使用独立的连接池
+        for host, size in self.host_pool_sizes.items():
+            adapter = self._adapter(size)
+            self.session.mount(f'https://{host}/', adapter)
+            self.session.mount(f'http://{host}/', adapter)
+
+    def _adapter(self, pool_size: int) -> HTTPAdapter:
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=0.5,
+            status_forcelist=self.RETRY_STATUS,
+            allowed_methods=frozenset(['HEAD', 'GET', 'OPTIONS']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        return HTTPAdapter(pool_connections=self.POOL_CONNECTIONS, pool_maxsize=max(1, int(pool_size)),
+                           max_retries=retry)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('allow_redirects', True)
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class Http2Session(object):
+    """
+    基于httpx的HTTP/2连接池，接口与HttpSession一致
+
+    同一域名的并发请求在少量连接上多路复用，不再是每个进行中的请求占用一条连接；
+    服务端不支持HTTP/2时通过ALPN自动回退到HTTP/1.1。
+    httpx的同步HTTP/2连接不能在多个线程中并发使用，所有请求都提交到一个后台事件循环中执行，调用线程等待结果；
+    httpx的代理在客户端级别设置，每个代理地址使用单独的客户端
+    """
+
+    def __init__(self, pool_size: int = 32, retries: int = 2, host_pool_sizes: dict = None, http1: bool = True,
+                 connect_timeout: float = None, read_timeout: float = None):
+        self.pool_size = max(1, int(pool_size))
+        self.retries = max(0, int(retries))
+        self.host_pool_sizes = dict(host_pool_sizes or {})
+        self.timeout = (connect_timeout or HttpSession.CONNECT_TIMEOUT, read_timeout or HttpSession.READ_TIMEOUT)
+        self.http1 = http1  # 为False时对http://地址直接使用HTTP/2（h2c），只用于本地测试
+        self.clients = {}
+        self.loop = None
+        self.lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name='Http2Session', daemon=True).start()
+            return self.loop
+
+    def _transport(self, pool_size: int, proxy: str = None) -> 'httpx.AsyncHTTPTransport':
+        # 多路复用时少量连接即可承载大量并发请求，max_connections只作为上限
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        return httpx.AsyncHTTPTransport(http1=self.http1, http2=True, limits=limits, retries=self.retries,
+                                        proxy=proxy)
+
+    def _client(self, proxy: str = None) -> 'httpx.AsyncClient':
+        # 只在事件循环线程中调用，无需加锁
+        client = self.clients.get(proxy)
+        if client is None:
+            # 单独指定连接数的域名使用独立的连接池
+            mounts = {f'all://{host}': self._transport(size, proxy) for host, size in self.host_pool_sizes.items()}
+            client = httpx.AsyncClient(transport=self._transport(self.pool_size, proxy), mounts=mounts)
+            self.clients[proxy] = client
+        return client
+
+    async def _request(self, proxy: str, method: str, url: str, **kwargs):
+        return await self._client(proxy).request(method, url, **kwargs)
+
+    def request(self, method: str, url: str, params: dict = None, data=None, headers: dict = None,
+                cookies: dict = None, proxies: dict = None, timeout: float = None, allow_redirects: bool = True,
+                **kwargs):
+        headers = dict(headers or {})
+        if cookies:
+            # 与HttpSession一致，cookie只随本次请求发送，不保存
+            headers['cookie'] = '; '.join([f'{k}={v}' for k, v in cookies.items()])
+        if params:
+            # 与requests一致，跳过值为None的参数
+            params = {k: v for k, v in params.items() if v is not None}
+        proxy = None
+        if proxies:
+            proxy = proxies.get('https' if url.startswith('https://') else 'http')
+        # 与requests一致，(连接超时, 读取超时)或单个数值
+        timeout = self.timeout if timeout is None else timeout
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        future = asyncio.run_coroutine_threadsafe(
+            self._request(proxy, method, url, params=params, data=data, headers=headers, timeout=timeout,
+                          follow_redirects=allow_redirects, **kwargs),
+            self._get_loop())
+        try:
+            return future.result()
+        # 转换为requests的异常，调用方的异常处理保持不变
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def head(self, url: str, **kwargs):
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def close(self):
+        with self.lock:
+            loop, self.loop = self.loop, None
+        if loop is None:
+            return
+
+        async def close_clients():
+            for client in self.clients.values():
+                await client.aclose()
+            self.clients = {}
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_clients(), loop).result(timeout=10)
+        except Exception as e:
+            logger.warning(f"关闭HTTP/2连接失败: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+HTTP2 = os.environ.get('DOUYIN_HTTP2', '') == '1'
+
+
+def _create_session(pool_size: int, retries: int, host_pool_sizes: dict, http2: bool, connect_timeout: float = None,
+                    read_timeout: float = None):
+    if http2:
+        if HTTPX_AVAILABLE and H2_AVAILABLE:
+            session = Http2Session(pool_size, retries, host_pool_sizes, connect_timeout=connect_timeout,
+                                   read_timeout=read_timeout)
+            return wrap_session(session)
+        logger.warning("未安装httpx[http2]，使用HTTP/1.1连接池: pip install httpx[http2]")
+    # 启用HTTP录制或回放时（见replay.py）包装连接池
+    return wrap_session(HttpSession(pool_size, retries, host_pool_sizes, connect_timeout, read_timeout))
+
+
+def get_session():
+    """
+    获取全局共享的连接池，首次调用时创建
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session(HttpSession.POOL_SIZE, HttpSession.RETRIES, {}, HTTP2)
+        return _session
+
+
+def configure_session(pool_size: int = None, retries: int = None, host_pool_sizes: dict = None, http2: bool = None,
+                      connect_timeout: float = None, read_timeout: float = None):
+    """
+    按新配置重建全局连接池，配置未变化时直接返回现有连接池；http2为False时使用HTTP/1.1
+    """
+    global _session
+    pool_size = pool_size or HttpSession.POOL_SIZE
+    retries = HttpSession.RETRIES if retries is None else retries
+    host_pool_sizes = dict(host_pool_sizes or {})
+    http2 = HTTP2 if http2 is None else http2
+    timeout = (connect_timeout or HttpSession.CONNECT_TIMEOUT, read_timeout or HttpSession.READ_TIMEOUT)
+    with _session_lock:
+        if _session is not None:
+            if ((_session.pool_size, _session.retries, _session.host_pool_sizes, _session.timeout)
+                    == (pool_size, retries, host_pool_sizes, timeout)
+                    and isinstance(unwrap_session(_session), Http2Session) == (http2 and HTTPX_AVAILABLE and H2_AVAILABLE)):
+                return _session
+            _session.close()
+        _session = _create_session(pool_size, retries, host_pool_sizes, http2, *timeout)
+        logger.info(f"HTTP连接池已配置: {'HTTP/2' if isinstance(unwrap_session(_session), Http2Session) else 'HTTP/1.1'}, "
+                    f"每个域名{pool_size}个连接, 重试{retries}次, 连接超时{timeout[0]}秒, 读取超时{timeout[1]}秒")
+        return _session
+
+
+def reset_session():
+    """
+    关闭全局连接池，下次使用时按当前设置重新创建
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+if __name__ == "__main__":
+    session = get_session()
+    print(session.head('https://www.douyin.com/', timeout=10).status_code)
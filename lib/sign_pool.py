@@ -0,0 +1,235 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   sign_pool.py
+@Desc    :   常驻Node签名进程池
+'''
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from collections import deque
+from itertools import count
+
+import ujson as json
+from loguru import logger
+
+try:
+    from .util import get_js_path, get_node_modules_path
+except ImportError:
+    # 当作为独立模块运行时使用绝对导入
+    from util import get_js_path, get_node_modules_path
+
+
+# 常驻进程启动时一次性加载的签名脚本
+SIGN_SCRIPTS = ['douyin_minimal.js', '8.动态url测试.js']
+
+
+class SignError(Exception):
+    """签名进程返回错误"""
+
+
+class SignTimeout(SignError):
+    """签名请求超时"""
+
+
+class SignWorker(object):
+    """
+    单个常驻node进程，通过管道按行收发JSON，一次只处理一个请求
+    """
+
+    def __init__(self, scripts: list, timeout: float = 10, startup_timeout: float = 60):
+        self.scripts = scripts
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.responses = queue.Queue()
+        self.stderr = deque(maxlen=20)  # 保留最近的错误输出便于排查
+        self.ids = count(1)
+        self.lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        node = shutil.which('node') or shutil.which('nodejs')
+        if not node:
+            raise SignError('未找到node，无法启动签名进程')
+        node_modules = get_node_modules_path()
+        # 模块查找环境只在启动进程时设置一次，不修改当前进程的环境变量和工作目录
+        env = dict(os.environ, NODE_PATH=node_modules)
+        cwd = node_modules if os.path.isdir(node_modules) else None
+        command = [node, get_js_path('sign_worker.js')] + [get_js_path(name) for name in self.scripts]
+        self.responses = queue.Queue()
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            env=env, cwd=cwd, encoding='utf-8', bufsize=1)
+        threading.Thread(target=self._read_stdout, args=(self.process, self.responses), daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(self.process,), daemon=True).start()
+
+        ready = self._wait(0, self.startup_timeout)
+        for file, error in ready.get('errors', {}).items():
+            logger.warning(f"签名进程加载脚本失败: {os.path.basename(file)}, {error.splitlines()[0] if error else ''}")
+        logger.info(f"签名进程已启动, pid: {self.process.pid}")
+
+    def stop(self):
+        if self.process is not None:
+            try:
+                self.process.kill()
+                self.process.wait(timeout=5)
+            except Exception:
+                pass
+            self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def call(self, fn: str, *args, timeout: float = None):
+        return self._request({'fn': fn, 'args': args}, timeout).get('result')
+
+    def call_many(self, fn: str, args_list: list, timeout: float = None) -> list:
+        """
+        一次往返执行多组参数，返回与args_list顺序一致的结果，单项失败时为None
+        """
+        response = self._request({'fn': fn, 'batch': [list(args) for args in args_list]}, timeout)
+        for index, error in (response.get('errors') or {}).items():
+            logger.warning(f"批量签名第{int(index) + 1}项失败: {error}")
+        return response.get('result') or [None] * len(args_list)
+
+    def _request(self, payload: dict, timeout: float = None) -> dict:
+        with self.lock:
+            if not self.alive:
+                if self.process is not None:
+                    logger.warning(f"签名进程已退出(code: {self.process.poll()})，正在重启")
+                self.restart()
+            request_id = next(self.ids)
+            try:
+                self.process.stdin.write(json.dumps(dict(payload, id=request_id)) + '\n')
+                self.process.stdin.flush()
+            except (OSError, ValueError) as e:
+                self.stop()
+                raise SignError(f'写入签名进程失败: {e}')
+            response = self._wait(request_id, timeout or self.timeout)
+            if 'error' in response:
+                raise SignError(response['error'])
+            return response
+
+    def _wait(self, request_id: int, timeout: float) -> dict:
+        while True:
+            try:
+                response = self.responses.get(timeout=timeout)
+            except queue.Empty:
+                # 超时的进程状态未知，直接杀掉，下次调用时重启
+                self.stop()
+                raise SignTimeout(f'签名请求超时({timeout}s)')
+            if response is None:
+                stderr = ' | '.join(self.stderr)
+                self.stop()
+                raise SignError(f'签名进程意外退出: {stderr}')
+            if response.get('id') == request_id:
+                return response
+            # 丢弃超时请求遗留的旧响应
+
+    def _read_stdout(self, process, responses):
+        # 每个进程对应独立的响应队列，重启后旧进程的输出不会混入
+        for line in process.stdout:
+            try:
+                responses.put(json.loads(line))
+            except ValueError:
+                self.stderr.append(line.strip())
+        responses.put(None)
+
+    def _read_stderr(self, process):
+        for line in process.stderr:
+            self.stderr.append(line.strip())
+
+
+class SignPool(object):
+    """
+    常驻node签名进程池，脚本只加载一次，崩溃后自动重启
+    """
+
+    SIZE = int(os.environ.get('DOUYIN_SIGN_POOL_SIZE', 2))
+    TIMEOUT = float(os.environ.get('DOUYIN_SIGN_TIMEOUT', 10))
+
+    def __init__(self, size: int = 2, timeout: float = 10, scripts: list = None):
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self.workers = [SignWorker(scripts or SIGN_SCRIPTS, timeout) for _ in range(self.size)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def call(self, fn: str, *args, timeout: float = None):
+        """
+        调用已加载脚本中的函数，进程崩溃时重启并重试一次
+        """
+        return self._dispatch('call', fn, args, timeout)
+
+    def call_many(self, fn: str, args_list: list, timeout: float = None) -> list:
+        """
+        在同一个进程中一次往返执行多组参数，返回与args_list顺序一致的结果
+        """
+        if not args_list:
+            return []
+        return self._dispatch('call_many', fn, (args_list,), timeout)
+
+    def _dispatch(self, method: str, fn: str, args: tuple, timeout: float = None):
+        timeout = timeout or self.timeout
+        try:
+            worker = self.idle.get(timeout=timeout)
+        except queue.Empty:
+            raise SignTimeout(f'等待空闲签名进程超时({timeout}s)')
+        try:
+            try:
+                return getattr(worker, method)(fn, *args, timeout=timeout)
+            except SignTimeout:
+                raise
+            except SignError:
+                if worker.alive:  # 脚本自身抛出的错误，重试无意义
+                    raise
+                return getattr(worker, method)(fn, *args, timeout=timeout)
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sign_pool(size: int = None, timeout: float = None) -> SignPool:
+    """
+    获取全局共享的签名进程池，首次调用时创建
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SignPool(size or SignPool.SIZE, timeout or SignPool.TIMEOUT)
+        return _pool
+
+
+def configure_sign_pool(size: int = None, timeout: float = None) -> SignPool:
+    """
+    按新配置重建全局签名进程池
+    """
+    global _pool
+    size = size or SignPool.SIZE
+    timeout = timeout or SignPool.TIMEOUT
+    with _pool_lock:
+        if _pool is not None:
+            if _pool.size == size and _pool.timeout == timeout:
+                return _pool
+            _pool.close()
+        _pool = SignPool(size, timeout)
+        return _pool
+
+
+if __name__ == "__main__":
+    pool = get_sign_pool()
+    print(pool.call('sign_datail', 'aid=6383', 'Mozilla/5.0'))
@@ -1,9 +1,18 @@
 
 import os
-import requests
+import sys
+from datetime import date, datetime
+from functools import lru_cache
+
 import ujson as json
 from loguru import logger
 
+try:
+    from .session import get_session
+except ImportError:
+    # 当作为独立模块运行时使用绝对导入
+    from session import get_session
+
 
 def str_to_path(str: str):
     """
@@ -32,12 +41,95 @@ def quit(str: str = ''):
     exit()
 
 
+def to_timestamp(value, end_of_day: bool = False) -> int:
+    """
+    把时间转换为秒级时间戳: 支持时间戳、datetime、date和'2024-01-01'、'2024-01-01 12:00[:00]'格式的字符串，空值返回None
+    end_of_day为True时，只有日期的时间取当天最后一秒
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, date):
+        value = datetime.combine(value, datetime.min.time())
+        return int(value.timestamp()) + (86399 if end_of_day else 0)
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    for format in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']:
+        try:
+            parsed = datetime.strptime(value, format)
+        except ValueError:
+            continue
+        return int(parsed.timestamp()) + (86399 if end_of_day and format == '%Y-%m-%d' else 0)
+    raise ValueError(f'无法识别的时间: {value}')
+
+
 def url_redirect(url):
-    r = requests.head(url, allow_redirects=False)
+    r = get_session().head(url, allow_redirects=False)
     u = r.headers.get('Location', url)
     return u
 
 
+@lru_cache(maxsize=None)
+def get_node_modules_path() -> str:
+    """
+    获取node_modules的正确路径（支持开发环境、PyInstaller和Nuitka），结果只计算一次
+    """
+    lib_dir = os.path.dirname(os.path.abspath(__file__))
+    possible_node_paths = [
+        # 1. 开发环境路径
+        os.path.join(lib_dir, 'node_modules'),
+        os.path.join(os.path.dirname(lib_dir), 'node_modules'),
+    ]
+    # 2. 打包环境路径
+    if getattr(sys, 'frozen', False):
+        # PyInstaller环境
+        if hasattr(sys, '_MEIPASS'):
+            possible_node_paths.append(os.path.join(sys._MEIPASS, 'node_modules'))
+        # Nuitka环境 - 使用可执行文件目录
+        exe_dir = os.path.dirname(os.path.abspath(sys.executable))
+        possible_node_paths.append(os.path.join(exe_dir, 'node_modules'))
+
+    for path in possible_node_paths:
+        if os.path.exists(path):
+            logger.info(f"找到node_modules路径: {path}")
+            return path
+    logger.warning(f"未找到node_modules目录，尝试的路径: {possible_node_paths}")
+    # 使用第一个路径作为fallback
+    return possible_node_paths[0]
+
+
+@lru_cache(maxsize=None)
+def get_js_path(filename: str) -> str:
+    """
+    获取lib/js下脚本文件的路径（支持打包环境），结果只计算一次
+    """
+    possible_js_paths = [
+        # 1. 开发环境路径
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'js', filename),
+    ]
+    # 2. 打包环境路径
+    if getattr(sys, 'frozen', False):
+        # PyInstaller环境
+        if hasattr(sys, '_MEIPASS'):
+            possible_js_paths.append(os.path.join(sys._MEIPASS, 'lib', 'js', filename))
+        # Nuitka环境 - 使用可执行文件目录
+        exe_dir = os.path.dirname(os.path.abspath(sys.executable))
+        possible_js_paths.append(os.path.join(exe_dir, 'lib', 'js', filename))
+        possible_js_paths.append(os.path.join(exe_dir, 'js', filename))
+
+    for path in possible_js_paths:
+        if os.path.exists(path):
+            logger.info(f"找到JS文件路径: {path}")
+            return path
+    logger.warning(f"未找到JS文件，尝试的路径: {possible_js_paths}")
+    # 使用第一个路径作为fallback
+    return possible_js_paths[0]
+
+
 def save_json(filename: str, data):
     path = os.path.dirname(filename)
     if path:
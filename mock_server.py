@@ -0,0 +1,356 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   mock_server.py
+@Desc    :   离线模拟抖音接口的本地服务，用于压力测试和基准测试，不需要网络和cookie
+             接口数据来自仓库中保存的响应（get_post.json / get_profile.json / paid_mix.json / paid_video.json），
+             支持游标翻页、可配置的延迟、错误注入（空响应、status_code非0、HTTP错误），
+             作品的下载地址指向本服务的 /cdn/，支持Range分段下载
+
+用法:
+    python mock_server.py                                  # 127.0.0.1:8910，每个列表5页
+    python mock_server.py --latency 50 --jitter 20 --empty-rate 0.05 --error-rate 0.05 --pages 20
+
+    # 在代码中使用
+    server = MockDouyin(latency=20).start()
+    Request.HOST = server.url
+    Request.WEBID = '7513859400529511946'
+    ...
+    print(server.stats())
+    server.stop()
+
+接口:
+    /aweme/v1/web/aweme/post/            主页作品，max_cursor翻页（毫秒时间戳）
+    /aweme/v1/web/aweme/favorite/        喜欢，同主页作品
+    /aweme/v1/web/user/profile/other/    用户信息
+    /aweme/v1/web/mix/aweme/             合集作品，cursor翻页（偏移量）
+    /aweme/v1/web/aweme/detail/          作品详情，aweme_id为生成的作品id或任意id
+    /aweme/v1/web/search/item/           视频搜索，offset翻页
+    /aweme/v1/web/discover/search/       用户搜索，offset翻页
+    /cdn/<文件名>                         视频和图片下载，支持Range和HEAD
+    /__mock__/stats                      各路径的请求数和注入的错误数
+    /__mock__/reset                      清空统计
+
+请求头 X-Mock-Error: empty / status / http 可以让单个请求返回指定的错误
+'''
+import argparse
+import copy
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ujson as json
+
+FIXTURES = {
+    'post': 'get_post.json',
+    'video': 'paid_video.json',
+    'mix': 'paid_mix.json',
+    'profile': 'get_profile.json',
+}
+CHUNK_SIZE = 64 * 1024
+PATTERN = bytes(range(256)) * (CHUNK_SIZE // 256)  # 模拟文件的内容，按偏移量可复现，便于校验分段下载
+
+
+class MockDouyin(object):
+    """
+    模拟抖音接口的本地服务，在后台线程中运行
+
+    每个列表接口有pages页，每页page_size个作品，作品由样本循环生成，id和发布时间各不相同；
+    每个请求先等待latency毫秒（加上0~jitter毫秒的随机波动），再按概率注入错误
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0, jitter: float = 0,
+                 page_size: int = 18, pages: int = 5, empty_rate: float = 0, error_rate: float = 0,
+                 http_error_rate: float = 0, file_size: int = 2 * 1024 * 1024, fixture_dir: str = ''):
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.page_size = max(1, page_size)
+        self.pages = max(1, pages)
+        self.empty_rate = empty_rate
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.file_size = file_size
+        self.fixture_dir = fixture_dir or os.path.dirname(os.path.abspath(__file__))
+        self.counts = {}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+        self._load()
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _fixture(self, name: str) -> dict:
+        with open(os.path.join(self.fixture_dir, FIXTURES[name]), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _generate(self, templates: list, prefix: str, newest: int) -> list:
+        """
+        由样本循环生成pages * page_size个作品，按发布时间从新到旧排列，下载地址指向本服务
+        """
+        awemes = []
+        for index in range(self.pages * self.page_size):
+            aweme = copy.deepcopy(templates[index % len(templates)])
+            aweme_id = f'{prefix}{index:012d}'
+            aweme['aweme_id'] = aweme_id
+            aweme['create_time'] = newest - index * 3600
+            aweme['is_top'] = 0
+            video = aweme.get('video') or {}
+            if video.get('play_addr'):
+                video['play_addr']['url_list'] = [f'{self.url}/cdn/{aweme_id}.mp4']
+            for i, image in enumerate(aweme.get('images') or []):
+                image['url_list'] = [f'{self.url}/cdn/{aweme_id}_{i}.jpeg']
+            awemes.append(aweme)
+        return awemes
+
+    def _load(self):
+        post = self._fixture('post')
+        mix = self._fixture('mix')
+        newest = int(time.time()) // 3600 * 3600
+        self.profile = self._fixture('profile')
+        self.post = self._generate(post['aweme_list'] + self._fixture('video')['aweme_list'], '7600', newest)
+        self.profile['user']['aweme_count'] = len(self.post)
+        self.mix = self._generate(mix['aweme_list'], '7601', newest)
+        for no, aweme in enumerate(self.mix, 1):
+            aweme.setdefault('mix_info', {}).setdefault('statis', {})['current_episode'] = no
+        self.details = {aweme['aweme_id']: aweme for aweme in self.post + self.mix}
+        self.log_pb = post.get('log_pb') or {'impr_id': '202601010000000000000000000000000'}
+        # 主页作品的翻页结果固定，提前序列化，避免测试中服务端的序列化开销
+        self.post_pages = {}
+        cursor = 0
+        for page in range(self.pages):
+            body, cursor_next = self._post_page(cursor)
+            self.post_pages[cursor] = body
+            cursor = cursor_next
+
+    def _post_page(self, max_cursor: int) -> tuple:
+        if max_cursor:
+            awemes = [aweme for aweme in self.post if aweme['create_time'] * 1000 < max_cursor]
+        else:
+            awemes = self.post
+        page = awemes[:self.page_size]
+        next_cursor = page[-1]['create_time'] * 1000 if page else 0
+        return self._dumps({
+            'status_code': 0,
+            'min_cursor': page[0]['create_time'] * 1000 if page else 0,
+            'max_cursor': next_cursor,
+            'has_more': int(len(awemes) > len(page)),
+            'aweme_list': page,
+            'log_pb': self.log_pb,
+        }), next_cursor
+
+    @staticmethod
+    def _dumps(data: dict) -> bytes:
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def _offset_page(self, items: list, offset: int, name: str, cursor_name: str, wrap: str = '',
+                     count: int = 0) -> bytes:
+        page = items[offset:offset + (count or self.page_size)]
+        return self._dumps({
+            'status_code': 0,
+            cursor_name: offset + len(page),
+            'has_more': int(offset + len(page) < len(items)),
+            name: [{wrap: item} for item in page] if wrap else page,
+            'log_pb': self.log_pb,
+        })
+
+    def api(self, path: str, query: dict, form: dict) -> bytes:
+        """
+        返回接口的响应内容，未知接口返回None
+        """
+        def number(name: str) -> int:
+            try:
+                return int(form.get(name) or query.get(name) or 0)
+            except ValueError:
+                return 0
+
+        if path in ('/aweme/v1/web/aweme/post/', '/aweme/v1/web/aweme/favorite/'):
+            max_cursor = number('max_cursor')
+            body = self.post_pages.get(max_cursor)
+            return body if body is not None else self._post_page(max_cursor)[0]
+        if path == '/aweme/v1/web/user/profile/other/':
+            return self._dumps(self.profile)
+        if path == '/aweme/v1/web/mix/aweme/':
+            return self._offset_page(self.mix, number('cursor'), 'aweme_list', 'cursor', count=number('count'))
+        if path == '/aweme/v1/web/aweme/detail/':
+            aweme_id = query.get('aweme_id', '')
+            aweme = self.details.get(aweme_id)
+            if aweme is None:
+                aweme = dict(self.post[0], aweme_id=aweme_id)
+            return self._dumps({'status_code': 0, 'aweme_detail': aweme, 'log_pb': self.log_pb})
+        if path == '/aweme/v1/web/search/item/':
+            return self._offset_page(self.post, number('offset'), 'data', 'cursor', 'aweme_info', number('count'))
+        if path == '/aweme/v1/web/discover/search/':
+            users = [dict(self.profile['user'], sec_uid=f'MS4wMock{index}') for index in range(self.pages * self.page_size)]
+            return self._offset_page(users, number('offset'), 'user_list', 'cursor', 'user_info', number('count'))
+        return None
+
+    def inject(self, forced: str = '') -> str:
+        """
+        按概率（或请求头指定）选择要注入的错误: http / empty / status，不注入时返回空字符串
+        """
+        if forced:
+            return forced
+        value = random.random()
+        for error, rate in (('http', self.http_error_rate), ('empty', self.empty_rate), ('status', self.error_rate)):
+            if value < rate:
+                return error
+            value -= rate
+        return ''
+
+    def count(self, path: str, error: str = ''):
+        with self.lock:
+            counter = self.counts.setdefault(path, {'requests': 0})
+            counter['requests'] += 1
+            if error:
+                counter[error] = counter.get(error, 0) + 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return copy.deepcopy(self.counts)
+
+    def reset(self):
+        with self.lock:
+            self.counts = {}
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # 保持连接，与客户端连接池的使用方式一致
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def send(self, status: int, body: bytes = b'', content_type: str = 'application/json; charset=utf-8',
+                     headers: dict = None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def handle_api(self):
+                parsed = urllib.parse.urlsplit(self.path)
+                query = dict(urllib.parse.parse_qsl(parsed.query))
+                form = {}
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    form = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode('utf-8', 'replace')))
+                if parsed.path == '/__mock__/stats':
+                    return self.send(200, server._dumps(server.stats()))
+                if parsed.path == '/__mock__/reset':
+                    server.reset()
+                    return self.send(200, b'{}')
+                if parsed.path.startswith('/cdn/'):
+                    server.delay()
+                    server.count('/cdn/')
+                    return self.handle_file()
+                server.delay()
+                body = server.api(parsed.path, query, form)
+                if body is None:
+                    server.count(parsed.path, 'not_found')
+                    return self.send(404, b'')
+                error = server.inject(self.headers.get('X-Mock-Error', ''))
+                server.count(parsed.path, error)
+                if error == 'http':
+                    return self.send(503, b'')
+                if error == 'empty':
+                    return self.send(200, b'')
+                if error == 'status':
+                    return self.send(200, server._dumps({'status_code': 8, 'status_msg': 'mock error'}))
+                self.send(200, body)
+
+            def handle_file(self):
+                """
+                模拟CDN文件，内容按偏移量生成；支持单个Range（bytes=start-end / start- / -suffix）
+                """
+                size = server.file_size
+                start, end = 0, size - 1
+                status = 200
+                headers = {'Accept-Ranges': 'bytes'}
+                match = re.fullmatch(r'bytes=(\d*)-(\d*)', self.headers.get('Range', '').strip())
+                if match and (match.group(1) or match.group(2)):
+                    if match.group(1):
+                        start = int(match.group(1))
+                        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                    else:
+                        start = max(0, size - int(match.group(2)))
+                    if start >= size or start > end:
+                        return self.send(416, b'', 'video/mp4', {'Content-Range': f'bytes */{size}'})
+                    status = 206
+                    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                content_type = 'image/jpeg' if self.path.endswith('.jpeg') else 'video/mp4'
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(end - start + 1))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                if self.command == 'HEAD':
+                    return
+                position = start
+                while position <= end:
+                    offset = position % CHUNK_SIZE
+                    chunk = PATTERN[offset:offset + min(CHUNK_SIZE - offset, end - position + 1)]
+                    self.wfile.write(chunk)
+                    position += len(chunk)
+
+            do_GET = do_POST = do_HEAD = handle_api
+
+        return Handler
+
+    def start(self) -> 'MockDouyin':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线模拟抖音接口的本地服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', type=int, default=8910)
+    parser.add_argument('--latency', type=float, default=0, help='每个请求的延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='延迟的随机波动（毫秒）')
+    parser.add_argument('--page-size', type=int, default=18, help='每页作品数')
+    parser.add_argument('--pages', type=int, default=5, help='每个列表的页数')
+    parser.add_argument('--empty-rate', type=float, default=0, help='返回空响应的概率')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回status_code非0的概率')
+    parser.add_argument('--http-error-rate', type=float, default=0, help='返回HTTP 503的概率')
+    parser.add_argument('--file-size', type=int, default=2 * 1024 * 1024, help='CDN文件大小（字节）')
+    args = parser.parse_args()
+
+    server = MockDouyin(args.host, args.port, args.latency, args.jitter, args.page_size, args.pages,
+                        args.empty_rate, args.error_rate, args.http_error_rate, args.file_size)
+    print(f'模拟接口已启动: {server.url}  （Ctrl+C 退出）')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_abogus.py
+@Desc    :   a_bogus纯Python实现的固定向量测试，node可用时再与 lib/js/douyin.js 的结果逐一比对
+'''
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lib import abogus  # noqa: E402
+
+DOUYIN_JS = os.path.join(ROOT, 'lib', 'js', 'douyin.js')
+
+# 在node中加载douyin.js，按向量固定Math.random和Date.now后调用签名函数
+NODE_SCRIPT = '''
+const fs = require('fs');
+const vm = require('vm');
+const vector = JSON.parse(process.argv[1]);
+const randoms = vector.random_values.slice();
+const times = [vector.start_time, vector.end_time];
+const context = vm.createContext({});
+vm.runInContext('Math.random = () => __randoms.shift(); Date.now = () => __times.shift();',
+                Object.assign(context, {__randoms: randoms, __times: times}));
+vm.runInContext(fs.readFileSync(process.argv[2], 'utf8'), context);
+process.stdout.write(context[vector.fn](vector.params, vector.ua));
+'''
+
+
+def _sm3_implementations():
+    implementations = [abogus._sm3_python]
+    try:
+        hashlib.new('sm3')
+        implementations.append(abogus._sm3_hashlib)
+    except ValueError:
+        pass
+    return implementations
+
+
+def _sign(vector):
+    return getattr(abogus, vector['fn'])(
+        vector['params'], vector['ua'], random_values=vector['random_values'],
+        start_time=vector['start_time'], end_time=vector['end_time'])
+
+
+def _vector_id(vector):
+    return f"{vector['fn']}-{vector['params'][:20]}"
+
+
+@pytest.mark.parametrize('sm3', _sm3_implementations(), ids=lambda fn: fn.__name__)
+@pytest.mark.parametrize('vector', abogus.GOLDEN_VECTORS, ids=_vector_id)
+def test_golden_vectors(monkeypatch, vector, sm3):
+    monkeypatch.setattr(abogus, 'sm3_digest', sm3)
+    assert _sign(vector) == vector['expected']
+
+
+def test_verify():
+    assert abogus.verify()
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='未安装node')
+@pytest.mark.parametrize('vector', abogus.GOLDEN_VECTORS, ids=_vector_id)
+def test_matches_douyin_js(vector):
+    result = subprocess.run(['node', '-e', NODE_SCRIPT, json.dumps(vector, ensure_ascii=False), DOUYIN_JS],
+                            capture_output=True, text=True, encoding='utf-8', timeout=30, check=True)
+    assert result.stdout == _sign(vector)
@@ -0,0 +1,94 @@
+# -*- encoding: utf-8 -*-
+'''
+@File    :   test_request_cache.py
+@Desc    :   get_request缓存的Request实例在configure_*重新配置全局对象后使用新的连接池、限速器、熔断器和代理池
+'''
+import os
+import sys
+from collections import OrderedDict
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lib import breaker, fingerprint, proxy_pool, ratelimit, replay, request, session  # noqa: E402
+from lib.cookies import cookies_str_to_dict  # noqa: E402
+from mock_server import MockDouyin  # noqa: E402
+
+COOKIE = 'a=1'
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    # 不写入config/cookie.json和config/fingerprint.json，测试结束后恢复全局对象和Request缓存
+    monkeypatch.setattr(request, 'get_cookie_dict', cookies_str_to_dict)
+    monkeypatch.setattr(request, '_requests', OrderedDict())
+    monkeypatch.setattr(session, '_session', None)
+    monkeypatch.setattr(ratelimit, '_limiter', ratelimit.RateLimiter(rate=1000, burst=1000, max_rate=1000))
+    monkeypatch.setattr(breaker, '_breaker', None)
+    monkeypatch.setattr(fingerprint, '_store', fingerprint.FingerprintStore(str(tmp_path / 'fingerprint.json')))
+    monkeypatch.setattr(proxy_pool, '_pool', proxy_pool.ProxyPool())
+    monkeypatch.setattr(replay, '_mode', '')
+    monkeypatch.setattr(request.Request, 'SIGNER', 'native')
+    monkeypatch.setattr(request.Request, 'WEBID', '7513859400529511946')
+    mock = MockDouyin().start()
+    monkeypatch.setattr(request.Request, 'HOST', mock.url)
+    yield mock
+    mock.stop()
+    session.reset_session()
+
+
+def get_detail(r: request.Request) -> dict:
+    return r.getJSON('/aweme/v1/web/aweme/detail/', {'aweme_id': '7530495662610238766'}, max_retries=1)
+
+
+def test_configure_session(server):
+    r = request.get_request(COOKIE)
+    old = r.session
+    assert get_detail(r)['aweme_detail']
+    new = session.configure_session(pool_size=old.pool_size + 1)
+    assert new is not old
+    assert request.get_request(COOKIE) is r
+    assert r.session is new
+    # 旧连接池已关闭，缓存的实例仍然可以请求
+    assert get_detail(r)['aweme_detail']
+
+
+def test_configure_replay(server, tmp_path):
+    r = request.get_request(COOKIE)
+    replay.configure_replay('record', str(tmp_path / 'archive.jsonl.gz'))
+    try:
+        assert request.get_request(COOKIE) is r
+        assert isinstance(r.session, replay.RecordingSession)
+        assert get_detail(r)['aweme_detail']
+    finally:
+        replay.configure_replay('')
+    assert not isinstance(r.session, replay.RecordingSession)
+
+
+def test_configure_rate_limiter_and_breaker(server):
+    r = request.get_request(COOKIE)
+    old_limiter, old_breaker = r.limiter, r.breaker
+    limiter = ratelimit.configure_rate_limiter(rate=500, burst=500, max_rate=500)
+    circuit_breaker = breaker.configure_circuit_breaker(failures=old_breaker.failures + 1)
+    assert limiter is not old_limiter and circuit_breaker is not old_breaker
+    assert request.get_request(COOKIE) is r
+    assert r.limiter is limiter
+    assert r.breaker is circuit_breaker
+    assert get_detail(r)['aweme_detail']
+    assert limiter.stats()
+
+
+def test_proxy_pool(server, monkeypatch):
+    r = request.get_request(COOKIE, proxy_pool.POOL)
+    assert r.proxies is None and len(r.proxy_pool) == 0
+    proxy_pool.configure_proxy_pool(['http://127.0.0.1:8080'])
+    assert len(r.proxy_pool) == 1
+    # 全局代理池被替换后缓存的实例也使用新的代理池
+    pool = proxy_pool.ProxyPool(['http://127.0.0.1:8081', 'http://127.0.0.1:8082'])
+    monkeypatch.setattr(proxy_pool, '_pool', pool)
+    assert request.get_request(COOKIE, proxy_pool.POOL) is r
+    assert r.proxy_pool is pool
+    # 不使用代理池的实例不受影响
+    assert request.get_request(COOKIE).proxy_pool is None
@@ -13,7 +13,15 @@ import os
 import pyttsx3
 from plyer import notification
 from flask import Flask, render_template, request, jsonify, redirect, url_for
+from lib.breaker import CircuitOpenError, configure_circuit_breaker
+from lib.cancel import CancelToken, OperationCancelled
+from lib.cookie_pool import NoCookieAvailable, check_cookie, configure_cookie_pool
 from lib.douyin import Douyin
+from lib.proxy_pool import POOL, configure_proxy_pool, get_proxy_pool
+from lib.ratelimit import configure_rate_limiter
+from lib.retry import RetryBudget, RetryBudgetExceeded
+from lib.session import configure_session
+from lib.sign_pool import configure_sign_pool
 from run_auto_cookie import run_auto_cookie
 from database import DouyinDatabase
 from auth_system.client.auth_client import AuthClient
@@ -27,6 +35,8 @@ class WebDouyinMonitor:
         self.config = self.load_config()
         self.is_monitoring = False
         self.monitor_thread = None
+        # 停止监控时取消正在进行的主页检查，每次开始监控时重新创建
+        self.cancel_token = CancelToken()
         self.homepage_status = {}
         self.recent_logs = []
         self.cookie_history = []  # 存储cookies历史记录
@@ -48,6 +58,22 @@ class WebDouyinMonitor:
         self.max_download_workers = self.config.get('max_download_workers', 4)  # 最大下载线程数
         self.monitor_executor = None
         self.download_executor = None
+
+        # 签名进程池配置（常驻node进程数、单次签名超时秒数）
+        configure_sign_pool(self.config.get('sign_pool_size'), self.config.get('sign_timeout'))
+        # 共享HTTP连接池，所有主页检查复用到抖音的连接，每个域名的连接数不少于监控线程数
+        configure_session(max(self.config.get('http_pool_size', 32), self.max_monitor_workers),
+                          self.config.get('http_retries', 2), http2=self.config.get('http2', False),
+                          connect_timeout=self.config.get('connect_timeout'), read_timeout=self.config.get('read_timeout'))
+        # 接口限速，每个(接口, 账号, 代理)从api_rate开始，根据是否被限流在api_rate_min和api_rate_max之间自动调整
+        configure_rate_limiter(self.config.get('api_rate'), min_rate=self.config.get('api_rate_min'),
+                               max_rate=self.config.get('api_rate_max'))
+        # 同一cookie连续失败breaker_failures次后暂停请求breaker_open_seconds秒，到期后先发一个探测请求
+        configure_circuit_breaker(self.config.get('breaker_failures'), self.config.get('breaker_open_seconds'))
+        # 代理池，配置了proxy_pool时所有接口请求按代理的延迟和成功率轮换代理
+        self.configure_proxies()
+        # cookie池，主Cookie和cookie_pool中的账号轮流用于主页检查和下载
+        self.configure_cookies()
         
         # 语音提醒配置
         self.enable_sound_notification = self.config.get('enable_sound_notification', True)
@@ -79,6 +105,15 @@ class WebDouyinMonitor:
         except Exception as e:
             self.log_message(f"数据迁移过程中出错: {e}", 'ERROR')
     
+    def configure_proxies(self):
+        """按配置加载代理池，修改配置后调用立即生效"""
+        configure_proxy_pool(self.config.get('proxy_pool') or [], self.config.get('proxy_max_inflight'),
+                             self.config.get('proxy_cooldown'))
+    
+    def proxy_url(self):
+        """配置了代理池时请求通过代理池发送，否则直连"""
+        return POOL if len(get_proxy_pool()) else ''
+    
     def load_config(self):
         """加载配置"""
         default_config = {
@@ -88,7 +123,26 @@ class WebDouyinMonitor:
             'video_time_filter': 60,
             'homepage_list': [],
             'cookie_history': [],  # 添加cookies历史记录
-            'cookie_check_interval': 1800  # Cookie验证间隔（秒），默认30分钟
+            'cookie_check_interval': 1800,  # Cookie验证间隔（秒），默认30分钟
+            'sign_pool_size': 2,  # 常驻签名进程数
+            'sign_timeout': 10,  # 单次签名超时（秒）
+            'http_pool_size': 32,  # 每个域名保持的最大连接数
+            'http_retries': 2,  # 连接失败和网关错误的重试次数
+            'http2': False,  # 使用HTTP/2多路复用（需要安装httpx[http2]），False时使用HTTP/1.1
+            'connect_timeout': 5,  # 所有请求的连接超时（秒）
+            'read_timeout': 30,  # 所有请求的读取超时（秒）
+            'api_rate': 2,  # 每个接口每个账号的初始请求速率（次/秒）
+            'api_rate_min': 0.2,  # 被限流后降速的下限
+            'api_rate_max': 10,  # 持续成功时提速的上限
+            'breaker_failures': 5,  # 连续失败多少次后暂停请求
+            'breaker_open_seconds': 30,  # 暂停时间（秒），探测失败时翻倍
+            'proxy_pool': [],  # 代理列表或代理文件路径（每行一个），为空时直连
+            'proxy_max_inflight': 4,  # 每个代理同时进行的最大请求数
+            'proxy_cooldown': 30,  # 代理连续失败后的暂停时间（秒），再次暂停时翻倍
+            'cookie_pool': [],  # 主Cookie以外的其他账号Cookie，主页检查和下载分散到所有账号
+            'cookie_max_inflight': 4,  # 每个账号同时进行的最大检查数
+            'check_deadline': 60,  # 单个主页检查的最长耗时（秒），包括所有重试
+            'check_max_retries': 6  # 单个主页检查的最大重试次数（各层重试的总和）
         }
         
         try:
@@ -483,7 +537,8 @@ class WebDouyinMonitor:
                 limit=1,
                 type='post',
                 down_path=self.config.get('download_path', './下载'),
-                cookie=self.config.get('cookie', '')
+                cookie=self.config.get('cookie', ''),
+                proxy_url=self.proxy_url()
             )
             
             # 先获取目标信息，设置id等属性
@@ -557,63 +612,35 @@ class WebDouyinMonitor:
             self.log_message(f"获取用户信息过程发生异常 {homepage_url}: {e}", 'ERROR')
             return '未知用户'
     
-    def check_cookie_exists_and_valid(self):
-        """检查Cookie是否存在且有效"""
-        # 首先检查Cookie是否存在
-        cookie = self.config.get('cookie', '').strip()
-        if not cookie:
-            self.log_message("Cookie不存在，需要获取新Cookie", 'WARNING')
-            return False
-            
-        # 检查Cookie基本格式（包含关键字段）
-        required_fields = ['sessionid', 'sid_guard', 'uid_tt']
-        missing_fields = []
-        for field in required_fields:
-            if field not in cookie:
-                missing_fields.append(field)
-        
-        if missing_fields:
-            self.log_message(f"Cookie缺少关键字段: {', '.join(missing_fields)}，需要更新Cookie", 'WARNING')
-            return False
-            
-        # 检查Cookie有效性
+    def check_cookie_exists_and_valid(self, cookie=None):
+        """检查Cookie是否存在且有效，cookie为空时检查配置中的主Cookie"""
+        if cookie is None:
+            cookie = self.config.get('cookie', '')
         try:
-            from lib.request import Request
-            req = Request()
-            req.cookie = cookie
-            
-            # 尝试访问一个简单的API来测试Cookie有效性
-            # 使用用户信息API，这个API相对简单且稳定
-            test_uri = "/aweme/v1/web/im/user/info/"
-            params = {
-                'device_platform': 'webapp',
-                'aid': '6383',
-                'channel': 'channel_pc_web'
-            }
-            
-            response = req.getJSON(test_uri, params)
-            # 如果能正常获取到响应且不是错误状态，说明Cookie有效
-            if response and isinstance(response, dict):
-                # 检查是否有明确的错误状态
-                status_code = response.get('status_code')
-                if status_code is not None:
-                    if status_code == 0:
-                        self.log_message("Cookie存在且有效", 'SUCCESS')
-                        return True
-                    else:
-                        self.log_message(f"Cookie存在但已失效 (状态码: {status_code})", 'WARNING')
-                        return False
-                else:
-                    # 如果没有status_code字段，但有响应内容，也认为是有效的
-                    self.log_message("Cookie存在且有效", 'SUCCESS')
-                    return True
-            else:
-                self.log_message("Cookie存在但已失效", 'WARNING')
-                return False
-                
+            valid, message = check_cookie(cookie, self.proxy_url())
         except Exception as e:
             self.log_message(f"Cookie有效性检查失败: {e}", 'ERROR')
             return False
+        self.log_message(message, 'SUCCESS' if valid else 'WARNING')
+        return valid
+    
+    def ensure_cookies(self):
+        """
+        检查是否有可用的Cookie: 只有一个账号时沿用自动刷新的逻辑；
+        多个账号时按cookie_check_interval验证每个账号，失效的移出轮换，全部失效时再尝试刷新主Cookie
+        """
+        if len(self.cookie_pool) <= 1:
+            return self.auto_refresh_cookie_if_needed()
+        if self.cookie_pool.validate(self.check_cookie_exists_and_valid, self.cookie_check_interval):
+            return True
+        self.log_message("所有账号的Cookie都已失效或暂停，尝试自动获取新Cookie", 'WARNING')
+        self.cookie_is_valid = False
+        return self.auto_refresh_cookie_if_needed()
+    
+    def configure_cookies(self):
+        """主Cookie和cookie_pool中的账号组成cookie池，修改配置后调用立即生效"""
+        self.cookie_pool = configure_cookie_pool([self.config.get('cookie', '')] + list(self.config.get('cookie_pool') or []),
+                                                 self.config.get('cookie_max_inflight'))
     
     def auto_refresh_cookie_if_needed(self):
         """检查Cookie是否存在且有效，如果不满足条件则自动刷新（带缓存机制）"""
@@ -684,7 +711,8 @@ class WebDouyinMonitor:
                 limit=1,
                 type='post',
                 down_path='./temp',
-                cookie=self.config.get('cookie', '')
+                cookie=self.config.get('cookie', ''),
+                proxy_url=self.proxy_url()
             )
             
             # 获取用户信息
@@ -705,20 +733,39 @@ class WebDouyinMonitor:
     
     def check_homepage(self, homepage_url):
         """检查单个主页是否有新视频"""
+        if self.cancel_token.cancelled:
+            return []
         try:
             # 首先检查Cookie有效性
-            if not self.auto_refresh_cookie_if_needed():
+            if not self.ensure_cookies():
                 self.log_message(f"Cookie无效且刷新失败，跳过检查: {homepage_url}", 'ERROR')
                 return []
             
+            # 从cookie池分配账号，多个账号时主页检查分散到各账号
+            try:
+                account = self.cookie_pool.acquire()
+            except NoCookieAvailable as e:
+                self.homepage_status[homepage_url] = {
+                    'status': '暂停请求',
+                    'last_check': datetime.now().isoformat(),
+                    'new_videos_count': 0
+                }
+                self.log_message(f"跳过检查 {homepage_url}: {e}", 'WARNING')
+                return []
+            
             # 创建Douyin实例
-            douyin = Douyin(
-                target=homepage_url,
-                limit=10,
-                type='post',
-                down_path=self.config.get('download_path', './下载'),
-                cookie=self.config.get('cookie', '')
-            )
+            try:
+                douyin = Douyin(
+                    target=homepage_url,
+                    limit=10,
+                    type='post',
+                    down_path=self.config.get('download_path', './下载'),
+                    cookie=account.cookie,
+                    proxy_url=self.proxy_url()
+                )
+            except Exception:
+                self.cookie_pool.release(account)
+                raise
             
             # 获取视频列表，临时禁用quit函数避免程序退出
             import lib.util
@@ -738,11 +785,36 @@ class WebDouyinMonitor:
                 douyin_module.quit = lambda msg: self.log_message(f"Douyin模块quit调用被拦截: {msg}", 'WARNING')
             
             try:
-                videos = douyin.get_awemes()
+                # 单个主页检查的所有重试共用一个预算，慢账号最多占用监控线程check_deadline秒；停止监控时立即中断
+                with self.cancel_token.scope(), \
+                        RetryBudget(self.config.get('check_deadline', 60), self.config.get('check_max_retries', 6)):
+                    videos = douyin.get_awemes()
+            except OperationCancelled:
+                self.log_message(f"监控已停止，中断检查: {homepage_url}", 'DEBUG')
+                return []
+            except RetryBudgetExceeded as e:
+                self.homepage_status[homepage_url] = {
+                    'status': '检查超时',
+                    'last_check': datetime.now().isoformat(),
+                    'new_videos_count': 0
+                }
+                self.log_message(f"检查超时 {homepage_url}: {e}", 'WARNING')
+                return []
+            except CircuitOpenError as e:
+                # 账号熔断中，暂停分配此账号，使用同一账号的主页直接跳过，其他账号继续检查
+                self.cookie_pool.pause(account.cookie, e.retry_after, str(e))
+                self.homepage_status[homepage_url] = {
+                    'status': '暂停请求',
+                    'last_check': datetime.now().isoformat(),
+                    'new_videos_count': 0
+                }
+                self.log_message(f"跳过检查 {homepage_url}: {e}", 'WARNING')
+                return []
             except Exception as e:
                 self.log_message(f"获取视频列表失败 {homepage_url}: {e}", 'ERROR')
                 return []
             finally:
+                self.cookie_pool.release(account)
                 # 恢复原始quit函数
                 lib.util.quit = original_quit
                 if douyin_module and original_douyin_quit is not None:
@@ -805,9 +877,21 @@ class WebDouyinMonitor:
             self.log_message(f"主页检查异常 {homepage_url}: {e}", 'ERROR')
             return []
     
-    def check_single_homepage(self, homepage_info, index, total):
-        """检查单个主页（用于多线程）"""
+    def presign_homepages(self, homepage_urls, index):
+        """检查到第index个主页时，批量签名从它开始的一批主页（见Douyin.presign_homepages）"""
+        try:
+            # 与check_homepage使用同一个cookie和代理，签名才能被检查时的Request实例使用；
+            # 每批不少于两轮线程数，同一批的主页在签名后很快被检查，不会过期
+            Douyin.presign_homepages(homepage_urls, self.config.get('cookie', ''), self.proxy_url(), index,
+                                     max(Douyin.PRESIGN_HOMEPAGES, self.max_monitor_workers * 2))
+        except Exception as e:
+            self.log_message(f"批量签名失败，检查时单独签名: {e}", 'WARNING')
+
+    def check_single_homepage(self, homepage_info, index, total, presign_urls=None):
+        """检查单个主页（用于多线程），presign_urls为需要分批预签名的全部主页"""
         homepage_url = homepage_info.get('url', '') if isinstance(homepage_info, dict) else homepage_info
+        if presign_urls:
+            self.presign_homepages(presign_urls, index)
         
         try:
             self.log_message(f"正在检查主页 ({index+1}/{total}): {homepage_url}", 'MONITOR')
@@ -864,12 +948,18 @@ class WebDouyinMonitor:
             return
         
         self.log_message(f"开始并行检查 {len(homepage_list)} 个主页，使用 {self.max_monitor_workers} 个线程", 'MONITOR')
+
+        # 主页第一页作品的请求参数分批批量签名，每批在检查到第一个主页时签名；
+        # 签名和Cookie绑定，多账号时检查时才分配账号，由各次检查单独签名
+        presign_urls = None
+        if len(self.cookie_pool) <= 1:
+            presign_urls = [homepage.get('url', '') if isinstance(homepage, dict) else homepage for homepage in homepage_list]
         
         # 创建线程池
         with ThreadPoolExecutor(max_workers=self.max_monitor_workers) as executor:
             # 提交所有检查任务
             future_to_homepage = {
-                executor.submit(self.check_single_homepage, homepage_info, i, len(homepage_list)): homepage_info
+                executor.submit(self.check_single_homepage, homepage_info, i, len(homepage_list), presign_urls): homepage_info
                 for i, homepage_info in enumerate(homepage_list)
             }
             
@@ -1019,29 +1109,32 @@ class WebDouyinMonitor:
                 self.log_message(f"开始下载: {video_title}", 'INFO')
                 self.update_video_download_status(video_id, '下载中', '')
 
-            # 创建Douyin实例进行下载
-            douyin = Douyin(
-                target=homepage_url,
-                limit=len(videos_to_download),
-                type='post',
-                down_path=organized_download_path,
-                cookie=self.config.get('cookie', '')
-            )
+            # 下载也从cookie池分配账号，与主页检查分散到各账号
+            with self.cookie_pool.lease() as cookie:
+                # 创建Douyin实例进行下载
+                douyin = Douyin(
+                    target=homepage_url,
+                    limit=len(videos_to_download),
+                    type='post',
+                    down_path=organized_download_path,
+                    cookie=cookie,
+                    proxy_url=self.proxy_url()
+                )
 
-            # 设置标志，避免重复创建用户文件夹
-            douyin._skip_user_folder = True
+                # 设置标志，避免重复创建用户文件夹
+                douyin._skip_user_folder = True
 
-            # 获取目标信息（用户信息等）
-            douyin._Douyin__get_target_info()
+                # 获取目标信息（用户信息等）
+                douyin._Douyin__get_target_info()
 
-            # 直接设置results为过滤后的新视频
-            douyin.results = videos_to_download
-            # 清空旧结果，确保只下载新视频
-            douyin.results_old = []
+                # 直接设置results为过滤后的新视频
+                douyin.results = videos_to_download
+                # 清空旧结果，确保只下载新视频
+                douyin.results_old = []
 
-            # 保存和下载
-            douyin.save()
-            douyin.download_all()
+                # 保存和下载
+                douyin.save()
+                douyin.download_all()
 
             # 更新下载完成视频的状态
             for video in videos_to_download:
@@ -1113,6 +1206,7 @@ class WebDouyinMonitor:
                         # 更新当前配置中的cookie
                         self.config['cookie'] = new_cookie
                         self.save_config()
+                        self.configure_cookies()
                         
                         self.log_message(f"Cookie获取成功！共获取到 {len(new_cookie)} 个字符的Cookie数据，已自动更新到配置中", 'SUCCESS')
                         return True
@@ -1136,6 +1230,7 @@ class WebDouyinMonitor:
             return False
         
         self.is_monitoring = True
+        self.cancel_token = CancelToken()
         self.monitor_thread = threading.Thread(target=self.monitor_loop)
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
@@ -1144,6 +1239,8 @@ class WebDouyinMonitor:
     def stop_monitoring(self):
         """停止监控"""
         self.is_monitoring = False
+        # 正在进行的检查在下一次请求或等待时中断
+        self.cancel_token.cancel()
         self.log_message("🛑 正在停止监控服务...", 'MONITOR')
         
         # 关闭线程池
@@ -1180,7 +1277,7 @@ def save_config():
         
         # 处理多线程配置
         if 'max_monitor_workers' in data:
-            monitor.max_monitor_workers = max(1, min(10, int(data['max_monitor_workers'])))
+            monitor.max_monitor_workers = max(1, min(64, int(data['max_monitor_workers'])))
         if 'max_download_workers' in data:
             monitor.max_download_workers = max(1, min(5, int(data['max_download_workers'])))
         
@@ -1202,10 +1299,22 @@ def save_config():
         
         monitor.config.update(data)
         monitor.save_config()
+        if {'proxy_pool', 'proxy_max_inflight', 'proxy_cooldown'} & set(data):
+            monitor.configure_proxies()
+        if {'cookie', 'cookie_pool', 'cookie_max_inflight'} & set(data):
+            monitor.configure_cookies()
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/cookie-pool', methods=['GET'])
+def get_cookie_pool_status():
+    return jsonify({'accounts': monitor.cookie_pool.snapshot()})
+
+@app.route('/api/proxy-pool', methods=['GET'])
+def get_proxy_pool_status():
+    return jsonify({'proxies': get_proxy_pool().snapshot()})
+
 @app.route('/api/threading-config', methods=['GET'])
 def get_threading_config():
     return jsonify({
@@ -1219,7 +1328,7 @@ def update_threading_config():
         data = request.get_json()
         
         if 'max_monitor_workers' in data:
-            monitor.max_monitor_workers = max(1, min(10, int(data['max_monitor_workers'])))
+            monitor.max_monitor_workers = max(1, min(64, int(data['max_monitor_workers'])))
             monitor.log_message(f"监控线程数已更新为: {monitor.max_monitor_workers}", 'CONFIG')
         
         if 'max_download_workers' in data: